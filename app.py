@@ -1,26 +1,63 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import openai
 import os
+import time
+import plotly.express as px
 from dotenv import load_dotenv
-
-# Carrega a chave da API do arquivo .env
+from cache_custos import carregar_tabela_custos, carregar_tabela_custos_bytes
+from carteira import carregar_carteira, carregar_carteira_em_blocos, compactar_tipos, memoria_bytes
+from cubo_carteira import (
+    PRECO_MAX, PRECO_MEDIO, PRECO_MIN, PlanoAgregacao, construir_cubo, construir_cubo_em_blocos
+)
+from diagnostico_ia import CONCLUIDO, ERRO, GerenciadorDiagnostico
+from formatacao import inteiro_br, moeda_br, percentual_br, tabela_formatada
+from indice_carteira import construir_indice, filtrar_posicoes, valores_dimensao
+from instrumentacao import exibir_instrumentacao, iniciar_instrumentacao
+from prompt_diagnostico import ORCAMENTO_PADRAO, TOP_PADRAO, montar_prompt
+from reprecificacao import (
+    LUCRO_RECUSTEADO, MEDIDAS as MEDIDAS_REPRECIFICACAO, VL_SEM_CUSTO, IndiceCustos, extrair_linhas,
+    reprecificar_carteira
+)
+
+# Carrega a chave da API (e a escolha do backend, DIAGNOSTICO_BACKEND) do arquivo .env
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def gerar_relatorio_estrategico(prompt):
-    try:
-        resposta = openai.ChatCompletion.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=2000
-        )
-        return resposta['choices'][0]['message']['content']
-    except Exception as e:
-        st.error(f"Erro ao gerar relatório: {str(e)}")
-        return None
+ARQUIVO_CUSTOS_PADRAO = "Custo de reposição.xlsx"
+
+# Um único gerenciador por servidor: os diagnósticos rodam em segundo plano e ficam em cache
+# pelo hash do prompt + parâmetros do modelo, valendo para todas as sessões.
+@st.cache_resource
+def obter_gerenciador_diagnostico():
+    return GerenciadorDiagnostico()
+
+
+# Acompanha o diagnóstico em andamento sem travar a página: só este trecho é reexecutado a cada 2s
+@st.fragment(run_every=2)
+def acompanhar_diagnostico(chave):
+    tarefa = obter_gerenciador_diagnostico().tarefa(chave)
+    if tarefa is None or tarefa.pronta:
+        st.rerun()
+    st.info(f"⏳ Diagnóstico {tarefa.estado}... {tarefa.tempo_decorrido:.0f}s")
+
+
+# O diagnóstico vale para a seleção em que foi pedido: com outro upload ou outros filtros, a
+# assinatura muda e o relatório anterior deixa de ser exibido
+def exibir_diagnostico(assinatura):
+    if st.session_state.get("diagnostico_assinatura") != assinatura:
+        st.session_state.pop("diagnostico_chave", None)
+    chave = st.session_state.get("diagnostico_chave")
+    tarefa = obter_gerenciador_diagnostico().tarefa(chave) if chave else None
+    if tarefa is None:
+        return
+    if not tarefa.pronta:
+        acompanhar_diagnostico(chave)
+    elif tarefa.estado == ERRO:
+        st.error(f"Erro ao gerar relatório: {tarefa.erro}")
+    elif tarefa.estado == CONCLUIDO:
+        st.markdown("---")
+        st.markdown(tarefa.resultado)
+        origem = "do cache" if tarefa.do_cache else f"em {tarefa.tempo_decorrido:.1f}s"
+        st.success(f"✅ Diagnóstico gerado com sucesso ({origem})!")
 
 # =============================
 # CONFIGURAÇÃO DA PÁGINA
@@ -28,50 +65,135 @@ def gerar_relatorio_estrategico(prompt):
 st.set_page_config(page_title="Análise Comercial e Controladoria", layout="wide")
 st.title("📊 One-Page Report Comercial & Controladoria")
 
+instrumentacao = iniciar_instrumentacao("app.py")
+
 st.markdown("#### 1️⃣ Upload e Validação dos Dados")
-st.markdown("Envie o arquivo Excel com as abas **CARTEIRA** e **Mark-up** para análise.")
+st.markdown("Envie o arquivo Excel com as abas **CARTEIRA** e **Mark-up** para análise, ou os dois arquivos convertidos (**_CARTEIRA** e **_MARKUP**) em Parquet, Feather ou CSV.gz.")
 
 # =============================
 # FUNÇÕES UTILITÁRIAS
 # =============================
 
-def carregar_dados(caminho_arquivo):
+# Retorna o cubo de agregação da CARTEIRA (com tipos compactos), a aba Mark-up e o uso de memória.
+# Em blocos, as linhas são lidas e consolidadas aos poucos, sem manter a aba inteira em memória.
+def carregar_dados(arquivos, em_blocos=False):
     try:
-        excel_data = pd.ExcelFile(caminho_arquivo)
-        if {"CARTEIRA", "Mark-up"}.issubset(excel_data.sheet_names):
-            carteira_df = excel_data.parse("CARTEIRA")
-            markup_df = excel_data.parse("Mark-up")
-            carteira_df.columns = carteira_df.columns.str.strip().str.upper()
-            markup_df.columns = markup_df.columns.str.strip().str.upper()
-            return carteira_df, markup_df
+        if em_blocos:
+            blocos, markup_df = carregar_carteira_em_blocos(arquivos)
+            cubo = construir_cubo_em_blocos(blocos)
+            memoria = {"Cubo": (memoria_bytes(cubo), None)}
         else:
-            st.error("O arquivo deve conter as abas 'CARTEIRA' e 'Mark-up'.")
-            return None, None
+            carteira_df, markup_df = carregar_carteira(arquivos)
+            antes = memoria_bytes(carteira_df)
+            carteira_df = compactar_tipos(carteira_df)
+            memoria = {"CARTEIRA": (antes, memoria_bytes(carteira_df))}
+            cubo = construir_cubo(carteira_df)
+            memoria["Cubo"] = (memoria_bytes(cubo), None)
+        cubo = compactar_tipos(cubo)
+        memoria["Cubo"] = (memoria["Cubo"][0], memoria_bytes(cubo))
+        return cubo, markup_df, memoria
+    except ValueError as e:
+        st.error(str(e))
+        return None, None, None
     except Exception as e:
         st.error(f"Erro ao carregar o arquivo: {str(e)}")
-        return None, None
+        return None, None, None
+
+# Cubo de agregação e índice de filtros ficam na sessão enquanto o upload não muda.
+# Os painéis são servidos pelo cubo; as linhas da nota não são mantidas.
+def carregar_base(arquivos, em_blocos=False):
+    chave = tuple((a.name, a.size, getattr(a, "file_id", None)) for a in arquivos)
+    base = st.session_state.get("base_carteira")
+    if base is None or base["chave"] != chave:
+        cubo, markup_df, memoria = carregar_dados(arquivos, em_blocos)
+        if cubo is None:
+            return None, None, None
+        base = {
+            "chave": chave,
+            "cubo": cubo,
+            "markup_df": markup_df,
+            "indice": construir_indice(cubo),
+            "memoria": memoria,
+        }
+        st.session_state.base_carteira = base
+
+    for nome, (antes, depois) in base["memoria"].items():
+        st.sidebar.caption(f"Memória {nome}: {antes / 1e6:,.1f} MB → {depois / 1e6:,.1f} MB".replace(",", "X").replace(".", ",").replace("X", "."))
+    return base["cubo"], base["markup_df"], base["indice"]
+
+# Reprecificação: relê as linhas da CARTEIRA (o cubo não guarda o preço de cada linha) uma vez por
+# upload e guarda só as colunas usadas, com o texto em códigos. Mudar a tabela de custos ou os
+# parâmetros refaz apenas a passada vetorizada sobre essas linhas.
+def linhas_reprecificacao(arquivos, em_blocos):
+    chave = (tuple((a.name, a.size, getattr(a, "file_id", None)) for a in arquivos), em_blocos)
+    salvo = st.session_state.get("linhas_reprecificacao")
+    if salvo is not None and salvo["chave"] == chave:
+        return salvo
+
+    for arquivo in arquivos:
+        if hasattr(arquivo, "seek"):
+            arquivo.seek(0)
+    inicio = time.perf_counter()
+    if em_blocos:
+        blocos, _ = carregar_carteira_em_blocos(arquivos)
+    else:
+        blocos = [carregar_carteira(arquivos)[0]]
+    salvo = {"chave": chave, "linhas": extrair_linhas(blocos), "segundos": time.perf_counter() - inicio}
+    st.session_state.linhas_reprecificacao = salvo
+    return salvo
+
+
+def reprecificar_base(arquivos, em_blocos, custos, chave_custos, frete_caixa, contrato_percentual, aumento_custo):
+    try:
+        leitura = linhas_reprecificacao(arquivos, em_blocos)
+    except ValueError as e:
+        st.error(str(e))
+        return None
+    chave = (leitura["chave"], chave_custos, frete_caixa, contrato_percentual, aumento_custo)
+    salvo = st.session_state.get("reprecificacao")
+    if salvo is not None and salvo["chave"] == chave:
+        return salvo
+
+    inicio = time.perf_counter()
+    try:
+        indice_custos = IndiceCustos(custos, frete_caixa, contrato_percentual, aumento_custo)
+        comparativos, linhas = reprecificar_carteira(leitura["linhas"], indice_custos)
+    except ValueError as e:
+        st.error(str(e))
+        return None
+    salvo = {
+        "chave": chave,
+        "comparativos": comparativos,
+        "linhas": linhas,
+        "segundos_leitura": leitura["segundos"],
+        "segundos": time.perf_counter() - inicio,
+    }
+    st.session_state.reprecificacao = salvo
+    return salvo
 
 # =============================
 # FORMATADORES
 # =============================
+# Valores isolados (métricas); as tabelas são formatadas por coluna em formatacao.py
 formatar_moeda = lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 formatar_valor = lambda x: f"{x:,.0f}".replace(",", ".")
 
-def highlight_negative(row):
-    if "% LUCRO" in row:
-        lucro = float(row["% LUCRO"].replace("%", "").replace(",", "."))
-    else:
-        lucro = float(row["% LUCRO TOTAL"].replace("%", "").replace(",", "."))
-    return ["background-color: #ffb3b3" if lucro < 0 else "" for _ in row]
+FORMATO_LUCRO = {"VL.BRUTO": moeda_br, "LUCRO LIQ": moeda_br, "% LUCRO": percentual_br}
 
 # =============================
 # UPLOAD DO ARQUIVO
 # =============================
-uploaded_file = st.file_uploader("📂 Escolha o arquivo Excel", type=["xlsx"])
+uploaded_file = st.file_uploader(
+    "📂 Escolha o arquivo Excel ou os arquivos convertidos",
+    type=["xlsx", "parquet", "feather", "gz"],
+    accept_multiple_files=True
+)
+leitura_em_blocos = st.checkbox("📉 Leitura em blocos (arquivos muito grandes, com memória limitada)")
 if uploaded_file:
-    carteira_df, markup_df = carregar_dados(uploaded_file)
+    with instrumentacao.secao("ingestão"):
+        cubo, markup_df, indice = carregar_base(uploaded_file, leitura_em_blocos)
 
-    if carteira_df is not None:
+    if cubo is not None:
         st.success("✅ Arquivo carregado com sucesso!")
         # =============================
         # FILTROS
@@ -79,12 +201,12 @@ if uploaded_file:
         st.markdown("---")
         st.header("🎯 Filtros para Análise")
 
-        clientes = sorted(carteira_df["CLIENTE"].unique())
-        ufs = sorted(carteira_df["UF"].unique())
-        skus = sorted(carteira_df["SKU"].unique())
-        redes = sorted(carteira_df["REDE"].unique()) if "REDE" in carteira_df.columns else []
-        sups = sorted(carteira_df["SUP"].unique()) if "SUP" in carteira_df.columns else []
-        vends = sorted(carteira_df["VENDEDOR"].unique()) if "VENDEDOR" in carteira_df.columns else []
+        clientes = valores_dimensao(indice, "CLIENTE")
+        ufs = valores_dimensao(indice, "UF")
+        skus = valores_dimensao(indice, "SKU")
+        redes = valores_dimensao(indice, "REDE")
+        sups = valores_dimensao(indice, "SUP")
+        vends = valores_dimensao(indice, "VENDEDOR")
 
         colf1, colf2, colf3, colf4, colf5, colf6 = st.columns(6)
         cliente_sel = colf1.selectbox("Filtrar Cliente", ["Todos"] + clientes)
@@ -97,19 +219,22 @@ if uploaded_file:
         # =============================
         # APLICAÇÃO DOS FILTROS
         # =============================
-        df_filtro = carteira_df.copy()
-        if cliente_sel != "Todos":
-            df_filtro = df_filtro[df_filtro["CLIENTE"] == cliente_sel]
-        if uf_sel != "Todos":
-            df_filtro = df_filtro[df_filtro["UF"] == uf_sel]
-        if sku_sel != "Todos":
-            df_filtro = df_filtro[df_filtro["SKU"] == sku_sel]
-        if rede_sel != "Todos" and "REDE" in df_filtro.columns:
-            df_filtro = df_filtro[df_filtro["REDE"] == rede_sel]
-        if sup_sel != "Todos" and "SUP" in df_filtro.columns:
-            df_filtro = df_filtro[df_filtro["SUP"] == sup_sel]
-        if vend_sel != "Todos" and "VENDEDOR" in df_filtro.columns:
-            df_filtro = df_filtro[df_filtro["VENDEDOR"] == vend_sel]
+        selecoes = {
+            "CLIENTE": cliente_sel,
+            "UF": uf_sel,
+            "SKU": sku_sel,
+            "REDE": rede_sel,
+            "SUP": sup_sel,
+            "VENDEDOR": vend_sel,
+        }
+        with instrumentacao.secao("filtros"):
+            posicoes = filtrar_posicoes(indice, selecoes)
+            cubo_filtro = cubo if posicoes is None else cubo.iloc[posicoes]
+
+        # Cada chave de agrupamento é consolidada uma única vez para todos os painéis
+        plano = PlanoAgregacao(cubo_filtro)
+        plano.declarar("CLIENTE", ["VL.BRUTO", "LUCRO LIQ", "FRETE TOTAL"])
+        plano.declarar("SKU", ["VL.BRUTO", "LUCRO LIQ", "QTDE", PRECO_MIN, PRECO_MEDIO, PRECO_MAX])
 
         # =============================
         # PAINEL RESUMO
@@ -117,9 +242,10 @@ if uploaded_file:
         st.markdown("---")
         st.header("📌 Painel Resumo")
 
-        total_volume = int(df_filtro["QTDE"].sum())
-        faturamento = df_filtro["VL.BRUTO"].sum()
-        lucro_liq = df_filtro["LUCRO LIQ"].sum()
+        with instrumentacao.secao("agregação"):
+            total_volume = int(cubo_filtro["QTDE"].sum())
+            faturamento = cubo_filtro["VL.BRUTO"].sum()
+            lucro_liq = cubo_filtro["LUCRO LIQ"].sum()
         preco_medio = faturamento / total_volume if total_volume > 0 else 0
         perc_lucro = (lucro_liq / faturamento) * 100 if faturamento > 0 else 0
 
@@ -134,38 +260,30 @@ if uploaded_file:
         st.markdown("---")
         st.subheader("📄 Lucro por Cliente")
 
-        lucro_cliente = df_filtro.groupby("CLIENTE")[["VL.BRUTO", "LUCRO LIQ"]].sum().reset_index()
-        lucro_cliente["% LUCRO"] = (lucro_cliente["LUCRO LIQ"] / lucro_cliente["VL.BRUTO"]) * 100
-        lucro_cliente["VL.BRUTO"] = lucro_cliente["VL.BRUTO"].apply(formatar_moeda)
-        lucro_cliente["LUCRO LIQ"] = lucro_cliente["LUCRO LIQ"].apply(formatar_moeda)
-        lucro_cliente["% LUCRO"] = lucro_cliente["% LUCRO"].apply(lambda x: f"{x:.2f}%")
-
-        st.dataframe(
-            lucro_cliente.style.apply(
-                lambda row: ["background-color: #ffb3b3" if float(row["% LUCRO"].replace("%", "").replace(",", ".")) < 0 else "" for _ in row],
-                axis=1
-            ),
-            use_container_width=True
-        )
+        with instrumentacao.secao("agregação"):
+            lucro_cliente = plano.obter("CLIENTE", ["VL.BRUTO", "LUCRO LIQ"])
+            lucro_cliente["% LUCRO"] = (lucro_cliente["LUCRO LIQ"] / lucro_cliente["VL.BRUTO"]) * 100
+
+        with instrumentacao.secao("tabelas"):
+            st.dataframe(
+                tabela_formatada(lucro_cliente, FORMATO_LUCRO, destaque="% LUCRO"),
+                use_container_width=True
+            )
 
         # =============================
         # ANÁLISE DE LUCRO POR SKU
         # =============================
         st.subheader("📄 Lucro por Produto (SKU)")
 
-        lucro_sku = df_filtro.groupby("SKU")[["VL.BRUTO", "LUCRO LIQ"]].sum().reset_index()
-        lucro_sku["% LUCRO"] = (lucro_sku["LUCRO LIQ"] / lucro_sku["VL.BRUTO"]) * 100
-        lucro_sku["VL.BRUTO"] = lucro_sku["VL.BRUTO"].apply(formatar_moeda)
-        lucro_sku["LUCRO LIQ"] = lucro_sku["LUCRO LIQ"].apply(formatar_moeda)
-        lucro_sku["% LUCRO"] = lucro_sku["% LUCRO"].apply(lambda x: f"{x:.2f}%")
-
-        st.dataframe(
-            lucro_sku.style.apply(
-                lambda row: ["background-color: #ffb3b3" if float(row["% LUCRO"].replace("%", "").replace(",", ".")) < 0 else "" for _ in row],
-                axis=1
-            ),
-            use_container_width=True
-        )
+        with instrumentacao.secao("agregação"):
+            lucro_sku = plano.obter("SKU", ["VL.BRUTO", "LUCRO LIQ"])
+            lucro_sku["% LUCRO"] = (lucro_sku["LUCRO LIQ"] / lucro_sku["VL.BRUTO"]) * 100
+
+        with instrumentacao.secao("tabelas"):
+            st.dataframe(
+                tabela_formatada(lucro_sku, FORMATO_LUCRO, destaque="% LUCRO"),
+                use_container_width=True
+            )
 
         # =============================
         # GRÁFICOS DE LUCRO POR SKU
@@ -173,34 +291,31 @@ if uploaded_file:
         st.markdown("---")
         st.subheader("📊 Lucro Líquido por Produto (SKU) - Valor (R$)")
 
-        lucro_prod = df_filtro.groupby("SKU")["LUCRO LIQ"].sum().reset_index().sort_values(by="LUCRO LIQ", ascending=False)
-        fig_valor = px.bar(lucro_prod, x="LUCRO LIQ", y="SKU", orientation="h", title="Lucro Líquido Total por SKU")
-        st.plotly_chart(fig_valor, use_container_width=True)
+        with instrumentacao.secao("agregação"):
+            lucro_prod = plano.obter("SKU", ["LUCRO LIQ"]).sort_values(by="LUCRO LIQ", ascending=False)
+        with instrumentacao.secao("gráficos"):
+            fig_valor = px.bar(lucro_prod, x="LUCRO LIQ", y="SKU", orientation="h", title="Lucro Líquido Total por SKU")
+            st.plotly_chart(fig_valor, use_container_width=True)
 
         st.subheader("📊 Lucro Líquido por Produto (SKU) - Percentual (%)")
 
-        lucro_pct = df_filtro.groupby("SKU").agg({"LUCRO LIQ": "sum", "VL.BRUTO": "sum"}).reset_index()
-        lucro_pct["% LUCRO"] = (lucro_pct["LUCRO LIQ"] / lucro_pct["VL.BRUTO"]) * 100
+        with instrumentacao.secao("agregação"):
+            lucro_pct = plano.obter("SKU", ["LUCRO LIQ", "VL.BRUTO"])
+            lucro_pct["% LUCRO"] = (lucro_pct["LUCRO LIQ"] / lucro_pct["VL.BRUTO"]) * 100
 
-        fig_pct = px.bar(lucro_pct, x="% LUCRO", y="SKU", orientation="h", title="Percentual de Lucro Líquido por SKU")
-        fig_pct.update_layout(xaxis_tickformat=".2f")
-        st.plotly_chart(fig_pct, use_container_width=True)
+        with instrumentacao.secao("gráficos"):
+            fig_pct = px.bar(lucro_pct, x="% LUCRO", y="SKU", orientation="h", title="Percentual de Lucro Líquido por SKU")
+            fig_pct.update_layout(xaxis_tickformat=".2f")
+            st.plotly_chart(fig_pct, use_container_width=True)
         # =============================
         # TABELA SIMPLIFICADA DE PREÇO E % LUCRO POR SKU
         # =============================
         st.markdown("---")
         st.subheader("📄 Faixa de Preço e Lucro por SKU")
         
-        # Calculando os preços e % de lucro
-        df_precos_aux = df_filtro.copy()
-        df_precos_aux["PRECO_UNIT"] = df_precos_aux["VL.BRUTO"] / df_precos_aux["QTDE"]
-        
-        precos_resumo = df_precos_aux.groupby("SKU").agg({
-            "PRECO_UNIT": ["min", "mean", "max"],
-            "LUCRO LIQ": "sum",
-            "VL.BRUTO": "sum",
-            "QTDE": "sum"
-        }).reset_index()
+        # Faixa de preço unitário consolidada a partir do cubo
+        with instrumentacao.secao("agregação"):
+            precos_resumo = plano.obter("SKU", [PRECO_MIN, PRECO_MEDIO, PRECO_MAX, "LUCRO LIQ", "VL.BRUTO", "QTDE"])
         
         precos_resumo.columns = [
             "SKU", "PREÇO MÍNIMO UNIT", "PREÇO MÉDIO UNIT", "PREÇO MÁXIMO UNIT",
@@ -212,20 +327,19 @@ if uploaded_file:
         precos_resumo["% LUCRO MÉDIO"] = (precos_resumo["LUCRO LIQ"] / (precos_resumo["VOLUME"] * precos_resumo["PREÇO MÉDIO UNIT"])) * 100
         precos_resumo["% LUCRO MAX"] = (precos_resumo["LUCRO LIQ"] / (precos_resumo["VOLUME"] * precos_resumo["PREÇO MÁXIMO UNIT"])) * 100
         
-        # Formatação
-        for col in ["PREÇO MÍNIMO UNIT", "PREÇO MÉDIO UNIT", "PREÇO MÁXIMO UNIT"]:
-            precos_resumo[col] = precos_resumo[col].apply(formatar_moeda)
-        
-        for col in ["% LUCRO MIN", "% LUCRO MÉDIO", "% LUCRO MAX"]:
-            precos_resumo[col] = precos_resumo[col].apply(lambda x: f"{x:.2f}%" if isinstance(x, float) else x)
-        
         precos_resumo["VOLUME"] = precos_resumo["VOLUME"].astype(int)
         
-        # Exibição
-        st.dataframe(
-            precos_resumo[["SKU", "PREÇO MÍNIMO UNIT", "% LUCRO MIN", "PREÇO MÉDIO UNIT", "% LUCRO MÉDIO", "PREÇO MÁXIMO UNIT", "% LUCRO MAX"]],
-            use_container_width=True
-        )
+        # Exibição (formatação pt-BR só na tabela exibida)
+        formatos = {col: moeda_br for col in ["PREÇO MÍNIMO UNIT", "PREÇO MÉDIO UNIT", "PREÇO MÁXIMO UNIT"]}
+        formatos.update({col: percentual_br for col in ["% LUCRO MIN", "% LUCRO MÉDIO", "% LUCRO MAX"]})
+        with instrumentacao.secao("tabelas"):
+            st.dataframe(
+                tabela_formatada(
+                    precos_resumo[["SKU", "PREÇO MÍNIMO UNIT", "% LUCRO MIN", "PREÇO MÉDIO UNIT", "% LUCRO MÉDIO", "PREÇO MÁXIMO UNIT", "% LUCRO MAX"]],
+                    formatos
+                ),
+                use_container_width=True
+            )
         # =============================
         # ANÁLISE DO PESO DO FRETE POR CLIENTE
         # =============================
@@ -233,123 +347,59 @@ if uploaded_file:
         st.subheader("🚚 Peso do Frete sobre Faturamento por Cliente")
         
         # Verifica se existe coluna FRETE
-        if "FRETE TOTAL" not in carteira_df.columns:
+        if "FRETE TOTAL" not in cubo.columns:
             st.warning("⚠️ A coluna 'FRETE TOTAL' não foi encontrada na base. Por favor, valide o arquivo de origem.")
         else:
             # Agrupamento
-            df_frete = df_filtro.groupby("CLIENTE").agg({
-                "VL.BRUTO": "sum",
-                "FRETE TOTAL": "sum"
-            }).reset_index()
-        
-            df_frete["% FRETE / FATURAMENTO"] = (df_frete["FRETE TOTAL"] / df_frete["VL.BRUTO"]) * 100
-        
-            # Formatação
-            df_frete["VL.BRUTO"] = df_frete["VL.BRUTO"].apply(formatar_moeda)
-            df_frete["FRETE TOTAL"] = df_frete["FRETE TOTAL"].apply(formatar_moeda)
-            df_frete["% FRETE / FATURAMENTO"] = df_frete["% FRETE / FATURAMENTO"].apply(lambda x: f"{x:.2f}%")
+            with instrumentacao.secao("agregação"):
+                df_frete = plano.obter("CLIENTE", ["VL.BRUTO", "FRETE TOTAL"])
+                df_frete["% FRETE / FATURAMENTO"] = (df_frete["FRETE TOTAL"] / df_frete["VL.BRUTO"]) * 100
         
             # Exibição Tabela
-            st.dataframe(df_frete, use_container_width=True)
+            with instrumentacao.secao("tabelas"):
+                st.dataframe(
+                    tabela_formatada(df_frete, {
+                        "VL.BRUTO": moeda_br, "FRETE TOTAL": moeda_br, "% FRETE / FATURAMENTO": percentual_br
+                    }),
+                    use_container_width=True
+                )
         
             # Gráfico de Barras
             st.subheader("📊 Percentual do Frete sobre Faturamento por Cliente")
         
-            df_frete_grafico = df_filtro.groupby("CLIENTE").agg({
-                "VL.BRUTO": "sum",
-                "FRETE TOTAL": "sum"
-            }).reset_index()
-            df_frete_grafico["% FRETE / FATURAMENTO"] = (df_frete_grafico["FRETE TOTAL"] / df_frete_grafico["VL.BRUTO"]) * 100
-        
-            fig_frete = px.bar(
-                df_frete_grafico.sort_values("% FRETE / FATURAMENTO", ascending=False),
-                x="% FRETE / FATURAMENTO",
-                y="CLIENTE",
-                orientation="h",
-                title="Peso do Frete sobre Faturamento por Cliente"
-            )
-            fig_frete.update_layout(xaxis_title="% Frete sobre Faturamento", yaxis_title="Cliente")
-            fig_frete.update_traces(texttemplate="%{x:.2f}%", textposition="outside")
-            st.plotly_chart(fig_frete, use_container_width=True)
+            # A tabela continua numérica: o gráfico usa os mesmos valores
+            with instrumentacao.secao("gráficos"):
+                fig_frete = px.bar(
+                    df_frete.sort_values("% FRETE / FATURAMENTO", ascending=False),
+                    x="% FRETE / FATURAMENTO",
+                    y="CLIENTE",
+                    orientation="h",
+                    title="Peso do Frete sobre Faturamento por Cliente"
+                )
+                fig_frete.update_layout(xaxis_title="% Frete sobre Faturamento", yaxis_title="Cliente")
+                fig_frete.update_traces(texttemplate="%{x:.2f}%", textposition="outside")
+                st.plotly_chart(fig_frete, use_container_width=True)
         
             # =============================
             # GRÁFICO DE PIZZA CIF x FOB
             # =============================
             st.subheader("🥧 Distribuição CIF x FOB (por Volume Total de Caixas)")
         
-            df_frete_pizza = carteira_df.groupby("TIPO_FRETE")["QTDE"].sum().reset_index()
-            df_frete_pizza["COND. FRETE"] = df_frete_pizza["TIPO_FRETE"].map({"C": "CIF", "F": "FOB"})
-            df_frete_pizza = df_frete_pizza[df_frete_pizza["QTDE"] > 0]
-        
-            fig_pizza = px.pie(
-                df_frete_pizza,
-                values="QTDE",
-                names="COND. FRETE",
-                title="Distribuição do Volume por Condição de Frete (CIF x FOB)"
-            )
-            fig_pizza.update_traces(textinfo="percent+label")
+            with instrumentacao.secao("agregação"):
+                df_frete_pizza = cubo.groupby("TIPO_FRETE", observed=True)["QTDE"].sum().reset_index()
+                df_frete_pizza["COND. FRETE"] = df_frete_pizza["TIPO_FRETE"].map({"C": "CIF", "F": "FOB"})
+                df_frete_pizza = df_frete_pizza[df_frete_pizza["QTDE"] > 0]
         
-            st.plotly_chart(fig_pizza, use_container_width=True)
+            with instrumentacao.secao("gráficos"):
+                fig_pizza = px.pie(
+                    df_frete_pizza,
+                    values="QTDE",
+                    names="COND. FRETE",
+                    title="Distribuição do Volume por Condição de Frete (CIF x FOB)"
+                )
+                fig_pizza.update_traces(textinfo="percent+label")
+                st.plotly_chart(fig_pizza, use_container_width=True)
          
-            # =============================
-            # FUNÇÃO MELHORADA DE RELATÓRIO ESTRATÉGICO
-            # =============================
-            def gerar_relatorio_estrategico(dados):
-                try:
-                    # Agrupamentos para análise
-                    def top_contribuintes(df, col, top_n=10):
-                        dados = df.groupby(col).agg({
-                            "VL.BRUTO": "sum",
-                            "LUCRO LIQ": "sum"
-                        }).reset_index()
-                        dados["% LUCRO"] = (dados["LUCRO LIQ"] / dados["VL.BRUTO"]) * 100
-                        dados = dados.sort_values("% LUCRO")
-                        maiores = dados.tail(top_n).to_dict(orient="records")
-                        menores = dados.head(top_n).to_dict(orient="records")
-                        return maiores, menores
-            
-                    grupos = ["CLIENTE", "SKU", "REDE", "VENDEDOR"]
-                    resumo_impacto = {}
-                    for g in grupos:
-                        if g in dados.columns:
-                            maiores, menores = top_contribuintes(dados, g, top_n=10)
-                            resumo_impacto[g] = {"maiores": maiores, "menores": menores}
-            
-                    resumo_exec = {
-                        "Faturamento Total ": f"R$ {dados['VL.BRUTO'].sum():,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
-                        "Lucro Líquido Total ": f"R$ {dados['LUCRO LIQ'].sum():,.2f}".replace(",", "X").replace(".", ",").replace("X", "."),
-                        "Margem Média ": f"{(dados['LUCRO LIQ'].sum() / dados['VL.BRUTO'].sum()) * 100:.2f}%",
-                    }
-            
-                    prompt = f"""
-                    Você é um analista de dados comerciais.
-                    Com base nas informações abaixo, gere um relatório estratégico destacando:
-            
-                    ✅ Diagnóstico da Margem: quais clientes, produtos (SKUs), redes e vendedores aumentam ou reduzem a margem (% lucro)?
-                    ✅ Apresente os **Top 10 que mais AUMENTAM** e os **Top 10 que mais REDUZEM** a margem para cada um dos grupos (cliente, produto, rede, vendedor).
-                    ✅ Apresente um plano de ação com sugestões específicas por grupo para elevar a margem global.
-            
-                    Resumo Executivo:
-                    {resumo_exec}
-            
-                    Impacto por Grupo:
-                    {resumo_impacto}
-            
-                    Gere a resposta em linguagem clara e executiva.
-                    """
-            
-                    resposta = openai.ChatCompletion.create(
-                        model="gpt-4o",
-                        messages=[{"role": "user", "content": prompt}],
-                        temperature=0.3,
-                        max_tokens=2000
-                    )
-                    return resposta["choices"][0]["message"]["content"]
-            
-                except Exception as e:
-                    st.error(f"Erro ao gerar relatório: {str(e)}")
-                    return None
-            
             # =============================
             # BLOCOS DE EXECUÇÃO (ajustado)
             # =============================
@@ -357,13 +407,127 @@ if uploaded_file:
                 with st.expander("📄 Análise Estratégica - AI insights"):
                     st.markdown("Relatório interpretativo com destaques dos principais fatores que impactam a margem.")
             
-                    if st.button("📌 Gerar Diagnóstico"):
-                        with st.spinner("Analisando impacto por Cliente, Produto, Rede e Vendedor..."):
-                            relatorio = gerar_relatorio_estrategico(df_filtro)
-                            if relatorio:
-                                st.markdown("---")
-                                st.markdown(relatorio)
-                                st.success("✅ Diagnóstico gerado com sucesso!")
+                    # Prompt compacto (maiores/menores margens por grupo) dentro do orçamento de tokens
+                    col_top, col_orcamento = st.columns(2)
+                    top_k = col_top.number_input("Top/Bottom por grupo", min_value=1, max_value=50, value=TOP_PADRAO)
+                    orcamento = col_orcamento.number_input("Orçamento de tokens", min_value=300, max_value=20000,
+                                                           value=ORCAMENTO_PADRAO, step=100)
+                    assinatura = (
+                        tuple((a.name, a.size) for a in uploaded_file), leitura_em_blocos, tuple(selecoes.items())
+                    )
+                    # Dois passos: "Montar Prompt" monta e mede (com as agregações por REDE e VENDEDOR);
+                    # "Gerar Diagnóstico" envia o prompt conferido. Outros filtros, Top ou orçamento
+                    # descartam o prompt montado.
+                    parametros = (assinatura, int(top_k), int(orcamento))
+                    montado = st.session_state.get("diagnostico_prompt")
+                    if montado is not None and montado["parametros"] != parametros:
+                        st.session_state.pop("diagnostico_prompt")
+                        montado = None
+
+                    col_montar, col_enviar = st.columns(2)
+                    if col_montar.button("🧩 Montar Prompt"):
+                        with instrumentacao.secao("prompt IA"):
+                            prompt, medidas = montar_prompt(plano, int(top_k), int(orcamento))
+                        montado = {"parametros": parametros, "prompt": prompt, "medidas": medidas}
+                        st.session_state.diagnostico_prompt = montado
+
+                    pode_enviar = montado is not None and montado["medidas"]["dentro_do_orcamento"]
+                    # O pedido vai para segundo plano; filtros iguais reaproveitam o resultado em cache
+                    if col_enviar.button("📌 Gerar Diagnóstico", disabled=not pode_enviar,
+                                         help=None if pode_enviar else "Monte um prompt dentro do orçamento primeiro."):
+                        tarefa = obter_gerenciador_diagnostico().solicitar(montado["prompt"])
+                        st.session_state.diagnostico_chave = tarefa.chave
+                        st.session_state.diagnostico_assinatura = assinatura
+
+                    if montado is not None:
+                        medidas = montado["medidas"]
+                        st.caption(
+                            f"Prompt: {medidas['tokens']} tokens ({medidas['metodo']}) de {medidas['orcamento']}, "
+                            f"Top {medidas['k']} por grupo, montado em {medidas['tempo_ms']:.1f} ms."
+                        )
+                        if not medidas["dentro_do_orcamento"]:
+                            st.error(
+                                f"O prompt não cabe em {medidas['orcamento']} tokens nem sem as tabelas por grupo. "
+                                "Aumente o orçamento de tokens e monte de novo."
+                            )
+                        elif medidas["grupos_descartados"]:
+                            st.warning(
+                                f"Para caber no orçamento, o prompt saiu sem os grupos: "
+                                f"{', '.join(medidas['grupos_descartados'])}. Aumente o orçamento para incluí-los."
+                            )
+                    exibir_diagnostico(assinatura)
+        st.caption(
+            f"Agregações: {plano.pedidos} consultas atendidas com {plano.varreduras} varreduras "
+            f"({plano.varreduras_economizadas} evitadas)."
+        )
+
+        # =============================
+        # REPRECIFICAÇÃO DA CARTEIRA (custos atuais x lucro faturado)
+        # =============================
+        st.markdown("---")
+        st.header("🔁 Reprecificação da Carteira")
+
+        if st.checkbox("Refazer o lucro de cada linha com uma tabela de custos"):
+            st.markdown("Cada linha da nota é ligada à tabela de custos por **UF** e **SKU** (Descrição) e o lucro é "
+                        "recalculado como no forma-preco, com o preço (VL.BRUTO / QTDE), a quantidade e o TIPO_FRETE da linha. "
+                        "Vale para a carteira completa, sem os filtros acima.")
+            arquivo_custos = st.file_uploader("Tabela de custos (padrão: Custo de reposição.xlsx)", type=["xlsx"],
+                                              key="custos_reprecificacao")
+            colr1, colr2, colr3 = st.columns(3)
+            frete_caixa = colr1.number_input("Frete por Caixa (R$)", min_value=0.0, value=1.50, step=0.01)
+            contrato_percentual = colr2.number_input("% Contrato", min_value=0.0, max_value=100.0, value=1.00, step=0.01)
+            aumento_custo = colr3.number_input("Aumento do Custo NET (%)", min_value=-100.0, value=0.0, step=0.5)
+
+            custos, chave_custos = None, None
+            if arquivo_custos is not None:
+                custos, chave_custos = carregar_tabela_custos_bytes(arquivo_custos.getvalue()), arquivo_custos.file_id
+            elif os.path.exists(ARQUIVO_CUSTOS_PADRAO):
+                custos, chave_custos = carregar_tabela_custos(ARQUIVO_CUSTOS_PADRAO), os.path.getmtime(ARQUIVO_CUSTOS_PADRAO)
+            else:
+                st.warning("Envie a tabela de custos para reprecificar a carteira.")
+
+            if custos is not None:
+                with instrumentacao.secao("reprecificação"):
+                    reprecificacao = reprecificar_base(
+                        uploaded_file, leitura_em_blocos, custos, chave_custos,
+                        frete_caixa, contrato_percentual / 100, aumento_custo / 100
+                    )
+
+                if reprecificacao is not None:
+                    comparativos = reprecificacao["comparativos"]
+                    # Totais: qualquer dimensão soma todas as linhas (grupos sem valor incluídos)
+                    totais = next(iter(comparativos.values()))[MEDIDAS_REPRECIFICACAO].sum()
+                    base = totais["VL.BRUTO"]
+                    perc_real = totais["LUCRO LIQ"] / base * 100 if base > 0 else 0
+                    perc_recusteado = totais[LUCRO_RECUSTEADO] / base * 100 if base > 0 else 0
+
+                    colm1, colm2, colm3 = st.columns(3)
+                    colm1.metric("Faturamento com custo (R$)", formatar_moeda(base))
+                    colm2.metric("Lucro Líquido faturado (R$)", f"{formatar_moeda(totais['LUCRO LIQ'])} ({perc_real:.2f}%)")
+                    colm3.metric("Lucro Líquido recusteado (R$)",
+                                 f"{formatar_moeda(totais[LUCRO_RECUSTEADO])} ({perc_recusteado:.2f}%)",
+                                 f"{perc_recusteado - perc_real:+.2f} p.p.")
+                    st.caption(
+                        f"{formatar_valor(reprecificacao['linhas'])} linhas reprecificadas em "
+                        f"{reprecificacao['segundos']:.1f}s (leitura da carteira: {reprecificacao['segundos_leitura']:.1f}s, "
+                        f"feita uma vez por upload). Sem custo cadastrado: "
+                        f"{formatar_moeda(totais[VL_SEM_CUSTO])} de faturamento, fora das margens comparadas."
+                    )
+
+                    formatos = {
+                        "VL.BRUTO": moeda_br, "LUCRO LIQ": moeda_br, LUCRO_RECUSTEADO: moeda_br,
+                        VL_SEM_CUSTO: moeda_br, "DIFERENÇA (R$)": moeda_br, "QTDE": inteiro_br,
+                        "% LUCRO REAL": percentual_br, "% LUCRO RECUSTEADO": percentual_br,
+                        "DIFERENÇA (p.p.)": percentual_br,
+                    }
+                    rotulos = {"CLIENTE": "Por Cliente", "SKU": "Por SKU", "VENDEDOR": "Por Vendedor"}
+                    for aba, (dimensao, comparativo) in zip(st.tabs([rotulos[d] for d in comparativos]), comparativos.items()):
+                        with aba, instrumentacao.secao("tabelas"):
+                            st.dataframe(
+                                tabela_formatada(comparativo, formatos, destaque="% LUCRO RECUSTEADO"),
+                                use_container_width=True
+                            )
+
         # =============================
         # NOTA EXPLICATIVA E METODOLOGIA DE CÁLCULO
         # =============================
@@ -446,3 +610,4 @@ if uploaded_file:
         Para projeções e simulações, recomenda-se utilizar módulos específicos.
         """)
 
+exibir_instrumentacao(instrumentacao)
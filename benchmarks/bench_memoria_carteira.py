@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Pico de memória (RSS) da carga da CARTEIRA: leitura completa x leitura em blocos.
+# Cada medição roda em um processo novo para que o pico de uma não contamine a outra.
+# Uso: python benchmarks/bench_memoria_carteira.py [linhas ...]
+
+
+def medir(modo, arquivo):
+    from carteira import carregar_carteira, carregar_carteira_em_blocos
+    from cubo_carteira import construir_cubo, construir_cubo_em_blocos
+    from instrumentacao import pico_rss
+
+    base = pico_rss()
+    inicio = time.perf_counter()
+    if modo == "blocos":
+        blocos, _ = carregar_carteira_em_blocos(arquivo)
+        cubo = construir_cubo_em_blocos(blocos)
+    else:
+        carteira_df, _ = carregar_carteira(arquivo)
+        cubo = construir_cubo(carteira_df)
+    tempo = time.perf_counter() - inicio
+    print(f"{tempo:.2f} {(pico_rss() - base) / 1024 ** 2:.1f} {len(cubo)}")
+
+
+def main(tamanhos):
+    from dados_sinteticos import gravar_carteira_xlsx
+
+    print(f"{'linhas':>10} {'modo':>9} {'tempo (s)':>10} {'pico RSS (MB)':>14} {'células':>9}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for n in tamanhos:
+            arquivo = gravar_carteira_xlsx(os.path.join(pasta, f"carteira_{n}.xlsx"), n)
+            for modo in ("completo", "blocos"):
+                saida = subprocess.run(
+                    [sys.executable, __file__, "--medir", modo, arquivo],
+                    capture_output=True, text=True, check=True
+                ).stdout.split()
+                tempo, pico, celulas = saida[-3:]
+                print(f"{n:>10} {modo:>9} {float(tempo):>10.2f} {float(pico):>14.1f} {int(celulas):>9}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--medir":
+        medir(sys.argv[2], sys.argv[3])
+    else:
+        main([int(x) for x in sys.argv[1:]] or [25_000, 50_000, 100_000, 200_000])
@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from dados_sinteticos import gerar_custos  # noqa: E402
+from motor_preco import COLUNAS_DESPESAS, calcular_precos  # noqa: E402
+
+# Compara o caminho antigo (apply linha a linha) com o motor vetorizado
+# Uso: python benchmarks/bench_motor_preco.py [linhas ...]
+
+
+def calcular_linha(row, tipo_frete="CIF"):
+    preco_venda = row["Preço de Venda"]
+    qtd = row["Quantidade"]
+    subtotal = preco_venda * qtd
+    frete_total = row["Frete Caixa"] * qtd if tipo_frete == "CIF" else 0
+    frete_unit = row["Frete Caixa"] if tipo_frete == "CIF" else 0
+    ipi_total = subtotal * row["IPI"]
+    base_icms_st = (subtotal + ipi_total) * (1 + row["MVA"])
+    icms_st = max((base_icms_st * row["ICMS"]) - subtotal * row["ICMS"], 0)
+    custo_total_unit = row["Custo NET"] + row["Custo Fixo"]
+    despesas_percentuais = sum(row[c] for c in COLUNAS_DESPESAS)
+    despesas_reais = preco_venda * despesas_percentuais * qtd + frete_total
+    lucro_bruto = (preco_venda - custo_total_unit) * qtd - despesas_reais
+    lucro_liquido = lucro_bruto / 1.34 if lucro_bruto > 0 else lucro_bruto
+    if lucro_liquido < 0 and despesas_percentuais < 1:
+        preco_equilibrio_unit = round((custo_total_unit + frete_unit) / (1 - despesas_percentuais), 2)
+    else:
+        preco_equilibrio_unit = preco_venda
+    return pd.Series({
+        "Subtotal (R$)": subtotal,
+        "Lucro Líquido (R$)": lucro_liquido,
+        "Total NF (R$)": subtotal + ipi_total + icms_st,
+        "Ponto de Equilíbrio (R$)": preco_equilibrio_unit,
+    })
+
+
+def cronometrar(func, repeticoes=3):
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main(tamanhos):
+    print(f"{'linhas':>10} {'apply (s)':>12} {'vetorizado (s)':>16} {'ganho':>8}")
+    for n in tamanhos:
+        df = gerar_custos(n)
+        t_vet = cronometrar(lambda: calcular_precos(df, "CIF"))
+        # O apply fica impraticável acima de ~100 mil linhas; nesses casos é extrapolado
+        amostra = df.head(min(n, 20_000))
+        t_apply = cronometrar(lambda: amostra.apply(calcular_linha, axis=1), repeticoes=1) * n / len(amostra)
+        print(f"{n:>10} {t_apply:>12.3f} {t_vet:>16.4f} {t_apply / t_vet:>7.0f}x")
+
+
+if __name__ == "__main__":
+    tamanhos = [int(x) for x in sys.argv[1:]] or [1_000, 10_000, 100_000, 500_000]
+    main(tamanhos)
@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Teste de carga do servico_precos.py: requisições/s e latência p50/p99 por tamanho de lote e formato.
+# Sem --url, sobe o serviço localmente com a tabela padrão e o encerra no fim.
+# Uso: python benchmarks/carga_servico.py [--url http://127.0.0.1:8080] [--lotes 1 10 100 1000]
+#          [--formatos json arrow] [--requisicoes 200] [--concorrencia 8] [--rota precos]
+
+TIPO_ARROW = "application/vnd.apache.arrow.stream"
+
+
+def gerar_itens(tabela, n, seed=0):
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    linhas = tabela.iloc[rng.integers(0, len(tabela), n)]
+    return pd.DataFrame({
+        "Descrição": linhas["Descrição"].to_numpy(),
+        "UF": linhas["UF"].to_numpy(),
+        "Preço de Venda": np.round(rng.uniform(5, 40, n), 2),
+        "Quantidade": rng.integers(1, 500, n),
+        "Preço Sobel": np.round(rng.uniform(5, 40, n), 2),
+    })
+
+
+def corpo_pedido(itens, formato):
+    if formato == "json":
+        corpo = {"tipo_frete": "CIF", "frete": 1.5, "contrato": 1.0, "itens": itens.to_dict(orient="records")}
+        return json.dumps(corpo).encode("utf-8"), {"Content-Type": "application/json"}, ""
+    import pyarrow as pa
+
+    tabela = pa.Table.from_pandas(itens, preserve_index=False)
+    saida = io.BytesIO()
+    with pa.ipc.new_stream(saida, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return saida.getvalue(), {"Content-Type": TIPO_ARROW}, "?tipo_frete=CIF&frete=1.5&contrato=1.0"
+
+
+async def disparar(url, corpo, cabecalhos, requisicoes, concorrencia):
+    import aiohttp
+
+    latencias = []
+    erros = 0
+    fila = iter(range(requisicoes))
+
+    async def trabalhador(sessao):
+        nonlocal erros
+        for _ in fila:
+            inicio = time.perf_counter()
+            async with sessao.post(url, data=corpo, headers=cabecalhos) as resposta:
+                await resposta.read()
+                if resposta.status != 200:
+                    erros += 1
+            latencias.append(time.perf_counter() - inicio)
+
+    async with aiohttp.ClientSession() as sessao:
+        # Aquecimento: conexões abertas e caminhos de código já carregados
+        async with sessao.post(url, data=corpo, headers=cabecalhos) as resposta:
+            await resposta.read()
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabalhador(sessao) for _ in range(concorrencia)))
+        total = time.perf_counter() - inicio
+    return np.array(latencias), total, erros
+
+
+def aguardar_servico(url, processo, limite=60):
+    import urllib.request
+
+    fim = time.time() + limite
+    while time.time() < fim:
+        if processo.poll() is not None:
+            raise RuntimeError("O serviço encerrou antes de responder")
+        try:
+            urllib.request.urlopen(f"{url}/saude", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("O serviço não respondeu a tempo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do serviço de precificação.")
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--tabela", default="Custo de reposição.xlsx")
+    parser.add_argument("--rota", choices=["precos", "equilibrio", "sobel"], default="precos")
+    parser.add_argument("--lotes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--formatos", nargs="+", choices=["json", "arrow"], default=["json", "arrow"])
+    parser.add_argument("--requisicoes", type=int, default=200)
+    parser.add_argument("--concorrencia", type=int, default=8)
+    args = parser.parse_args()
+
+    from servico_precos import TabelaCustos
+
+    tabela = TabelaCustos(args.tabela).tabela
+    processo = None
+    url = args.url
+    if url is None:
+        url = "http://127.0.0.1:8766"
+        processo = subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "servico_precos.py"),
+             args.tabela, "--porta", "8766"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        aguardar_servico(url, processo)
+
+    print(f"{'formato':>8} {'lote':>7} {'req/s':>9} {'linhas/s':>11} {'p50 (ms)':>9} {'p99 (ms)':>9} {'erros':>6}")
+    try:
+        for formato in args.formatos:
+            for lote in args.lotes:
+                corpo, cabecalhos, query = corpo_pedido(gerar_itens(tabela, lote), formato)
+                latencias, total, erros = asyncio.run(disparar(
+                    f"{url}/{args.rota}{query}", corpo, cabecalhos, args.requisicoes, args.concorrencia
+                ))
+                rps = len(latencias) / total
+                p50, p99 = np.percentile(latencias * 1000, [50, 99])
+                print(f"{formato:>8} {lote:>7} {rps:>9.1f} {rps * lote:>11,.0f} {p50:>9.2f} {p99:>9.2f} {erros:>6}")
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+# Dados sintéticos com o layout da aba CARTEIRA (app.py) e da planilha "Custo de reposição.xlsx" (forma-preco.py).
+# Como na base real, cada cliente tem uma rede, um vendedor (e supervisor) e uma condição de frete.
+
+UFS = ["SP", "RJ", "PR", "RS", "ES", "MG"]
+SKUS = [
+    "ÁGUA SANITÁRIA 5L", "ÁGUA SANITÁRIA 2L", "ÁGUA SANITÁRIA 1L",
+    "CLORO DE 5L / PRO", "CLORO DE 2,5L", "ALVEJANTE 1.5L",
+    "AMACIANTE 5L", "AMACIANTE 2L",
+    "DESINF. 2L", "DESINF. 2L CLORADO", "DESINF. 5L",
+    "LAVA LOUÇAS 500ML", "LAVA LOUÇAS 5L",
+    "LAVA ROUPAS 5L", "LAVA ROUPAS 3L", "LAVA ROUPAS 1L",
+    "LIMPA VIDROS SQUEEZE 500ML", "DESENGORDURANTE 500ML",
+    "MULTI-USO 500ML", "REMOVEDOR 1L", "REMOVEDOR 500ML"
+]
+# Alíquotas por UF na faixa da tabela real (ICMS interno, PIS e COFINS)
+ICMS_UF = {"SP": 0.18, "RJ": 0.18, "PR": 0.12, "RS": 0.12, "ES": 0.07, "MG": 0.12}
+PIS_COFINS = [(0.01353, 0.06232), (0.01452, 0.06688), (0.015345, 0.07068)]
+
+
+def _nomes(prefixo, quantidade, indices):
+    return np.array([f"{prefixo} {i:04d}" for i in range(quantidade)], dtype=object)[indices]
+
+
+def gerar_carteira(n_linhas, seed=0, clientes=2000, redes=50, sups=8, vendedores=60):
+    rng = np.random.default_rng(seed)
+    qtde = rng.integers(1, 200, n_linhas).astype(float)
+    preco = rng.uniform(5, 40, n_linhas)
+    vl_bruto = qtde * preco
+    cliente = rng.integers(0, clientes, n_linhas)
+    return pd.DataFrame({
+        "CLIENTE": _nomes("CLIENTE", clientes, cliente),
+        "UF": np.array(UFS, dtype=object)[cliente % len(UFS)],
+        "SKU": np.array(SKUS, dtype=object)[rng.integers(0, len(SKUS), n_linhas)],
+        "REDE": _nomes("REDE", redes, cliente % redes),
+        "SUP": _nomes("SUP", sups, cliente % vendedores % sups),
+        "VENDEDOR": _nomes("VENDEDOR", vendedores, cliente % vendedores),
+        "TIPO_FRETE": np.where(cliente % 10 < 7, "C", "F").astype(object),
+        "QTDE": qtde,
+        "VL.BRUTO": vl_bruto,
+        "LUCRO LIQ": vl_bruto * rng.normal(0.05, 0.08, n_linhas),
+        "FRETE TOTAL": qtde * 1.5,
+    })
+
+
+# Grava a planilha com as abas CARTEIRA e Mark-up em modo streaming (openpyxl write_only)
+def gravar_carteira_xlsx(caminho, n_linhas, seed=0, tamanho_bloco=50_000):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    aba = workbook.create_sheet("CARTEIRA")
+    for inicio in range(0, n_linhas, tamanho_bloco):
+        bloco = gerar_carteira(min(tamanho_bloco, n_linhas - inicio), seed=seed + inicio)
+        if inicio == 0:
+            aba.append(list(bloco.columns))
+        for linha in bloco.itertuples(index=False):
+            aba.append(list(linha))
+    markup = workbook.create_sheet("Mark-up")
+    markup.append(["SKU", "MARK-UP"])
+    for sku in SKUS:
+        markup.append([sku, 1.35])
+    workbook.save(caminho)
+    return caminho
+
+
+# Linhas UF × SKU com as colunas da tabela de custos; Preço de Venda e Quantidade já preenchidos
+def gerar_custos(n_linhas, seed=0):
+    rng = np.random.default_rng(seed)
+    uf = np.array(UFS, dtype=object)[rng.integers(0, len(UFS), n_linhas)]
+    pis, cofins = np.array(PIS_COFINS).T[:, rng.integers(0, len(PIS_COFINS), n_linhas)]
+    custo_net = rng.uniform(2, 20, n_linhas)
+    return pd.DataFrame({
+        "Descrição": np.array(SKUS, dtype=object)[rng.integers(0, len(SKUS), n_linhas)],
+        "UF": uf,
+        "Custo NET": custo_net,
+        "Custo Fixo": 3.57,
+        "Preço de Venda": np.round(custo_net * rng.uniform(1.1, 2.2, n_linhas), 2),
+        "ICMS": pd.Series(uf).map(ICMS_UF).to_numpy(dtype=float),
+        "PIS": pis,
+        "COFINS": cofins,
+        "Comissão": 0.0288,
+        "IPI": rng.choice([0.0, 0.0325, 0.05], n_linhas),
+        "Bonificação": 0.03,
+        "Contigência": 0.01,
+        "Contrato": 0.01,
+        "Frete Caixa": 1.50,
+        "MVA": rng.choice([0.0, 0.3208, 0.4238, 0.5686], n_linhas),
+        "%Estrategico": 0.0,
+        "ICMS ST": 0.0,
+        "Quantidade": rng.integers(1, 500, n_linhas).astype(float),
+    })
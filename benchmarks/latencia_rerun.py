@@ -0,0 +1,228 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from instrumentacao import pico_rss  # noqa: E402
+
+# Latência de rerun de ponta a ponta das páginas Streamlit (app.py, forma-preco.py, simulador_lote.py),
+# sem navegador, com a API de testes do Streamlit (AppTest). Para cada página e tamanho de planilha
+# sintética, roteiriza as interações do usuário e mede o tempo de cada rerun e o pico de memória.
+# Cada tamanho roda em um processo próprio, então o pico de RSS é o daquele tamanho.
+# Uso: python benchmarks/latencia_rerun.py [--paginas app forma-preco simulador_lote]
+#          [--linhas-carteira 10000 50000 200000] [--linhas-custos 126 1000 10000 100000]
+#          [--repeticoes 3] [--json resultado.json]
+
+PAGINAS = {
+    "app": "app.py",
+    "forma-preco": "forma-preco.py",
+    "simulador_lote": "simulador_lote.py",
+}
+FILTROS_APP = [
+    "Filtrar Cliente", "Filtrar UF", "Filtrar Produto (SKU)",
+    "Filtrar Rede", "Filtrar Supervisor", "Filtrar Vendedor",
+]
+TIPO_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+TIMEOUT = 900
+
+
+def _por_rotulo(elementos, rotulo):
+    for elemento in elementos:
+        if elemento.label == rotulo:
+            return elemento
+    raise LookupError(f"Widget não encontrado: {rotulo}")
+
+
+def _editor(at):
+    # O data_editor aparece na árvore como dataframe editável (editing_mode != READ_ONLY)
+    for elemento in at.dataframe:
+        if elemento.proto.editing_mode:
+            return elemento
+    raise LookupError("data_editor não encontrado")
+
+
+# Reexecuta com uma edição no data_editor. A AppTest ainda não simula edições de célula, então o
+# estado do widget (o mesmo que o navegador envia) é gravado em at.session_state pelo id do editor,
+# como qualquer widget sem chave, e a página roda de novo com at.run().
+def _rerun_com_edicao(at, linha, coluna, valor):
+    at.session_state[_editor(at).proto.id] = {
+        "edited_rows": {str(linha): {coluna: valor}}, "added_rows": [], "deleted_rows": []
+    }
+    at.run()
+
+
+class Roteiro:
+    def __init__(self, at, repeticoes):
+        self.at = at
+        self.repeticoes = repeticoes
+        self.medidas = []
+
+    # Mede `repeticoes` reruns: preparar(i) ajusta os widgets da i-ésima interação (fora do tempo)
+    # e rerun(i), se informado, substitui o at.run() (edições no data_editor)
+    def medir(self, nome, preparar=None, rerun=None, repeticoes=None):
+        tempos = []
+        for i in range(repeticoes or self.repeticoes):
+            if preparar is not None:
+                preparar(i)
+            inicio = time.perf_counter()
+            if rerun is None:
+                self.at.run()
+            else:
+                rerun(i)
+            tempos.append(time.perf_counter() - inicio)
+            if self.at.exception:
+                raise RuntimeError(f"{nome}: {self.at.exception[0].value}")
+        self.medidas.append({
+            "interacao": nome,
+            "mediana_ms": statistics.median(tempos) * 1000,
+            "max_ms": max(tempos) * 1000,
+            "pico_rss_mb": pico_rss() / 1024 ** 2,
+        })
+
+    def upload(self, arquivo):
+        with open(arquivo, "rb") as f:
+            conteudo = f.read()
+        _remover_sidecar(conteudo)
+        enviar = lambda i: self.at.file_uploader[0].set_value((os.path.basename(arquivo), conteudo, TIPO_XLSX))
+        self.medir("upload", enviar, repeticoes=1)
+
+
+# Alterna o widget entre os valores; `widget` é uma função porque a árvore muda a cada rerun
+def _alternar(widget, valores):
+    def preparar(i):
+        widget().set_value(valores[i % len(valores)])
+    return preparar
+
+
+def roteiro_app(roteiro, arquivo):
+    at = roteiro.at
+    roteiro.medir("abertura", repeticoes=1)
+    roteiro.upload(arquivo)
+    for rotulo in FILTROS_APP:
+        widget = lambda rotulo=rotulo: _por_rotulo(at.selectbox, rotulo)
+        if len(widget().options) < 2:
+            continue
+        # Ida e volta (valor → Todos): cada filtro é medido isoladamente, sem acumular com os anteriores
+        roteiro.medir(rotulo, _alternar(widget, [widget().options[1], "Todos"]))
+
+
+def roteiro_forma_preco(roteiro, arquivo):
+    at = roteiro.at
+    roteiro.medir("abertura", repeticoes=1)
+    roteiro.upload(arquivo)
+    uf = lambda: _por_rotulo(at.sidebar.selectbox, "Selecione a UF")
+    roteiro.medir("trocar UF", _alternar(uf, [uf().options[1], uf().options[0]]))
+    frete = lambda: _por_rotulo(at.sidebar.radio, "Tipo de Frete")
+    roteiro.medir("CIF/FOB", _alternar(frete, ["FOB", "CIF"]))
+    roteiro.medir("editar célula", rerun=lambda i: _rerun_com_edicao(at, 0, "Preço de Venda", 20.0 + i))
+    roteiro.medir("ponto de equilíbrio", lambda i: at.button[0].click())
+
+
+def roteiro_simulador_lote(roteiro, arquivo):
+    at = roteiro.at
+    roteiro.medir("abertura", repeticoes=1)
+    roteiro.medir("editar célula", rerun=lambda i: _rerun_com_edicao(at, 0, "PREÇO SOBEL", 20.0 + i))
+    icms = lambda: _por_rotulo(at.sidebar.number_input, "ICMS (%)")
+    roteiro.medir("ICMS", _alternar(icms, [12.0, 18.0]))
+
+
+ROTEIROS = {
+    "app": roteiro_app,
+    "forma-preco": roteiro_forma_preco,
+    "simulador_lote": roteiro_simulador_lote,
+}
+
+
+# O upload deve medir a leitura do XLSX, não o sidecar Parquet de custos de uma execução anterior
+def _remover_sidecar(conteudo):
+    from cache_custos import DIRETORIO_SIDECAR, hash_conteudo
+
+    caminho = os.path.join(RAIZ, DIRETORIO_SIDECAR, f"{hash_conteudo(conteudo)}.parquet")
+    if os.path.exists(caminho):
+        os.remove(caminho)
+
+
+def gerar_planilha(pagina, linhas, diretorio):
+    caminho = os.path.join(diretorio, f"{'carteira' if pagina == 'app' else 'custos'}_{linhas}.xlsx")
+    if pagina == "app":
+        from dados_sinteticos import gravar_carteira_xlsx
+
+        gravar_carteira_xlsx(caminho, linhas)
+    elif pagina == "forma-preco":
+        from dados_sinteticos import gerar_custos
+
+        gerar_custos(linhas).drop(columns=["Quantidade", "ICMS ST"]).to_excel(caminho, index=False)
+    else:
+        return None
+    return caminho
+
+
+# Processo filho: roda o roteiro de uma página para uma planilha e imprime as medidas em JSON
+def executar_filho(pagina, arquivo, repeticoes):
+    from streamlit.testing.v1 import AppTest
+
+    os.chdir(RAIZ)
+    at = AppTest.from_file(os.path.join(RAIZ, PAGINAS[pagina]), default_timeout=TIMEOUT)
+    roteiro = Roteiro(at, repeticoes)
+    ROTEIROS[pagina](roteiro, arquivo)
+    print(json.dumps(roteiro.medidas))
+
+
+def medir_tamanho(pagina, linhas, diretorio, repeticoes):
+    inicio = time.perf_counter()
+    arquivo = gerar_planilha(pagina, linhas, diretorio)
+    if arquivo is not None:
+        print(f"  {pagina}: planilha de {linhas:,} linhas gerada em {time.perf_counter() - inicio:.1f}s".replace(",", "."),
+              file=sys.stderr)
+    processo = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--filho", pagina, arquivo or "", str(repeticoes)],
+        capture_output=True, text=True, cwd=RAIZ
+    )
+    if processo.returncode != 0:
+        return {"erro": processo.stderr.strip().splitlines()[-1] if processo.stderr.strip() else "falhou"}
+    return {"medidas": json.loads(processo.stdout.strip().splitlines()[-1])}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--filho":
+        pagina, arquivo, repeticoes = sys.argv[2:5]
+        executar_filho(pagina, arquivo or None, int(repeticoes))
+        return
+
+    parser = argparse.ArgumentParser(description="Latência de rerun das páginas Streamlit por tamanho de dados.")
+    parser.add_argument("--paginas", nargs="+", choices=list(PAGINAS), default=list(PAGINAS))
+    parser.add_argument("--linhas-carteira", type=int, nargs="+", default=[10_000, 50_000, 200_000])
+    parser.add_argument("--linhas-custos", type=int, nargs="+", default=[126, 1_000, 10_000, 100_000])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--json", default=None, help="Grava todas as medidas neste arquivo")
+    args = parser.parse_args()
+
+    tamanhos = {"app": args.linhas_carteira, "forma-preco": args.linhas_custos, "simulador_lote": [20]}
+    resultados = []
+    print(f"{'página':>15} {'linhas':>9} {'interação':>24} {'mediana (ms)':>13} {'máx (ms)':>10} {'pico RSS (MB)':>14}")
+    with tempfile.TemporaryDirectory() as diretorio:
+        for pagina in args.paginas:
+            for linhas in tamanhos[pagina]:
+                resultado = medir_tamanho(pagina, linhas, diretorio, args.repeticoes)
+                resultados.append({"pagina": pagina, "linhas": linhas, **resultado})
+                if "erro" in resultado:
+                    print(f"{pagina:>15} {linhas:>9,} {'ERRO':>24} {resultado['erro']}".replace(",", "."))
+                    continue
+                for m in resultado["medidas"]:
+                    print(f"{pagina:>15} {linhas:>9,} {m['interacao']:>24} {m['mediana_ms']:>13,.1f} "
+                          f"{m['max_ms']:>10,.1f} {m['pico_rss_mb']:>14,.0f}".replace(",", "X").replace(".", ",").replace("X", "."))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=1)
+
+
+if __name__ == "__main__":
+    main()
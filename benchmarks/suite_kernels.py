@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from cubo_carteira import construir_cubo, consolidar_cubo  # noqa: E402
+from dados_sinteticos import gerar_carteira, gerar_custos  # noqa: E402
+from formatacao import moeda_br, percentual_br, tabela_formatada  # noqa: E402
+from indice_carteira import construir_indice, filtrar_posicoes  # noqa: E402
+from motor_preco import calcular_precos, preencher_preco_equilibrio, preencher_preco_margem  # noqa: E402
+from preco_sobel import calcular_preco_sobel, inverter_preco_sobel  # noqa: E402
+
+# Micro-benchmarks dos kernels de precificação, inversão Sobel, agregação e formatação.
+# Cada kernel roda sobre dados sintéticos com o layout da tabela de custos ou da CARTEIRA,
+# em tamanhos 10³ ... 10^max. Cada tempo é a mediana de várias repetições e vai para um histórico
+# JSON. A execução falha (código 1) quando um kernel fica mais lento que a referência (mediana das
+# últimas execuções na mesma máquina) além do limite e a lentidão se repete ao medir de novo.
+# Uso: python benchmarks/suite_kernels.py [--max-expoente 7] [--kernels calcular_precos ...]
+#          [--limite 0.25] [--confirmacoes 1] [--historico benchmarks/historico_kernels.json] [--nao-gravar]
+
+HISTORICO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "historico_kernels.json")
+LIMITE_PADRAO = 0.25
+JANELA_PADRAO = 5
+# Abaixo desta diferença absoluta o ruído de medição domina; não conta como regressão
+PISO_SEGUNDOS = 0.0005
+TEMPO_MINIMO = 0.2
+MIN_REPETICOES = 5
+MAX_REPETICOES = 9
+# Nova medição de cada suspeita antes de falhar; só é regressão se todas passarem do limite
+CONFIRMACOES_PADRAO = 1
+# Execuções gravadas com o melhor tempo (versões anteriores) não servem de referência para medianas
+ESTATISTICA = "mediana"
+
+
+def _preparar_custos(n):
+    df = gerar_custos(n)
+    return {
+        "custos": df,
+        "sobel": (
+            calcular_preco_sobel(df["Preço de Venda"].to_numpy(), df["MVA"].to_numpy(),
+                                 df["IPI"].to_numpy(), df["ICMS"].to_numpy()),
+            df["MVA"].to_numpy(), df["IPI"].to_numpy(), df["ICMS"].to_numpy(),
+        ),
+    }
+
+
+def _preparar_carteira(n):
+    carteira = gerar_carteira(n)
+    cubo = construir_cubo(carteira)
+    return {
+        "carteira": carteira,
+        "cubo": cubo,
+        "indice": construir_indice(carteira),
+        "selecao": {"UF": "SP", "SKU": carteira["SKU"].iat[0]},
+        "tabela": carteira[["CLIENTE", "SKU", "VL.BRUTO", "LUCRO LIQ"]].assign(
+            **{"% LUCRO": carteira["LUCRO LIQ"] / carteira["VL.BRUTO"] * 100}
+        ),
+    }
+
+
+FORMATO_LUCRO = {"VL.BRUTO": moeda_br, "LUCRO LIQ": moeda_br, "% LUCRO": percentual_br}
+
+# nome: (dados, função, maior tamanho em que o kernel faz sentido)
+KERNELS = {
+    "calcular_precos": ("custos", lambda d: calcular_precos(d["custos"], "CIF"), None),
+    "preencher_preco_equilibrio": ("custos", lambda d: preencher_preco_equilibrio(d["custos"], "CIF"), None),
+    "preencher_preco_margem": ("custos", lambda d: preencher_preco_margem(d["custos"], 10.0, "CIF"), None),
+    "calcular_preco_sobel": ("custos", lambda d: calcular_preco_sobel(d["custos"]["Preço de Venda"].to_numpy(), *d["sobel"][1:]), None),
+    "inverter_preco_sobel": ("custos", lambda d: inverter_preco_sobel(*d["sobel"], casas=4), None),
+    "construir_cubo": ("carteira", lambda d: construir_cubo(d["carteira"]), None),
+    "consolidar_cubo_sku": ("carteira", lambda d: consolidar_cubo(d["cubo"], "SKU"), None),
+    "consolidar_cubo_cliente": ("carteira", lambda d: consolidar_cubo(d["cubo"], "CLIENTE"), None),
+    "filtrar_posicoes": ("carteira", lambda d: filtrar_posicoes(d["indice"], d["selecao"]), None),
+    "moeda_br": ("carteira", lambda d: moeda_br(d["carteira"]["VL.BRUTO"].to_numpy()), None),
+    # Tabelas exibidas raramente passam de milhares de linhas; 10⁷ linhas de texto não cabem na memória útil
+    "tabela_formatada": ("carteira", lambda d: tabela_formatada(d["tabela"], FORMATO_LUCRO, destaque="% LUCRO"), 1_000_000),
+}
+
+PREPARADORES = {"custos": _preparar_custos, "carteira": _preparar_carteira}
+
+
+# Mediana após um aquecimento: ao menos MIN_REPETICOES (3 em kernels que passam de TEMPO_MINIMO
+# sozinhos) e até acumular TEMPO_MINIMO, limitado a MAX_REPETICOES. Um pico isolado não move a mediana.
+def cronometrar(func):
+    func()
+    tempos = []
+    while len(tempos) < MAX_REPETICOES:
+        inicio = time.perf_counter()
+        func()
+        tempos.append(time.perf_counter() - inicio)
+        minimo = 3 if tempos[-1] >= TEMPO_MINIMO else MIN_REPETICOES
+        if sum(tempos) >= TEMPO_MINIMO and len(tempos) >= minimo:
+            break
+    return float(np.median(tempos))
+
+
+# `tamanhos_por_kernel` restringe os tamanhos de cada kernel (usado para medir de novo só as suspeitas)
+def executar(kernels, tamanhos, tamanhos_por_kernel=None):
+    resultados = {nome: {} for nome in kernels}
+    for n in tamanhos:
+        for esquema, preparar in PREPARADORES.items():
+            nomes = [
+                k for k in kernels
+                if KERNELS[k][0] == esquema and (KERNELS[k][2] is None or n <= KERNELS[k][2])
+                and (tamanhos_por_kernel is None or n in tamanhos_por_kernel.get(k, ()))
+            ]
+            if not nomes:
+                continue
+            dados = preparar(n)
+            for nome in nomes:
+                segundos = cronometrar(lambda: KERNELS[nome][1](dados))
+                resultados[nome][str(n)] = segundos
+                print(f"{nome:>28} {n:>10,} {segundos * 1000:>12.3f} ms {n / segundos:>14,.0f} linhas/s".replace(",", "."))
+            del dados
+    return resultados
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ler_historico(caminho):
+    if not os.path.exists(caminho):
+        return {"execucoes": []}
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def gravar_historico(caminho, historico):
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(historico, f, ensure_ascii=False, indent=1)
+    os.replace(temporario, caminho)
+
+
+# Referência por kernel e tamanho: mediana das últimas `janela` execuções nesta máquina.
+# O melhor tempo da janela seria uma referência otimista demais: qualquer execução normal
+# ficaria acima dela.
+def referencias(historico, maquina, janela=JANELA_PADRAO):
+    anteriores = [
+        e for e in historico["execucoes"]
+        if e.get("maquina") == maquina and e.get("estatistica") == ESTATISTICA
+    ][-janela:]
+    tempos_por_chave = {}
+    for execucao in anteriores:
+        for nome, tempos in execucao["resultados"].items():
+            for n, segundos in tempos.items():
+                tempos_por_chave.setdefault((nome, n), []).append(segundos)
+    return {chave: float(np.median(tempos)) for chave, tempos in tempos_por_chave.items()}
+
+
+# Lista de (kernel, tamanho, referência, atual) que passaram do limite
+def regressoes(resultados, medianas, limite=LIMITE_PADRAO):
+    encontradas = []
+    for nome, tempos in resultados.items():
+        for n, segundos in tempos.items():
+            referencia = medianas.get((nome, n))
+            if referencia is None:
+                continue
+            if segundos > referencia * (1 + limite) and segundos - referencia > PISO_SEGUNDOS:
+                encontradas.append((nome, n, referencia, segundos))
+    return encontradas
+
+
+# Mede de novo cada suspeita (dados recém-gerados) e mantém só as que continuam acima do limite.
+# O histórico recebe o menor dos tempos medidos: um pico passageiro não sobe a referência futura.
+def confirmar(encontradas, resultados, medianas, limite=LIMITE_PADRAO, confirmacoes=CONFIRMACOES_PADRAO):
+    for _ in range(confirmacoes):
+        if not encontradas:
+            break
+        suspeitas = {}
+        for nome, n, _, _ in encontradas:
+            suspeitas.setdefault(nome, set()).add(int(n))
+        tamanhos = sorted(set().union(*suspeitas.values()))
+        print(f"\nMedindo de novo {len(encontradas)} suspeita(s) de regressão...")
+        novos = executar(list(suspeitas), tamanhos, suspeitas)
+        for nome, tempos in novos.items():
+            for n, segundos in tempos.items():
+                resultados[nome][n] = min(resultados[nome][n], segundos)
+        encontradas = regressoes(novos, medianas, limite)
+    return encontradas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks dos kernels com histórico e detecção de regressão.")
+    parser.add_argument("--max-expoente", type=int, default=6, help="Maior tamanho: 10^N linhas (padrão 6)")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=None, help="Tamanhos explícitos (sobrepõe --max-expoente)")
+    parser.add_argument("--kernels", nargs="+", choices=list(KERNELS), default=list(KERNELS))
+    parser.add_argument("--historico", default=HISTORICO_PADRAO)
+    parser.add_argument("--limite", type=float, default=LIMITE_PADRAO, help="Lentidão tolerada (0.25 = 25%%)")
+    parser.add_argument("--janela", type=int, default=JANELA_PADRAO, help="Execuções anteriores usadas como referência")
+    parser.add_argument("--confirmacoes", type=int, default=CONFIRMACOES_PADRAO,
+                        help="Novas medições de cada suspeita antes de falhar (0 = falha na primeira)")
+    parser.add_argument("--nao-gravar", action="store_true", help="Compara, mas não acrescenta a execução ao histórico")
+    args = parser.parse_args()
+
+    tamanhos = args.tamanhos or [10 ** e for e in range(3, args.max_expoente + 1)]
+    maquina = f"{platform.node()} | {platform.processor() or platform.machine()} | {os.cpu_count()} CPU"
+
+    print(f"{'kernel':>28} {'linhas':>10} {'tempo':>15} {'vazão':>23}")
+    resultados = executar(args.kernels, tamanhos)
+
+    historico = ler_historico(args.historico)
+    medianas = referencias(historico, maquina, args.janela)
+    encontradas = confirmar(regressoes(resultados, medianas, args.limite), resultados, medianas,
+                            args.limite, args.confirmacoes)
+    if not args.nao_gravar:
+        historico["execucoes"].append({
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "commit": _commit(),
+            "maquina": maquina,
+            "estatistica": ESTATISTICA,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "resultados": resultados,
+        })
+        gravar_historico(args.historico, historico)
+
+    if encontradas:
+        print(f"\n{len(encontradas)} regressão(ões) acima de {args.limite:.0%}:")
+        for nome, n, referencia, segundos in encontradas:
+            print(f"  {nome} @ {int(n):,} linhas: {referencia * 1000:.3f} ms → {segundos * 1000:.3f} ms "
+                  f"(+{segundos / referencia - 1:.0%})".replace(",", "."))
+        sys.exit(1)
+    print("\nSem regressões.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Cache da tabela de custos por processo, compartilhado entre sessões do Streamlit.
+# Chave: caminho + mtime + tamanho -> hash do conteúdo -> DataFrame já normalizado.
+# Um sidecar Parquet (<hash>.parquet) evita reler o XLSX quando o processo reinicia.
+
+DIRETORIO_SIDECAR = ".cache_custos"
+MAX_TABELAS = 16
+
+_lock = threading.Lock()
+_tabelas = OrderedDict()  # hash -> DataFrame
+# (caminho, mtime_ns, tamanho) -> hash; LRU como _tabelas: cada nova versão do arquivo é uma chave nova
+_hash_por_arquivo = OrderedDict()
+
+
+def hash_conteudo(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def normalizar_colunas(df):
+    df.columns = df.columns.str.strip()
+    return df
+
+
+# Cópia rasa: barata, e alterações do chamador não contaminam o cache
+def _entregar(df):
+    return df.copy(deep=False)
+
+
+def _ler_sidecar(caminho):
+    if not os.path.exists(caminho):
+        return None
+    try:
+        return pd.read_parquet(caminho)
+    except (ImportError, ValueError, OSError):
+        return None
+
+
+def _gravar_sidecar(df, caminho):
+    # Parquet é opcional (depende do pyarrow); sem ele, ou se a gravação falhar (ex.: coluna com
+    # texto e números misturados, que o Arrow recusa com TypeError), o cache fica só em memória
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        df.to_parquet(temporario, index=False)
+        os.replace(temporario, caminho)
+    except (ImportError, ValueError, TypeError, NotImplementedError, OSError):
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+
+
+def _obter_tabela(hash_arquivo, conteudo, diretorio_sidecar):
+    with _lock:
+        if hash_arquivo in _tabelas:
+            _tabelas.move_to_end(hash_arquivo)
+            return _tabelas[hash_arquivo]
+
+    caminho_sidecar = os.path.join(diretorio_sidecar or DIRETORIO_SIDECAR, f"{hash_arquivo}.parquet")
+    df = _ler_sidecar(caminho_sidecar)
+    if df is None:
+        df = normalizar_colunas(pd.read_excel(io.BytesIO(conteudo)))
+        _gravar_sidecar(df, caminho_sidecar)
+
+    with _lock:
+        _tabelas[hash_arquivo] = df
+        _tabelas.move_to_end(hash_arquivo)
+        while len(_tabelas) > MAX_TABELAS:
+            _tabelas.popitem(last=False)
+    return df
+
+
+# Tabela de custos a partir de um arquivo em disco
+def carregar_tabela_custos(caminho, diretorio_sidecar=None):
+    caminho = os.path.abspath(caminho)
+    info = os.stat(caminho)
+    chave = (caminho, info.st_mtime_ns, info.st_size)
+
+    with _lock:
+        hash_arquivo = _hash_por_arquivo.get(chave)
+        if hash_arquivo is not None:
+            _hash_por_arquivo.move_to_end(chave)
+        if hash_arquivo in _tabelas:
+            _tabelas.move_to_end(hash_arquivo)
+            return _entregar(_tabelas[hash_arquivo])
+
+    with open(caminho, "rb") as f:
+        conteudo = f.read()
+    hash_arquivo = hash_conteudo(conteudo)
+    df = _obter_tabela(hash_arquivo, conteudo, diretorio_sidecar)
+
+    with _lock:
+        _hash_por_arquivo[chave] = hash_arquivo
+        _hash_por_arquivo.move_to_end(chave)
+        while len(_hash_por_arquivo) > MAX_TABELAS:
+            _hash_por_arquivo.popitem(last=False)
+    return _entregar(df)
+
+
+# Tabela de custos a partir dos bytes de um upload (st.file_uploader)
+def carregar_tabela_custos_bytes(conteudo, diretorio_sidecar=None):
+    df = _obter_tabela(hash_conteudo(conteudo), conteudo, diretorio_sidecar)
+    return _entregar(df)
+
+
+def limpar_cache():
+    with _lock:
+        _tabelas.clear()
+        _hash_por_arquivo.clear()
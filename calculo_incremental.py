@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+from motor_preco import COLUNAS_DESPESAS, COLUNAS_ENTRADA, COLUNAS_RESULTADO, calcular_componentes, mascara_cif
+
+# Recálculo incremental da tabela editada no forma-preco.py.
+# A cada rerun, as entradas são comparadas com a versão anterior (pelo índice da linha) e só as linhas
+# alteradas são recalculadas; as demais reaproveitam o resultado anterior. Linhas que voltam a valores
+# já vistos (ex.: desfazer uma edição) saem do memo por linha. Mudança de parâmetro global = recálculo completo.
+
+MAX_MEMO = 50_000
+FRACAO_RECALCULO_COMPLETO = 0.5
+
+
+_POSICAO = {col: i for i, col in enumerate(COLUNAS_ENTRADA)}
+_POSICOES_DESPESAS = [_POSICAO[col] for col in COLUNAS_DESPESAS]
+
+
+# Matrizes em ordem de coluna (Fortran): comparar e copiar coluna a coluna é contíguo
+def matriz_entradas(df):
+    entradas = np.empty((len(df), len(COLUNAS_ENTRADA)), order="F")
+    for i, col in enumerate(COLUNAS_ENTRADA):
+        entradas[:, i] = df[col].to_numpy(dtype=float)
+    return entradas
+
+
+# calcular_precos direto sobre a matriz de entradas (sem montar um DataFrame para poucas linhas)
+def calcular_linhas(entradas, tipo_frete="CIF"):
+    coluna = lambda nome: entradas[:, _POSICAO[nome]]
+    n = len(entradas)
+    componentes = calcular_componentes(
+        preco_venda=coluna("Preço de Venda"),
+        qtd=coluna("Quantidade"),
+        frete_caixa=coluna("Frete Caixa"),
+        cif=mascara_cif(tipo_frete, n),
+        custo_total_unit=coluna("Custo NET") + coluna("Custo Fixo"),
+        despesas=entradas[:, _POSICOES_DESPESAS].sum(axis=1),
+        ipi=coluna("IPI"),
+        icms=coluna("ICMS"),
+        mva=coluna("MVA"),
+    )
+    resultado = np.empty((n, len(COLUNAS_RESULTADO)), order="F")
+    for i, col in enumerate(COLUNAS_RESULTADO):
+        resultado[:, i] = componentes[col]
+    return resultado
+
+
+def _linhas_alteradas(anteriores, atuais):
+    alteradas = np.zeros(len(atuais), dtype=bool)
+    for j in range(atuais.shape[1]):
+        alteradas |= anteriores[:, j] != atuais[:, j]
+    # NaN != NaN: as candidatas são conferidas de novo tratando NaN nos dois lados como igual
+    candidatas = np.flatnonzero(alteradas)
+    if candidatas.size:
+        a, b = anteriores[candidatas], atuais[candidatas]
+        alteradas[candidatas] = ~((a == b) | (np.isnan(a) & np.isnan(b))).all(axis=1)
+    return alteradas
+
+
+class CalculoIncremental:
+    def __init__(self, max_memo=MAX_MEMO):
+        self.max_memo = max_memo
+        self.memo = {}
+        self.parametros = None
+        self.indice = None
+        self.entradas = None
+        self.resultado = None
+        self.recalculadas = 0
+        self.completo = True
+
+    def _memorizar(self, entradas, resultados):
+        if len(self.memo) + len(entradas) > self.max_memo:
+            self.memo.clear()
+        for chave, linha in zip(entradas, resultados):
+            self.memo[chave.tobytes()] = linha
+
+    def _guardar(self, df, parametros, entradas, resultado, recalculadas, completo):
+        self.parametros = parametros
+        self.indice = df.index
+        self.entradas = entradas
+        self.resultado = resultado
+        self.recalculadas = recalculadas
+        self.completo = completo
+        return pd.DataFrame(resultado, index=df.index, columns=COLUNAS_RESULTADO)
+
+    # Mesmo retorno de calcular_precos(df, tipo_frete), com tipo_frete global ("CIF"/"FOB");
+    # `parametros` são os demais valores da barra lateral: se mudarem, tudo é recalculado
+    def calcular(self, df, tipo_frete="CIF", parametros=()):
+        entradas = matriz_entradas(df)
+        parametros = (tipo_frete, *parametros)
+
+        if self.resultado is None or parametros != self.parametros or not df.index.is_unique:
+            self.memo.clear()
+            return self._guardar(df, parametros, entradas, calcular_linhas(entradas, tipo_frete), len(df), True)
+
+        # Alinha com a versão anterior: linhas novas (-1) ou com alguma entrada diferente são recalculadas
+        if df.index.equals(self.indice):
+            posicoes = np.arange(len(df))
+            alteradas = _linhas_alteradas(self.entradas, entradas)
+            resultado = self.resultado.copy()
+        else:
+            posicoes = self.indice.get_indexer(df.index)
+            existentes = np.flatnonzero(posicoes >= 0)
+            alteradas = np.ones(len(df), dtype=bool)
+            alteradas[existentes] = _linhas_alteradas(self.entradas[posicoes[existentes]], entradas[existentes])
+            resultado = np.empty((len(df), len(COLUNAS_RESULTADO)), order="F")
+            resultado[existentes] = self.resultado[posicoes[existentes]]
+        alteradas = np.flatnonzero(alteradas)
+
+        if len(alteradas) > FRACAO_RECALCULO_COMPLETO * len(df):
+            return self._guardar(df, parametros, entradas, calcular_linhas(entradas, tipo_frete), len(df), True)
+
+        # Versão anterior das linhas editadas vai para o memo, para desfazer sem recalcular
+        antigas = posicoes[alteradas]
+        antigas = antigas[antigas >= 0]
+        self._memorizar(self.entradas[antigas], self.resultado[antigas])
+
+        faltando = []
+        for i in alteradas:
+            linha = self.memo.get(entradas[i].tobytes())
+            if linha is None:
+                faltando.append(i)
+            else:
+                resultado[i] = linha
+        if faltando:
+            novos = calcular_linhas(entradas[faltando], tipo_frete)
+            resultado[faltando] = novos
+            self._memorizar(entradas[faltando], novos)
+
+        return self._guardar(df, parametros, entradas, resultado, len(faltando), False)
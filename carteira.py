@@ -0,0 +1,231 @@
+import gzip
+import os
+
+import pandas as pd
+
+from cubo_carteira import LINHAS, PRECO_N
+
+# Leitura da base comercial (abas CARTEIRA e Mark-up) em Excel ou em formatos colunares.
+# Nos formatos colunares cada aba é um arquivo: <base>_CARTEIRA.<ext> e <base>_MARKUP.<ext>
+
+ABAS = {"CARTEIRA": "CARTEIRA", "Mark-up": "MARKUP"}
+FORMATOS = {"parquet": ".parquet", "feather": ".feather", "csv.gz": ".csv.gz"}
+COLUNAS_OBRIGATORIAS = ["CLIENTE", "UF", "SKU", "QTDE", "VL.BRUTO", "LUCRO LIQ"]
+DIMENSOES = ["CLIENTE", "UF", "SKU", "REDE", "SUP", "VENDEDOR", "TIPO_FRETE"]
+# Colunas de contagem que podem virar inteiros compactos (QTDE e as contagens do cubo)
+CONTAGENS = ["QTDE", PRECO_N, LINHAS]
+TAMANHO_BLOCO = 50_000
+
+
+def normalizar_colunas(df):
+    df.columns = df.columns.astype(str).str.strip().str.upper()
+    return df
+
+
+def memoria_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+# Dimensões viram category (códigos inteiros + um dicionário de valores) e as contagens com
+# valores inteiros são reduzidas ao menor inteiro que as comporta. Valores monetários
+# (VL.BRUTO, LUCRO LIQ, FRETE TOTAL...) continuam em float64 mesmo quando redondos: float32
+# perderia centavos nas somas da carteira e int8/int16 estouraria sem aviso nas contas seguintes.
+def compactar_tipos(df, dimensoes=DIMENSOES, contagens=CONTAGENS):
+    df = df.copy(deep=False)
+    for col in df.columns:
+        serie = df[col]
+        if col in dimensoes:
+            if not isinstance(serie.dtype, pd.CategoricalDtype):
+                df[col] = serie.astype("category")
+        elif col not in contagens:
+            continue
+        elif pd.api.types.is_integer_dtype(serie.dtype):
+            df[col] = pd.to_numeric(serie, downcast="integer")
+        elif pd.api.types.is_float_dtype(serie.dtype) and not serie.hasnans:
+            valores = serie.to_numpy()
+            if len(valores) and (valores == valores.round()).all() and abs(valores).max() < 2 ** 31:
+                df[col] = pd.to_numeric(valores.astype("int64"), downcast="integer")
+    return df
+
+
+def formato_do_arquivo(nome):
+    nome = nome.lower()
+    if nome.endswith(".xlsx"):
+        return "xlsx"
+    for formato, extensao in FORMATOS.items():
+        if nome.endswith(extensao):
+            return formato
+    raise ValueError(f"Formato não suportado: {nome}")
+
+
+def ler_tabela(arquivo, formato):
+    if formato == "parquet":
+        return pd.read_parquet(arquivo)
+    if formato == "feather":
+        return pd.read_feather(arquivo)
+    if formato == "csv.gz":
+        return pd.read_csv(arquivo, compression="gzip")
+    raise ValueError(f"Formato não suportado: {formato}")
+
+
+def _nome(arquivo):
+    return getattr(arquivo, "name", None) or os.path.basename(str(arquivo))
+
+
+def validar_colunas(carteira_df):
+    faltantes = [c for c in COLUNAS_OBRIGATORIAS if c not in carteira_df.columns]
+    if faltantes:
+        raise ValueError(f"A aba 'CARTEIRA' não possui as colunas: {', '.join(faltantes)}.")
+
+
+def validar(carteira_df, markup_df):
+    carteira_df = normalizar_colunas(carteira_df)
+    markup_df = normalizar_colunas(markup_df)
+    validar_colunas(carteira_df)
+    return carteira_df, markup_df
+
+
+# Aceita um .xlsx com as duas abas, ou o par de arquivos colunares gerado por converter_carteira.py
+def carregar_carteira(arquivos):
+    if not isinstance(arquivos, (list, tuple)):
+        arquivos = [arquivos]
+
+    if len(arquivos) == 1 and formato_do_arquivo(_nome(arquivos[0])) == "xlsx":
+        excel_data = pd.ExcelFile(arquivos[0])
+        if not set(ABAS).issubset(excel_data.sheet_names):
+            raise ValueError("O arquivo deve conter as abas 'CARTEIRA' e 'Mark-up'.")
+        return validar(excel_data.parse("CARTEIRA"), excel_data.parse("Mark-up"))
+
+    arquivos_por_aba = _arquivos_colunares(arquivos)
+    tabelas = {aba: ler_tabela(arquivo, formato) for aba, (arquivo, formato) in arquivos_por_aba.items()}
+    return validar(tabelas["CARTEIRA"], tabelas["Mark-up"])
+
+
+def _arquivos_colunares(arquivos):
+    por_aba = {}
+    for arquivo in arquivos:
+        nome = _nome(arquivo)
+        formato = formato_do_arquivo(nome)
+        for aba, sufixo in ABAS.items():
+            if f"_{sufixo}." in nome.upper():
+                por_aba[aba] = (arquivo, formato)
+    if set(por_aba) != set(ABAS):
+        raise ValueError(
+            "Envie um .xlsx com as abas 'CARTEIRA' e 'Mark-up' ou os dois arquivos "
+            "convertidos (<base>_CARTEIRA e <base>_MARKUP)."
+        )
+    return por_aba
+
+
+# =============================
+# LEITURA EM BLOCOS (memória limitada)
+# =============================
+
+def _blocos_xlsx(arquivo, aba, tamanho_bloco):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = workbook[aba].iter_rows(values_only=True)
+        colunas = [str(c) if c is not None else "" for c in next(linhas, ())]
+        bloco = []
+        enviou = False
+        for linha in linhas:
+            if all(v is None for v in linha):
+                continue
+            bloco.append(linha)
+            if len(bloco) == tamanho_bloco:
+                yield pd.DataFrame(bloco, columns=colunas)
+                bloco = []
+                enviou = True
+        if bloco or not enviou:
+            yield pd.DataFrame(bloco, columns=colunas)
+    finally:
+        workbook.close()
+
+
+def _blocos_colunares(arquivo, formato, tamanho_bloco):
+    if formato == "parquet":
+        import pyarrow.parquet as pq
+
+        for lote in pq.ParquetFile(arquivo).iter_batches(batch_size=tamanho_bloco):
+            yield lote.to_pandas()
+    elif formato == "feather":
+        import pyarrow as pa
+
+        leitor = pa.ipc.open_file(arquivo)
+        for i in range(leitor.num_record_batches):
+            yield leitor.get_batch(i).to_pandas()
+    else:
+        yield from pd.read_csv(arquivo, compression="gzip", chunksize=tamanho_bloco)
+
+
+def _validar_blocos(blocos):
+    primeiro = True
+    for bloco in blocos:
+        bloco = normalizar_colunas(bloco)
+        if primeiro:
+            validar_colunas(bloco)
+            primeiro = False
+        yield bloco
+
+
+# Mesmas entradas de carregar_carteira, mas a CARTEIRA é entregue em blocos de linhas.
+# As colunas são validadas no primeiro bloco; a aba Mark-up (pequena) é lida inteira.
+def carregar_carteira_em_blocos(arquivos, tamanho_bloco=TAMANHO_BLOCO):
+    if not isinstance(arquivos, (list, tuple)):
+        arquivos = [arquivos]
+
+    if len(arquivos) == 1 and formato_do_arquivo(_nome(arquivos[0])) == "xlsx":
+        arquivo = arquivos[0]
+        with pd.ExcelFile(arquivo) as excel_data:
+            if not set(ABAS).issubset(excel_data.sheet_names):
+                raise ValueError("O arquivo deve conter as abas 'CARTEIRA' e 'Mark-up'.")
+            markup_df = normalizar_colunas(excel_data.parse("Mark-up"))
+        if hasattr(arquivo, "seek"):
+            arquivo.seek(0)
+        return _validar_blocos(_blocos_xlsx(arquivo, "CARTEIRA", tamanho_bloco)), markup_df
+
+    arquivos_por_aba = _arquivos_colunares(arquivos)
+    markup_df = normalizar_colunas(ler_tabela(*arquivos_por_aba["Mark-up"]))
+    arquivo, formato = arquivos_por_aba["CARTEIRA"]
+    return _validar_blocos(_blocos_colunares(arquivo, formato, tamanho_bloco)), markup_df
+
+
+# Colunas object com tipos misturados (ex.: números e textos) não são aceitas pelo Arrow
+def _preparar_para_colunar(df):
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty"):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def gravar_tabela(df, caminho, formato):
+    df = _preparar_para_colunar(df)
+    if formato == "parquet":
+        df.to_parquet(caminho, index=False)
+    elif formato == "feather":
+        df.reset_index(drop=True).to_feather(caminho)
+    elif formato == "csv.gz":
+        with gzip.open(caminho, "wt", encoding="utf-8", newline="") as f:
+            df.to_csv(f, index=False)
+    else:
+        raise ValueError(f"Formato não suportado: {formato}")
+
+
+# Converte o .xlsx uma única vez; retorna {formato: [caminhos]}
+def converter_planilha(caminho_xlsx, destino=None, formatos=tuple(FORMATOS)):
+    destino = destino or os.path.dirname(os.path.abspath(caminho_xlsx))
+    base = os.path.splitext(os.path.basename(caminho_xlsx))[0]
+    os.makedirs(destino, exist_ok=True)
+
+    carteira_df, markup_df = carregar_carteira(caminho_xlsx)
+    gerados = {}
+    for formato in formatos:
+        gerados[formato] = []
+        for aba, df in (("CARTEIRA", carteira_df), ("MARKUP", markup_df)):
+            caminho = os.path.join(destino, f"{base}_{aba}{FORMATOS[formato]}")
+            gravar_tabela(df, caminho, formato)
+            gerados[formato].append(caminho)
+    return gerados
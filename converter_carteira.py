@@ -0,0 +1,54 @@
+import argparse
+import os
+import time
+import tracemalloc
+
+from carteira import FORMATOS, carregar_carteira, converter_planilha
+
+# Converte a planilha CARTEIRA / Mark-up para formatos colunares e compara o tempo de carga.
+# Uso: python converter_carteira.py base.xlsx [--formatos parquet feather csv.gz] [--destino pasta] [--relatorio]
+
+
+# Tempo e memória em passagens separadas: o tracemalloc distorce o tempo do openpyxl
+def medir_carga(arquivos):
+    inicio = time.perf_counter()
+    carregar_carteira(arquivos)
+    tempo = time.perf_counter() - inicio
+
+    tracemalloc.start()
+    carteira_df, markup_df = carregar_carteira(arquivos)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    memoria_df = carteira_df.memory_usage(deep=True).sum() + markup_df.memory_usage(deep=True).sum()
+    return tempo, pico, memoria_df, len(carteira_df)
+
+
+def relatorio(caminho_xlsx, gerados):
+    linhas = [("xlsx", [caminho_xlsx])] + list(gerados.items())
+    print(f"{'formato':<10} {'disco (MB)':>11} {'carga (s)':>10} {'pico (MB)':>10} {'DataFrame (MB)':>15} {'linhas':>10}")
+    for formato, arquivos in linhas:
+        disco = sum(os.path.getsize(a) for a in arquivos) / 1e6
+        tempo, pico, memoria_df, n = medir_carga(arquivos)
+        print(f"{formato:<10} {disco:>11.2f} {tempo:>10.3f} {pico / 1e6:>10.1f} {memoria_df / 1e6:>15.1f} {n:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte a planilha CARTEIRA / Mark-up para formatos colunares.")
+    parser.add_argument("arquivo", help="Planilha .xlsx com as abas CARTEIRA e Mark-up")
+    parser.add_argument("--formatos", nargs="+", choices=list(FORMATOS), default=list(FORMATOS))
+    parser.add_argument("--destino", help="Pasta de saída (padrão: a pasta da planilha)")
+    parser.add_argument("--relatorio", action="store_true", help="Compara tempo e memória de carga de cada formato")
+    args = parser.parse_args()
+
+    gerados = converter_planilha(args.arquivo, args.destino, args.formatos)
+    for formato, arquivos in gerados.items():
+        for caminho in arquivos:
+            print(f"{formato}: {caminho}")
+
+    if args.relatorio:
+        print()
+        relatorio(args.arquivo, gerados)
+
+
+if __name__ == "__main__":
+    main()
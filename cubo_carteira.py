@@ -0,0 +1,112 @@
+import pandas as pd
+
+# Cubo de agregação da CARTEIRA, montado uma vez por upload.
+# Cada célula é uma combinação de dimensões com as somas das medidas e a faixa de preço unitário.
+# As somas mantêm os nomes das colunas originais, então groupby/sum sobre o cubo dá o mesmo
+# resultado que sobre as linhas da nota.
+
+DIMENSOES_CUBO = ["CLIENTE", "UF", "SKU", "REDE", "SUP", "VENDEDOR", "TIPO_FRETE"]
+MEDIDAS_SOMA = ["QTDE", "VL.BRUTO", "LUCRO LIQ", "FRETE TOTAL"]
+
+# Preço unitário: mínimo, máximo e soma/contagem para reconstruir a média por linha
+PRECO_MIN = "PRECO_UNIT_MIN"
+PRECO_MAX = "PRECO_UNIT_MAX"
+PRECO_SOMA = "PRECO_UNIT_SOMA"
+PRECO_N = "PRECO_UNIT_N"
+PRECO_MEDIO = "PRECO_UNIT_MEDIO"
+LINHAS = "LINHAS"
+
+
+def _presentes(df, colunas):
+    return [c for c in colunas if c in df.columns]
+
+
+# Medidas que o cubo consegue fornecer (a média de preço é derivada de soma/contagem)
+def _calculaveis(cubo, medidas):
+    return [m for m in medidas if m in cubo.columns or (m == PRECO_MEDIO and PRECO_SOMA in cubo.columns)]
+
+
+def construir_cubo(df):
+    dimensoes = _presentes(df, DIMENSOES_CUBO)
+    preco_unit = df["VL.BRUTO"] / df["QTDE"]
+    agregacoes = {m: (m, "sum") for m in _presentes(df, MEDIDAS_SOMA)}
+    agregacoes.update({
+        PRECO_MIN: ("_PRECO_UNIT", "min"),
+        PRECO_MAX: ("_PRECO_UNIT", "max"),
+        PRECO_SOMA: ("_PRECO_UNIT", "sum"),
+        PRECO_N: ("_PRECO_UNIT", "count"),
+        LINHAS: ("_PRECO_UNIT", "size"),
+    })
+    return (
+        df[dimensoes + _presentes(df, MEDIDAS_SOMA)]
+        .assign(_PRECO_UNIT=preco_unit)
+        .groupby(dimensoes, dropna=False, sort=False, observed=True)
+        .agg(**agregacoes)
+        .reset_index()
+    )
+
+
+# Junta cubos parciais (ex.: de blocos de linhas) somando as células com as mesmas dimensões
+def combinar_cubos(cubos):
+    cubo = pd.concat(cubos, ignore_index=True)
+    agregacoes = {m: "sum" for m in _presentes(cubo, MEDIDAS_SOMA + [PRECO_SOMA, PRECO_N, LINHAS])}
+    agregacoes.update({PRECO_MIN: "min", PRECO_MAX: "max"})
+    return (
+        cubo.groupby(_presentes(cubo, DIMENSOES_CUBO), dropna=False, sort=False, observed=True)
+        .agg(agregacoes)
+        .reset_index()
+    )
+
+
+# Monta o cubo bloco a bloco: a memória fica limitada ao bloco atual + células já acumuladas
+def construir_cubo_em_blocos(blocos, combinar_a_cada=2):
+    parciais = []
+    for bloco in blocos:
+        parciais.append(construir_cubo(bloco))
+        if len(parciais) >= combinar_a_cada:
+            parciais = [combinar_cubos(parciais)]
+    return combinar_cubos(parciais)
+
+
+# Consolida as células do cubo por uma ou mais dimensões.
+# medidas=None consolida tudo; senão apenas as somas e estatísticas de preço pedidas.
+def consolidar_cubo(cubo, por, medidas=None):
+    medidas = MEDIDAS_SOMA + [PRECO_MIN, PRECO_MEDIO, PRECO_MAX, LINHAS] if medidas is None else list(medidas)
+    somas = [m for m in MEDIDAS_SOMA + [LINHAS] if m in medidas]
+    if PRECO_MEDIO in medidas:
+        somas += [PRECO_SOMA, PRECO_N]
+    agregacoes = {m: "sum" for m in _presentes(cubo, somas)}
+    agregacoes.update({m: f for m, f in ((PRECO_MIN, "min"), (PRECO_MAX, "max")) if m in medidas})
+
+    consolidado = cubo.groupby(por, observed=True).agg(agregacoes).reset_index()
+    if PRECO_MEDIO in medidas:
+        consolidado[PRECO_MEDIO] = consolidado.pop(PRECO_SOMA) / consolidado.pop(PRECO_N)
+    return consolidado
+
+
+# Plano de agregação: os painéis declaram as medidas de que precisam por chave e cada
+# chave é consolidada uma única vez por rerun, com a união dessas medidas.
+class PlanoAgregacao:
+    def __init__(self, cubo):
+        self.cubo = cubo
+        self.pedidos = 0
+        self.varreduras = 0
+        self._medidas = {}
+        self._resultados = {}
+
+    def declarar(self, por, medidas):
+        self._medidas.setdefault(por, set()).update(medidas)
+
+    def obter(self, por, medidas):
+        self.pedidos += 1
+        self.declarar(por, medidas)
+        resultado = self._resultados.get(por)
+        if resultado is None or not set(_calculaveis(self.cubo, medidas)) <= set(resultado.columns):
+            resultado = consolidar_cubo(self.cubo, por, self._medidas[por])
+            self._resultados[por] = resultado
+            self.varreduras += 1
+        return resultado[[por] + [m for m in medidas if m in resultado.columns]].copy()
+
+    @property
+    def varreduras_economizadas(self):
+        return self.pedidos - self.varreduras
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Diagnóstico por IA fora da thread do Streamlit.
+# Cada pedido roda em segundo plano; o resultado fica em cache pelo hash do prompt + parâmetros do modelo.
+# O backend é plugável: "openai" (API real) ou "local" (servidor compatível, ex.: servidor_stub_ia.py).
+
+PARAMETROS_PADRAO = {"model": "gpt-4o", "temperature": 0.3, "max_tokens": 2000}
+TTL_PADRAO = 60 * 60
+URL_LOCAL_PADRAO = "http://127.0.0.1:8765/v1/chat/completions"
+
+NA_FILA = "na fila"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluído"
+ERRO = "erro"
+
+
+def chave_pedido(prompt, parametros):
+    conteudo = json.dumps({"prompt": prompt, "parametros": parametros}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+class BackendOpenAI:
+    nome = "openai"
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+
+    def gerar(self, prompt, parametros):
+        import openai
+
+        resposta = openai.ChatCompletion.create(
+            messages=[{"role": "user", "content": prompt}],
+            api_key=self.api_key,
+            **parametros
+        )
+        return resposta["choices"][0]["message"]["content"]
+
+
+# Qualquer servidor com a rota /v1/chat/completions (stub local, proxy, modelo self-hosted)
+class BackendLocal:
+    nome = "local"
+
+    def __init__(self, url=URL_LOCAL_PADRAO, timeout=120):
+        self.url = url
+        self.timeout = timeout
+
+    def gerar(self, prompt, parametros):
+        corpo = json.dumps({"messages": [{"role": "user", "content": prompt}], **parametros}).encode("utf-8")
+        pedido = urllib.request.Request(self.url, data=corpo, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(pedido, timeout=self.timeout) as resposta:
+            return json.loads(resposta.read())["choices"][0]["message"]["content"]
+
+
+# Backend escolhido por variável de ambiente: DIAGNOSTICO_BACKEND=openai|local e DIAGNOSTICO_URL
+def criar_backend(nome=None):
+    nome = (nome or os.getenv("DIAGNOSTICO_BACKEND") or "openai").lower()
+    if nome == "openai":
+        return BackendOpenAI()
+    if nome == "local":
+        return BackendLocal(os.getenv("DIAGNOSTICO_URL") or URL_LOCAL_PADRAO)
+    raise ValueError(f"Backend de diagnóstico desconhecido: {nome}")
+
+
+class CacheResultados:
+    def __init__(self, ttl=TTL_PADRAO):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._itens = {}
+
+    def _expirar(self, agora):
+        vencidas = [chave for chave, (criado, _) in self._itens.items() if agora - criado > self.ttl]
+        for chave in vencidas:
+            del self._itens[chave]
+
+    def obter(self, chave):
+        with self._lock:
+            self._expirar(time.monotonic())
+            item = self._itens.get(chave)
+            return None if item is None else item[1]
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            agora = time.monotonic()
+            self._expirar(agora)
+            self._itens[chave] = (agora, valor)
+
+    def __len__(self):
+        with self._lock:
+            self._expirar(time.monotonic())
+            return len(self._itens)
+
+
+class Tarefa:
+    def __init__(self, chave):
+        self.chave = chave
+        self.estado = NA_FILA
+        self.criada = time.monotonic()
+        self.inicio = None
+        self.fim = None
+        self.resultado = None
+        self.erro = None
+        self.do_cache = False
+
+    @property
+    def pronta(self):
+        return self.estado in (CONCLUIDO, ERRO)
+
+    @property
+    def tempo_decorrido(self):
+        return (self.fim or time.monotonic()) - (self.inicio or self.criada)
+
+
+# Compartilhado entre sessões (st.cache_resource): pedidos iguais em andamento não são duplicados
+class GerenciadorDiagnostico:
+    def __init__(self, backend=None, ttl=TTL_PADRAO, max_workers=2):
+        self.backend = backend or criar_backend()
+        self.cache = CacheResultados(ttl)
+        self._lock = threading.Lock()
+        self._tarefas = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="diagnostico")
+
+    def solicitar(self, prompt, parametros=None):
+        parametros = dict(PARAMETROS_PADRAO if parametros is None else parametros)
+        chave = chave_pedido(prompt, {"backend": self.backend.nome, **parametros})
+        with self._lock:
+            self._descartar_antigas()
+            tarefa = self._tarefas.get(chave)
+            if tarefa is not None and not tarefa.pronta:
+                return tarefa
+            # Resultado válido no cache; com erro ou TTL vencido, o pedido é refeito
+            resultado = self.cache.obter(chave)
+            tarefa = Tarefa(chave)
+            if resultado is not None:
+                tarefa.estado, tarefa.resultado, tarefa.do_cache = CONCLUIDO, resultado, True
+                tarefa.inicio = tarefa.fim = tarefa.criada
+            else:
+                self._executor.submit(self._executar, tarefa, prompt, parametros)
+            self._tarefas[chave] = tarefa
+            return tarefa
+
+    def _descartar_antigas(self):
+        agora = time.monotonic()
+        antigas = [c for c, t in self._tarefas.items() if t.pronta and agora - t.fim > self.cache.ttl]
+        for chave in antigas:
+            del self._tarefas[chave]
+
+    def tarefa(self, chave):
+        with self._lock:
+            return self._tarefas.get(chave)
+
+    def _executar(self, tarefa, prompt, parametros):
+        tarefa.inicio = time.monotonic()
+        tarefa.estado = EXECUTANDO
+        try:
+            tarefa.resultado = self.backend.gerar(prompt, parametros)
+            self.cache.guardar(tarefa.chave, tarefa.resultado)
+            tarefa.fim = time.monotonic()
+            tarefa.estado = CONCLUIDO
+        except Exception as e:
+            tarefa.erro = str(e)
+            tarefa.fim = time.monotonic()
+            tarefa.estado = ERRO
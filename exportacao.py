@@ -0,0 +1,125 @@
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+
+import pandas as pd
+import streamlit as st
+
+# Exportação sob demanda (forma-preco.py e simulador_lote.py).
+# O arquivo só é gerado quando pedido e fica memorizado pelo hash do conteúdo da tabela:
+# reruns sem alteração nos dados reaproveitam o arquivo já gerado.
+
+FORMATOS = {
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/octet-stream"),
+}
+LINHAS_MEMORIA_CONSTANTE = 100_000
+BLOCO_LINHAS = 10_000
+MAX_ARQUIVOS = 8
+
+_lock = threading.Lock()
+_arquivos = OrderedDict()
+
+
+def hash_tabela(df):
+    digest = hashlib.sha256()
+    digest.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+# Tabelas grandes vão linha a linha no modo constant_memory do xlsxwriter (cada linha é
+# descarregada em disco ao passar para a próxima). O to_excel do pandas grava por coluna,
+# então não pode ser usado nesse modo.
+def _xlsx_memoria_constante(df, aba, buffer):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(buffer, {"constant_memory": True, "nan_inf_to_errors": True})
+    planilha = workbook.add_worksheet(aba)
+    cabecalho = workbook.add_format({"bold": True, "border": 1, "align": "center"})
+    planilha.write_row(0, 0, [str(c) for c in df.columns], cabecalho)
+    linha = 1
+    for inicio in range(0, len(df), BLOCO_LINHAS):
+        bloco = df.iloc[inicio:inicio + BLOCO_LINHAS]
+        for registro in bloco.astype(object).where(bloco.notna(), None).itertuples(index=False, name=None):
+            planilha.write_row(linha, 0, registro)
+            linha += 1
+    workbook.close()
+
+
+def _gerar(df, formato, aba):
+    buffer = io.BytesIO()
+    if formato == "xlsx":
+        if len(df) > LINHAS_MEMORIA_CONSTANTE:
+            _xlsx_memoria_constante(df, aba, buffer)
+        else:
+            with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+                df.to_excel(writer, index=False, sheet_name=aba)
+    elif formato == "csv":
+        df.to_csv(buffer, index=False, encoding="utf-8")
+    elif formato == "parquet":
+        df.to_parquet(buffer, index=False)
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    return buffer.getvalue()
+
+
+# Retorna (conteúdo, segundos gastos na geração); a segunda chamada com a mesma tabela não gera de novo
+def gerar_arquivo(df, formato, aba="Resultado", chave=None):
+    chave = (chave or hash_tabela(df), formato, aba)
+    with _lock:
+        if chave in _arquivos:
+            _arquivos.move_to_end(chave)
+            return _arquivos[chave]
+
+    inicio = time.perf_counter()
+    conteudo = _gerar(df, formato, aba)
+    arquivo = (conteudo, time.perf_counter() - inicio)
+
+    with _lock:
+        _arquivos[chave] = arquivo
+        while len(_arquivos) > MAX_ARQUIVOS:
+            _arquivos.popitem(last=False)
+    return arquivo
+
+
+def limpar_cache():
+    with _lock:
+        _arquivos.clear()
+
+
+# Seletor de formato + botão "Gerar"; dentro de um fragmento, gerar e baixar não reexecutam a página.
+# Com `instrumentacao` (instrumentacao.py), a geração é medida como a seção "exportação".
+# `df` pode ser uma função que monta a tabela: ela só é chamada ao gerar, e `chave` (obrigatória
+# nesse caso) identifica o conteúdo no lugar do hash da tabela. `formatos` restringe as opções.
+@st.fragment
+def exportar_sob_demanda(df, nome_arquivo, aba="Resultado", chave_widget="exportacao", instrumentacao=None,
+                         chave=None, formatos=None):
+    if callable(df) and chave is None:
+        raise ValueError("Informe a chave do conteúdo ao exportar uma tabela montada sob demanda.")
+    chave = chave or hash_tabela(df)
+    col_formato, col_gerar = st.columns([2, 1])
+    formato_nome = col_formato.selectbox("Formato", list(formatos or FORMATOS), key=f"{chave_widget}_formato")
+    formato, mime = FORMATOS[formato_nome]
+
+    pedido = (chave, formato)
+    if col_gerar.button(f"⚙️ Gerar {formato_nome}", key=f"{chave_widget}_gerar"):
+        st.session_state[chave_widget] = pedido
+    if st.session_state.get(chave_widget) != pedido:
+        st.caption("O arquivo é gerado apenas quando solicitado.")
+        return
+
+    with instrumentacao.secao("exportação") if instrumentacao is not None else nullcontext():
+        conteudo, segundos = gerar_arquivo(df() if callable(df) else df, formato, aba, chave)
+    st.download_button(
+        label=f"📄 Baixar {formato_nome}",
+        data=conteudo,
+        file_name=f"{nome_arquivo}.{formato}",
+        mime=mime,
+        key=f"{chave_widget}_baixar"
+    )
+    st.caption(f"{formato_nome} gerado em {segundos:.2f}s ({len(conteudo) / 1024:,.0f} KB).".replace(",", "."))
@@ -1,7 +1,23 @@
 import streamlit as st
 import pandas as pd
-import io
 import os
+import time
+import numpy as np
+import plotly.express as px
+from cache_custos import carregar_tabela_custos, carregar_tabela_custos_bytes
+from calculo_incremental import CalculoIncremental
+from exportacao import exportar_sob_demanda, hash_tabela
+from formatacao import moeda_br
+from instrumentacao import exibir_instrumentacao, iniciar_instrumentacao
+from motor_preco import (
+    MEDIDAS_COMPARATIVO_UF, comparar_ufs, margens_alvo, preencher_preco_equilibrio,
+    preencher_preco_margem, preparar_tabela
+)
+from otimizador_precos import (
+    COLUNA_ELASTICIDADE, COLUNA_NF_MAXIMA, COLUNA_PRECO_MAXIMO, ELASTICIDADE_PADRAO, TETO_PADRAO, otimizar_precos
+)
+from risco_margem import CENARIOS_PADRAO, MAX_CENARIOS, PERCENTIS, VARIAVEIS, processos_disponiveis, risco_margem
+from sensibilidade import lucro_percentual_total, tabela_sensibilidade, varrer_sensibilidade
 
 st.set_page_config(page_title="Simulador de Preço de Venda Sobel", layout="wide")
 st.title("📊 Simulador de Formação de Preço de Venda")
@@ -10,12 +26,16 @@ st.image("Logo-Suprema-Slogan-Alta-ai-1.webp", width=300)
 # Session State
 if 'df_editado' not in st.session_state:
     st.session_state.df_editado = None
+if 'calculo_incremental' not in st.session_state:
+    st.session_state.calculo_incremental = CalculoIncremental()
+
+instrumentacao = iniciar_instrumentacao("forma-preco.py")
 
 # Carga padrão
 arquivo_padrao = "Custo de reposição.xlsx"
 if os.path.exists(arquivo_padrao):
-    df_padrao = pd.read_excel(arquivo_padrao)
-    df_padrao.columns = df_padrao.columns.str.strip()
+    with instrumentacao.secao("ingestão"):
+        df_padrao = carregar_tabela_custos(arquivo_padrao)
 else:
     st.warning("Arquivo padrão não encontrado.")
     df_padrao = pd.DataFrame()
@@ -26,18 +46,20 @@ frete_padrao = st.sidebar.number_input("Frete por Caixa (R$)", min_value=0.0, va
 contrato_percentual = st.sidebar.number_input("% Contrato", min_value=0.0, max_value=100.0, value=1.00, step=0.01) / 100
 uf_selecionado = st.sidebar.selectbox("Selecione a UF", options=df_padrao["UF"].dropna().unique().tolist()) if not df_padrao.empty else ""
 tipo_frete = st.sidebar.radio("Tipo de Frete", ("CIF", "FOB"))
+margem_alvo = st.sidebar.number_input("Lucro % Alvo", min_value=-100.0, max_value=100.0, value=10.00, step=0.5)
 
 # Upload
 uploaded_file = st.file_uploader("📂 Envie sua planilha atualizada (.xlsx)", type="xlsx")
 
 if uploaded_file:
-    df_base = pd.read_excel(uploaded_file)
-    df_base.columns = df_base.columns.str.strip()
-    df_base = df_base[df_base["UF"] == uf_selecionado].copy()
+    with instrumentacao.secao("ingestão"):
+        df_tabela = carregar_tabela_custos_bytes(uploaded_file.getvalue())
 elif not df_padrao.empty:
-    df_base = df_padrao[df_padrao["UF"] == uf_selecionado].copy()
+    df_tabela = df_padrao
 else:
     st.stop()
+with instrumentacao.secao("filtros"):
+    df_base = df_tabela[df_tabela["UF"] == uf_selecionado].copy()
 
 # Produtos esperados
 produtos_esperados = [
@@ -50,124 +72,68 @@ produtos_esperados = [
     "LIMPA VIDROS SQUEEZE 500ML", "DESENGORDURANTE 500ML",
     "MULTI-USO 500ML", "REMOVEDOR 1L", "REMOVEDOR 500ML"
 ]
-df_base = df_base[df_base["Descrição"].isin(produtos_esperados)].copy()
+with instrumentacao.secao("filtros"):
+    df_base = df_base[df_base["Descrição"].isin(produtos_esperados)].copy()
 
-# Ajustes
-colunas_necessarias = ["Preço de Venda", "Quantidade", "Frete Caixa", "%Estrategico", "IPI", "ICMS ST", "ICMS", "MVA"]
-for col in colunas_necessarias:
-    if col not in df_base.columns:
-        df_base[col] = 0.0 if col != "Quantidade" else 1
-
-df_base["Frete Caixa"] = frete_padrao
-df_base["Contrato"] = contrato_percentual
-
-# Preencher Ponto de Equilíbrio
-def preencher_preco_equilibrio(df):
-    df_atualizado = df.copy()
-    alertas = []
-    for index, row in df_atualizado.iterrows():
-        custo_total_unit = row["Custo NET"] + row["Custo Fixo"]
-        frete_unit = row["Frete Caixa"] if tipo_frete == "CIF" else 0
-        despesas_percentuais = (
-            row["ICMS"] + row["COFINS"] + row["PIS"] +
-            row["Comissão"] + row["Bonificação"] +
-            row["Contigência"] + row["Contrato"] + row["%Estrategico"]
-        )
 
-        if despesas_percentuais >= 1:
-            alertas.append(f"{row['Descrição']}: Despesas acima de 100%.")
-            preco_equilibrio_unit = 0
-        else:
-            try:
-                preco_equilibrio_unit = (custo_total_unit + frete_unit) / (1 - despesas_percentuais)
-                preco_equilibrio_unit = round(preco_equilibrio_unit, 2)
-            except ZeroDivisionError:
-                preco_equilibrio_unit = 0
+# Todas as UFs precificadas de uma vez; refeito só quando a tabela ou os parâmetros mudam
+@st.cache_data(show_spinner=False, max_entries=16)
+def precificar_todas_ufs(df_tabela, frete_caixa, contrato_percentual, tipo_frete, margem_alvo=None):
+    df = preparar_tabela(df_tabela[df_tabela["Descrição"].isin(produtos_esperados)], frete_caixa, contrato_percentual)
+    if margem_alvo is not None:
+        df, _ = preencher_preco_margem(df, margens_alvo(df, margem_alvo), tipo_frete)
+    inicio = time.perf_counter()
+    resultado, pivos = comparar_ufs(df, tipo_frete)
+    return resultado, pivos, time.perf_counter() - inicio
 
-        df_atualizado.at[index, "Preço de Venda"] = preco_equilibrio_unit
 
-    return df_atualizado, alertas
+# Monte Carlo da margem; refeito só quando a tabela, as distribuições ou os cenários mudam.
+# Em cache ficam o resumo e os histogramas (linhas × 80 contagens), não a matriz linhas × cenários
+@st.cache_data(show_spinner="Simulando cenários...", max_entries=8)
+def simular_risco(df, incertezas, tipo_frete, cenarios, processos):
+    inicio = time.perf_counter()
+    resumo, histograma = risco_margem(df, incertezas, tipo_frete, cenarios, processos)
+    return resumo, histograma, time.perf_counter() - inicio
+
+
+# Catálogo completo (todas as UFs): preço da planilha e, onde não houver, o preço do Lucro % Alvo
+def catalogo_precificado(df_tabela, frete_caixa, contrato_percentual, tipo_frete, margem_alvo):
+    df = preparar_tabela(df_tabela[df_tabela["Descrição"].isin(produtos_esperados)], frete_caixa, contrato_percentual)
+    df_alvo, _ = preencher_preco_margem(df, margens_alvo(df, margem_alvo), tipo_frete)
+    df["Preço de Venda"] = df["Preço de Venda"].fillna(df_alvo["Preço de Venda"])
+    return df.reset_index(drop=True)
+
+# Ajustes
+df_base = preparar_tabela(df_base, frete_padrao, contrato_percentual)
 
 # Botão
 if st.button("📌 Preencher com Ponto de Equilíbrio"):
-    df_base, alertas = preencher_preco_equilibrio(df_base)
-    if alertas:
-        for msg in alertas:
-            st.warning(msg)
+    df_base, alertas = preencher_preco_equilibrio(df_base, tipo_frete)
+    for descricao in df_base.loc[alertas, "Descrição"]:
+        st.warning(f"{descricao}: Despesas acima de 100%.")
+
+# Lucro % alvo: valor global da barra lateral, ou a coluna "Lucro % Alvo" da planilha quando preenchida
+if st.button("🎯 Preencher com Lucro % Alvo"):
+    df_base, alertas = preencher_preco_margem(df_base, margens_alvo(df_base, margem_alvo), tipo_frete)
+    for descricao in df_base.loc[alertas, "Descrição"]:
+        st.warning(f"{descricao}: Lucro % alvo inatingível (despesas + margem consomem 100% do preço).")
 
 st.session_state.df_editado = df_base.copy()
 
 # Editor
 st.markdown("### ✏️ Edite os dados abaixo para simulação em lote")
-df_editado = st.data_editor(st.session_state.df_editado, use_container_width=True, num_rows="dynamic")
+with instrumentacao.secao("editor"):
+    df_editado = st.data_editor(st.session_state.df_editado, use_container_width=True, num_rows="dynamic")
 st.session_state.df_editado = df_editado
 
-# Função cálculo
-def calcular_linha(row):
-    preco_venda = row["Preço de Venda"]
-    qtd = row["Quantidade"]
-    subtotal = preco_venda * qtd
-
-    frete_total = row["Frete Caixa"] * qtd if tipo_frete == "CIF" else 0
-    frete_unit = row["Frete Caixa"] if tipo_frete == "CIF" else 0
-
-    ipi_total = subtotal * row["IPI"]
-    mva_percentual = row["MVA"]
-    base_icms_st = (subtotal + ipi_total) * (1 + mva_percentual)
-    icms_proprio = subtotal * row["ICMS"]
-    icms_st = (base_icms_st * row["ICMS"]) - icms_proprio
-    icms_st = max(icms_st, 0)
-
-    custo_total_unit = row["Custo NET"] + row["Custo Fixo"]
-    despesas_percentuais = (
-        row["ICMS"] + row["COFINS"] + row["PIS"] +
-        row["Comissão"] + row["Bonificação"] +
-        row["Contigência"] + row["Contrato"] + row["%Estrategico"]
+# Cálculo: só as linhas editadas desde o último rerun; mudança na barra lateral recalcula tudo
+calculo = st.session_state.calculo_incremental
+with instrumentacao.secao("cálculo"):
+    resultados = calculo.calcular(
+        st.session_state.df_editado, tipo_frete,
+        (uploaded_file.file_id if uploaded_file else None, uf_selecionado, frete_padrao, contrato_percentual)
     )
-
-    despesas_reais = preco_venda * despesas_percentuais * qtd + frete_total
-    lucro_bruto = (preco_venda - custo_total_unit) * qtd - despesas_reais
-
-    if lucro_bruto > 0:
-        lucro_liquido = lucro_bruto / 1.34
-        irpj = lucro_liquido * 0.25
-        csll = lucro_liquido * 0.09
-    else:
-        lucro_liquido = lucro_bruto
-        irpj = 0
-        csll = 0
-
-    receita_total = subtotal
-    lucro_percentual = (lucro_liquido / receita_total) * 100 if receita_total > 0 else 0
-    total_nf = subtotal + ipi_total + icms_st
-
-    if lucro_liquido < 0 and despesas_percentuais < 1:
-        try:
-            preco_equilibrio_unit = (custo_total_unit + frete_unit) / (1 - despesas_percentuais)
-            preco_equilibrio_unit = round(preco_equilibrio_unit, 2)
-        except ZeroDivisionError:
-            preco_equilibrio_unit = 0
-    else:
-        preco_equilibrio_unit = preco_venda
-
-    return pd.Series({
-        "Subtotal (R$)": subtotal,
-        "Frete Total (R$)": frete_total,
-        "IPI (R$)": ipi_total,
-        "Base ICMS-ST (R$)": base_icms_st,
-        "ICMS-ST (R$)": icms_st,
-        "Lucro Bruto (R$)": lucro_bruto,
-        "Lucro Líquido (R$)": lucro_liquido,
-        "IRPJ (R$)": irpj,
-        "CSLL (R$)": csll,
-        "Lucro %": lucro_percentual,
-        "Total NF (R$)": total_nf,
-        "Ponto de Equilíbrio (R$)": preco_equilibrio_unit
-    })
-
-# Cálculo
-resultados = st.session_state.df_editado.apply(calcular_linha, axis=1)
-resultado_final = pd.concat([st.session_state.df_editado, resultados], axis=1)
+    resultado_final = pd.concat([st.session_state.df_editado, resultados], axis=1)
 
 # Resultado
 st.markdown("### 📊 Resultado da Simulação")
@@ -198,20 +164,241 @@ styled_df = resultado_final.style.format({
 }).apply(lambda x: [color_negative_red(v) for v in x],
         subset=["Lucro Bruto (R$)", "Lucro Líquido (R$)", "Lucro %"])
 
-st.dataframe(styled_df, use_container_width=True)
+# O Styler é preguiçoso: a formatação acontece aqui, na serialização da tabela
+with instrumentacao.secao("tabelas"):
+    st.dataframe(styled_df, use_container_width=True)
+st.caption(
+    f"Recálculo {'completo' if calculo.completo else 'incremental'}: "
+    f"{calculo.recalculadas} de {len(resultados)} linhas calculadas neste rerun."
+)
 
-# Exportação
+# Sensibilidade
+st.markdown("### 🔬 Análise de Sensibilidade")
+if st.checkbox("Simular faixas de Frete, % Contrato e % Estratégico"):
+    cols = st.columns(3)
+    faixa_frete = cols[0].slider("Frete por Caixa (R$)", 0.0, 10.0, (0.0, 3.0), step=0.05)
+    faixa_contrato = cols[1].slider("% Contrato", 0.0, 20.0, (0.0, 5.0), step=0.1)
+    faixa_estrategico = cols[2].slider("% Estratégico", 0.0, 50.0, (0.0, 10.0), step=0.5)
+    passos_frete = cols[0].number_input("Pontos de Frete", min_value=2, max_value=100, value=21)
+    passos_contrato = cols[1].number_input("Pontos de % Contrato", min_value=2, max_value=100, value=21)
+    passos_estrategico = cols[2].number_input("Pontos de % Estratégico", min_value=1, max_value=50, value=5)
+
+    inicio = time.perf_counter()
+    with instrumentacao.secao("sensibilidade"):
+        sensibilidade = varrer_sensibilidade(
+            st.session_state.df_editado,
+            np.linspace(*faixa_frete, int(passos_frete)),
+            np.linspace(*faixa_contrato, int(passos_contrato)) / 100,
+            np.linspace(*faixa_estrategico, int(passos_estrategico)) / 100,
+            tipo_frete
+        )
+    st.caption(f"{sensibilidade['Lucro %'].size:,} cenários calculados em {time.perf_counter() - inicio:.3f}s".replace(",", "."))
+
+    produto = st.selectbox("Produto", ["Todos (carteira)"] + st.session_state.df_editado["Descrição"].tolist())
+    estrategico_sel = st.select_slider(
+        "% Estratégico exibido",
+        options=list(range(len(sensibilidade["estrategicos"]))),
+        format_func=lambda i: f"{sensibilidade['estrategicos'][i] * 100:.2f}%"
+    )
+    if produto == "Todos (carteira)":
+        lucro_pct = lucro_percentual_total(sensibilidade)[:, :, estrategico_sel]
+        equilibrio = None
+    else:
+        linha = st.session_state.df_editado["Descrição"].tolist().index(produto)
+        lucro_pct = sensibilidade["Lucro %"][linha, :, :, estrategico_sel]
+        equilibrio = sensibilidade["Preço de Equilíbrio (R$)"][linha, :, :, estrategico_sel]
+
+    eixos = dict(
+        labels={"x": "% Contrato", "y": "Frete por Caixa (R$)"},
+        x=np.round(sensibilidade["contratos"] * 100, 2),
+        y=np.round(sensibilidade["fretes"], 2),
+        aspect="auto",
+    )
+    with instrumentacao.secao("gráficos"):
+        st.plotly_chart(
+            px.imshow(lucro_pct, color_continuous_scale="RdYlGn", color_continuous_midpoint=0,
+                      title="Lucro % por Frete × % Contrato", **eixos),
+            use_container_width=True
+        )
+        if equilibrio is not None:
+            st.plotly_chart(
+                px.imshow(equilibrio, color_continuous_scale="Blues",
+                          title="Preço de Equilíbrio (R$) por Frete × % Contrato", **eixos),
+                use_container_width=True
+            )
+
+    # Tabela longa (uma linha por SKU × ponto da grade): montada só quando o arquivo é pedido.
+    # Excel fica de fora: grades grandes passam do limite de linhas da planilha.
+    st.markdown("📄 Baixar tabela de sensibilidade")
+    df_sensibilidade = st.session_state.df_editado
+    exportar_sob_demanda(
+        lambda: tabela_sensibilidade(df_sensibilidade, sensibilidade), "sensibilidade", "Sensibilidade",
+        "exportacao_sensibilidade", instrumentacao,
+        chave=(hash_tabela(df_sensibilidade), tipo_frete, faixa_frete, faixa_contrato, faixa_estrategico,
+               int(passos_frete), int(passos_contrato), int(passos_estrategico)),
+        formatos=["CSV", "Parquet"]
+    )
+
+# Comparativo entre UFs
+st.markdown("### 🗺️ Comparativo entre UFs")
+if st.checkbox("Comparar todas as UFs (SKU × UF)"):
+    cols = st.columns(2)
+    preco_usado = cols[0].radio("Preço de Venda", ("Planilha", "Lucro % Alvo"), horizontal=True)
+    medida = cols[1].radio("Indicador", MEDIDAS_COMPARATIVO_UF, horizontal=True)
+
+    with instrumentacao.secao("comparativo UFs"):
+        resultado_ufs, pivos_ufs, tempo_ufs = precificar_todas_ufs(
+            df_tabela, frete_padrao, contrato_percentual, tipo_frete,
+            margem_alvo if preco_usado == "Lucro % Alvo" else None
+        )
+    formato = "{:.2f}%" if medida == "Lucro %" else "R$ {:.2f}"
+    pivo = pivos_ufs[medida]
+    estilo = pivo.style.format(formato, na_rep="-")
+    if medida == "Lucro %":
+        estilo = estilo.map(color_negative_red)
+    with instrumentacao.secao("tabelas"):
+        st.dataframe(estilo, use_container_width=True)
+    st.caption(
+        f"{len(resultado_ufs)} linhas ({pivo.shape[1]} UFs × {pivo.shape[0]} SKUs) precificadas em "
+        f"{tempo_ufs * 1000:.1f} ms; trocar o indicador ou a UF só muda a visualização."
+    )
+
+    # Detalhe de uma UF: recorte do resultado já calculado
+    uf_detalhe = st.selectbox("Detalhar UF", pivo.columns.tolist())
+    with instrumentacao.secao("tabelas"):
+        st.dataframe(resultado_ufs[resultado_ufs["UF"] == uf_detalhe], use_container_width=True)
+
+# Risco de margem: Custo NET, Frete Caixa e Bonificação sorteados de distribuições
+st.markdown("### 🎲 Risco de Margem (Monte Carlo)")
+if st.checkbox("Simular risco de margem (Custo NET, Frete Caixa e Bonificação)"):
+    cols = st.columns(3)
+    escopo = cols[0].radio("Linhas", ("UF selecionada (tabela editada)", "Todas as UFs"))
+    cenarios = cols[1].number_input("Cenários por linha", min_value=1_000, max_value=MAX_CENARIOS,
+                                    value=CENARIOS_PADRAO, step=1_000)
+    processos = cols[2].number_input("Processos", min_value=1, max_value=processos_disponiveis(), value=1)
+
+    # Variação relativa (%) sobre o valor da planilha, por variável
+    incertezas = {}
+    padroes = {"Custo NET": ("normal", 5.0), "Frete Caixa": ("triangular", 10.0), "Bonificação": ("uniforme", 20.0)}
+    for coluna, variavel in zip(st.columns(3), VARIAVEIS):
+        distribuicao, amplitude = padroes[variavel]
+        nome = coluna.selectbox(variavel, ["normal", "uniforme", "triangular", "fixo"],
+                                index=["normal", "uniforme", "triangular"].index(distribuicao))
+        if nome == "normal":
+            desvio = coluna.number_input(f"Desvio-padrão (%) - {variavel}", min_value=0.0, value=amplitude, step=0.5)
+            incertezas[variavel] = ("normal", desvio / 100)
+        elif nome == "uniforme":
+            minimo, maximo = coluna.slider(f"Variação (%) - {variavel}", -50.0, 100.0, (-amplitude, amplitude), step=0.5)
+            incertezas[variavel] = ("uniforme", minimo / 100, maximo / 100)
+        elif nome == "triangular":
+            minimo, maximo = coluna.slider(f"Variação (%) - {variavel}", -50.0, 100.0, (-amplitude, 2 * amplitude), step=0.5)
+            moda = coluna.number_input(f"Mais provável (%) - {variavel}", min_value=minimo, max_value=maximo,
+                                       value=min(max(0.0, minimo), maximo), step=0.5)
+            incertezas[variavel] = ("triangular", minimo / 100, moda / 100, maximo / 100)
+
+    if escopo == "Todas as UFs":
+        df_risco = catalogo_precificado(df_tabela, frete_padrao, contrato_percentual, tipo_frete, margem_alvo)
+    else:
+        df_risco = st.session_state.df_editado.reset_index(drop=True)
+    with instrumentacao.secao("risco de margem"):
+        resumo_risco, (contagens_risco, bordas_risco), tempo_risco = simular_risco(
+            df_risco, incertezas, tipo_frete, int(cenarios), int(processos)
+        )
+
+    colunas_pct = ["Lucro % (planilha)"] + [f"Lucro % P{p}" for p in PERCENTIS]
+    estilo = resumo_risco.style.format(
+        {"Preço de Venda": "R$ {:.2f}", **{c: "{:.2f}%" for c in colunas_pct},
+         "Prob. abaixo do equilíbrio (%)": "{:.1f}%"},
+        na_rep="-"
+    ).map(color_negative_red, subset=colunas_pct)
+    with instrumentacao.secao("tabelas"):
+        st.dataframe(estilo, use_container_width=True)
+    st.caption(
+        f"{len(resumo_risco) * int(cenarios):,} avaliações ({len(resumo_risco)} linhas × {int(cenarios):,} cenários) "
+        f"em {tempo_risco:.2f}s com {int(processos)} processo(s). "
+        "Abaixo do equilíbrio = Lucro Líquido negativo no cenário.".replace(",", ".")
+    )
+
+    rotulos = (resumo_risco["Descrição"] + " - " + resumo_risco["UF"]).tolist()
+    linha_risco = st.selectbox("Distribuição do Lucro % da linha", range(len(rotulos)), format_func=lambda i: rotulos[i])
+    # O cache guarda só as contagens do histograma de cada linha, não as margens de todos os cenários
+    if np.isnan(resumo_risco["Lucro % (planilha)"].iat[linha_risco]):
+        st.info("Linha sem Preço de Venda: não há margem a simular.")
+    else:
+        bordas = bordas_risco[linha_risco]
+        with instrumentacao.secao("gráficos"):
+            figura = px.bar(x=(bordas[:-1] + bordas[1:]) / 2, y=contagens_risco[linha_risco],
+                            labels={"x": "Lucro %", "y": "Cenários"},
+                            title=f"Lucro % em {int(cenarios):,} cenários - {rotulos[linha_risco]}".replace(",", "."))
+            figura.update_layout(bargap=0)
+            st.plotly_chart(figura, use_container_width=True)
+
+# Otimizador: Preço de Venda de todos os SKUs da UF para o maior Lucro Líquido total
+st.markdown("### 🧮 Otimizador de Preços da UF")
+if st.checkbox("Otimizar preços da UF (resposta de volume por elasticidade)"):
+    cols = st.columns(2)
+    elasticidade_padrao = cols[0].number_input(
+        "Elasticidade padrão", max_value=0.0, value=ELASTICIDADE_PADRAO, step=0.1,
+        help="Variação % do volume para cada 1% de variação no preço (ex.: -1,5)."
+    )
+    teto_percentual = cols[1].number_input("Teto padrão (% acima do preço de referência)", min_value=0.0,
+                                           value=TETO_PADRAO, step=5.0)
+
+    # Referência: preço e quantidade da tabela editada; sem preço, o do Lucro % Alvo
+    df_otimizacao = st.session_state.df_editado.reset_index(drop=True)
+    df_alvo, _ = preencher_preco_margem(df_otimizacao, margens_alvo(df_otimizacao, margem_alvo), tipo_frete)
+    df_otimizacao["Preço de Venda"] = df_otimizacao["Preço de Venda"].fillna(df_alvo["Preço de Venda"])
+
+    # Premissas por SKU (em branco = padrão acima / sem limite de Total NF)
+    premissas = pd.DataFrame({
+        "Descrição": df_otimizacao["Descrição"],
+        "Preço de Venda": df_otimizacao["Preço de Venda"],
+        "Quantidade": df_otimizacao["Quantidade"],
+        COLUNA_ELASTICIDADE: df_otimizacao.get(COLUNA_ELASTICIDADE, np.nan),
+        COLUNA_PRECO_MAXIMO: df_otimizacao.get(COLUNA_PRECO_MAXIMO, np.nan),
+        COLUNA_NF_MAXIMA: df_otimizacao.get(COLUNA_NF_MAXIMA, np.nan),
+    }).astype({COLUNA_ELASTICIDADE: float, COLUNA_PRECO_MAXIMO: float, COLUNA_NF_MAXIMA: float})
+    premissas = st.data_editor(
+        premissas, use_container_width=True, hide_index=True,
+        disabled=["Descrição", "Preço de Venda", "Quantidade"], key=f"premissas_otimizador_{uf_selecionado}"
+    )
+    for coluna in (COLUNA_ELASTICIDADE, COLUNA_PRECO_MAXIMO, COLUNA_NF_MAXIMA):
+        df_otimizacao[coluna] = premissas[coluna].to_numpy()
+
+    with instrumentacao.secao("otimizador"):
+        inicio = time.perf_counter()
+        otimo = otimizar_precos(df_otimizacao, tipo_frete, elasticidade_padrao, teto_percentual)
+        tempo_otimizacao = time.perf_counter() - inicio
+
+    viaveis = otimo["Restrição"] != "inviável"
+    lucro_atual = otimo["Lucro Líquido Atual (R$)"].sum()
+    lucro_otimo = otimo["Lucro Líquido Ótimo (R$)"].sum()
+    cols = st.columns(3)
+    cols[0].metric("Lucro Líquido atual", str(moeda_br(lucro_atual)))
+    cols[1].metric("Lucro Líquido otimizado", str(moeda_br(lucro_otimo)),
+        ("-" if lucro_otimo < lucro_atual else "+") + str(moeda_br(abs(lucro_otimo - lucro_atual))))
+    cols[2].metric("SKUs otimizados", f"{viaveis.sum()} de {len(otimo)}")
+    for descricao in otimo.loc[~viaveis, "Descrição"]:
+        st.warning(f"{descricao}: sem preço viável (piso acima do teto, Total NF máximo ou despesas acima de 100%).")
+
+    colunas_moeda = ["Preço Atual", "Preço Ótimo", "Lucro Líquido Atual (R$)", "Lucro Líquido Ótimo (R$)",
+                     "Total NF Ótimo (R$)", "Preço de Equilíbrio (R$)"]
+    estilo = otimo.style.format(
+        {**{c: "R$ {:.2f}" for c in colunas_moeda}, "Variação %": "{:+.2f}%",
+         "Volume Atual": "{:.0f}", "Volume Ótimo": "{:.0f}", "dLucro/dPreço": "{:.3f}"},
+        na_rep="-"
+    ).map(color_negative_red, subset=["Lucro Líquido Atual (R$)", "Lucro Líquido Ótimo (R$)"])
+    with instrumentacao.secao("tabelas"):
+        st.dataframe(estilo, use_container_width=True)
+    st.caption(
+        f"{len(otimo)} SKUs resolvidos em {tempo_otimizacao * 1000:.1f} ms. Restrição: livre = ótimo sem limite ativo "
+        "(dLucro/dPreço ≈ 0); piso = Preço de Equilíbrio ou Total NF máximo; teto = Preço Máximo ou Total NF máximo."
+    )
+    exportar_sob_demanda(otimo, "precos_otimizados", "Otimização", "exportacao_otimizacao", instrumentacao)
+
+# Exportação (gerada só quando solicitada e memorizada pelo conteúdo do resultado)
 st.markdown("### 📄 Baixar resultado em Excel")
-excel_buffer = io.BytesIO()
-with pd.ExcelWriter(excel_buffer, engine="xlsxwriter") as writer:
-    resultado_final.to_excel(writer, index=False, sheet_name="Resultado")
-
-st.download_button(
-    label="📄 Baixar Excel com Resultado",
-    data=excel_buffer.getvalue(),
-    file_name="resultado_simulacao.xlsx",
-    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-)
+exportar_sob_demanda(resultado_final, "resultado_simulacao", "Resultado", "exportacao_resultado", instrumentacao)
 
 st.markdown("""
 ### ℹ️ **Notas Explicativas**
@@ -323,3 +510,4 @@ O "Preço de Equilíbrio" reflete o valor mínimo de venda necessário para cobr
 4. **Fórmula do Preço de Equilíbrio (quando lucro é negativo):**
 """)
 
+exibir_instrumentacao(instrumentacao)
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+# Formatação pt-BR vetorizada para as tabelas do app.py.
+# Os valores continuam numéricos na análise; o texto é gerado só na exibição, coluna a coluna,
+# com aritmética inteira e operações de string do NumPy (sem lambda por célula).
+
+COR_NEGATIVO = "background-color: #ffb3b3"
+
+# Strings de tamanho variável do NumPy 2 (mais rápidas que o dtype "U"); no NumPy 1, "U"
+TEXTO = np.dtypes.StringDType() if hasattr(getattr(np, "dtypes", None), "StringDType") else str
+
+
+def _milhares(inteiros):
+    texto = (inteiros % 1000).astype(TEXTO)
+    restante = inteiros // 1000
+    largura = 3
+    while restante.any():
+        grupo = np.char.add(np.char.add((restante % 1000).astype(TEXTO), "."), np.char.zfill(texto, largura))
+        texto = np.where(restante > 0, grupo, texto)
+        restante = restante // 1000
+        largura += 4
+    return texto
+
+
+# Números em pt-BR: milhar com ponto, decimal com vírgula; NaN e infinitos ficam em branco
+def numero_br(valores, casas=2, prefixo="", sufixo=""):
+    valores = np.asarray(valores, dtype=float)
+    finitos = np.isfinite(valores)
+    escala = 10 ** casas
+    unidades = np.rint(np.abs(np.where(finitos, valores, 0.0)) * escala).astype(np.int64)
+
+    texto = _milhares(unidades // escala)
+    if casas:
+        texto = np.char.add(np.char.add(texto, ","), np.char.zfill((unidades % escala).astype(TEXTO), casas))
+    sinal = np.where((valores < 0) & (unidades > 0), "-", "")
+    texto = np.char.add(np.char.add(prefixo, sinal), np.char.add(texto, sufixo))
+    return np.where(finitos, texto, "")
+
+
+def moeda_br(valores):
+    return numero_br(valores, 2, prefixo="R$ ")
+
+
+def percentual_br(valores, casas=2):
+    return numero_br(valores, casas, sufixo="%")
+
+
+def inteiro_br(valores):
+    return numero_br(valores, 0)
+
+
+# Monta a tabela de exibição a partir da numérica: {coluna: formatador} e, opcionalmente,
+# pinta de vermelho as linhas em que a coluna numérica `destaque` é negativa.
+def tabela_formatada(df, formatos, destaque=None):
+    exibicao = df.copy()
+    for coluna, formatador in formatos.items():
+        if coluna in exibicao.columns:
+            exibicao[coluna] = formatador(df[coluna].to_numpy())
+
+    if destaque is None:
+        return exibicao
+    negativos = df[destaque].to_numpy(dtype=float) < 0
+    if not negativos.any():
+        return exibicao
+    estilos = np.where(negativos[:, None], COR_NEGATIVO, "")
+    estilos = np.broadcast_to(estilos, exibicao.shape)
+    return exibicao.style.apply(
+        lambda _: pd.DataFrame(estilos, index=exibicao.index, columns=exibicao.columns), axis=None
+    )
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+# Índice por dimensão da CARTEIRA, montado uma vez por upload:
+# cada valor vira um código inteiro e cada código aponta para as posições das suas linhas.
+# Uma combinação de filtros vira a interseção desses arrays de posições.
+
+DIMENSOES = ["CLIENTE", "UF", "SKU", "REDE", "SUP", "VENDEDOR"]
+TODOS = "Todos"
+
+
+def _codificar(serie):
+    try:
+        return pd.factorize(serie, sort=True)
+    except TypeError:
+        # Tipos misturados não ordenam; mantém a ordem de aparição
+        return pd.factorize(serie)
+
+
+def indexar_dimensao(serie):
+    codigos, valores = _codificar(serie)
+    ordem = np.argsort(codigos, kind="stable")
+    sem_valor = int((codigos < 0).sum())
+    contagens = np.bincount(codigos[codigos >= 0], minlength=len(valores))
+    posicoes = np.split(ordem[sem_valor:], np.cumsum(contagens)[:-1]) if len(valores) else []
+    return {
+        "valores": list(valores),
+        "codigo_por_valor": {valor: i for i, valor in enumerate(valores)},
+        "codigos": codigos,
+        "posicoes": posicoes,
+    }
+
+
+def construir_indice(df, dimensoes=DIMENSOES):
+    return {dim: indexar_dimensao(df[dim]) for dim in dimensoes if dim in df.columns}
+
+
+# Valores ordenados para os selectbox (vazio se a dimensão não existe na base)
+def valores_dimensao(indice, dim):
+    return indice[dim]["valores"] if dim in indice else []
+
+
+# Retorna None quando nenhum filtro está ativo (todas as linhas), senão as posições ordenadas
+def filtrar_posicoes(indice, selecoes):
+    conjuntos = []
+    for dim, valor in selecoes.items():
+        if valor == TODOS or dim not in indice:
+            continue
+        codigo = indice[dim]["codigo_por_valor"].get(valor)
+        if codigo is None:
+            return np.array([], dtype=np.intp)
+        conjuntos.append(indice[dim]["posicoes"][codigo])
+
+    if not conjuntos:
+        return None
+    conjuntos.sort(key=len)
+    posicoes = conjuntos[0]
+    for outro in conjuntos[1:]:
+        if len(posicoes) == 0:
+            break
+        posicoes = np.intersect1d(posicoes, outro, assume_unique=True)
+    return posicoes
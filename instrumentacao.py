@@ -0,0 +1,167 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+# Instrumentação por seção dos reruns (app.py e forma-preco.py): tempo de cada trecho nomeado
+# (ingestão, filtros, agregação, tabelas, gráficos, exportação...) e amostras de memória (RSS).
+# Desligada, cada seção é um nullcontext compartilhado: nenhuma medição, nenhuma alocação.
+# Ligada, o resultado aparece na barra lateral e cada rerun vira uma linha no log JSONL.
+
+ARQUIVO_LOG_PADRAO = "instrumentacao.jsonl"
+
+_lock = threading.Lock()
+_NULO = nullcontext()
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    _PAGINA_BYTES = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGINA_BYTES = None
+
+
+# RSS atual em bytes (Linux, via /proc); None onde não há /proc
+def rss_atual():
+    if _PAGINA_BYTES is None:
+        return None
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGINA_BYTES
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+# Pico de RSS do processo em bytes (ru_maxrss: KB no Linux, bytes no macOS)
+def pico_rss():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico if sys.platform == "darwin" else pico * 1024
+
+
+def _mb(valor):
+    return None if valor is None else round(valor / 1024 ** 2, 1)
+
+
+class _Secao:
+    __slots__ = ("instrumentacao", "nome", "inicio", "rss")
+
+    def __init__(self, instrumentacao, nome):
+        self.instrumentacao = instrumentacao
+        self.nome = nome
+
+    def __enter__(self):
+        self.rss = rss_atual()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        decorrido = time.perf_counter() - self.inicio
+        rss = rss_atual()
+        delta = None if rss is None or self.rss is None else rss - self.rss
+        self.instrumentacao._registrar(self.nome, decorrido, delta)
+        return False
+
+
+class Instrumentacao:
+    def __init__(self, pagina, ativa=False, arquivo_log=ARQUIVO_LOG_PADRAO):
+        self.pagina = pagina
+        self.ativa = ativa
+        self.arquivo_log = arquivo_log
+        self.secoes = {}
+        self.finalizada = False
+        self._inicio = time.perf_counter()
+
+    # Uso: with instrumentacao.secao("agregação"): ...  Seções com o mesmo nome se acumulam no rerun.
+    def secao(self, nome):
+        if not self.ativa:
+            return _NULO
+        return _Secao(self, nome)
+
+    def _registrar(self, nome, segundos, delta_rss):
+        if self.finalizada:
+            # Rerun só de fragmento (ex.: botão de exportação): a página não é refeita, então a
+            # seção vai direto para o log em um registro próprio
+            self._gravar(self._registro({nome: self._acumular({}, segundos, delta_rss)}, segundos, fragmento=True))
+            return
+        self.secoes[nome] = self._acumular(self.secoes.get(nome, {}), segundos, delta_rss)
+
+    @staticmethod
+    def _acumular(secao, segundos, delta_rss):
+        anterior = secao.get("delta_rss", 0)
+        return {
+            "ms": secao.get("ms", 0.0) + segundos * 1000,
+            "chamadas": secao.get("chamadas", 0) + 1,
+            "delta_rss": None if delta_rss is None or anterior is None else anterior + delta_rss,
+        }
+
+    def _registro(self, secoes, total, fragmento=False):
+        return {
+            "data": datetime.now().isoformat(timespec="milliseconds"),
+            "pagina": self.pagina,
+            "fragmento": fragmento,
+            "total_ms": round(total * 1000, 2),
+            "rss_mb": _mb(rss_atual()),
+            "pico_rss_mb": _mb(pico_rss()),
+            "secoes": [
+                {"secao": nome, "ms": round(dados["ms"], 2), "chamadas": dados["chamadas"],
+                 "delta_rss_mb": _mb(dados["delta_rss"])}
+                for nome, dados in secoes.items()
+            ],
+        }
+
+    def _gravar(self, registro):
+        if not self.arquivo_log:
+            return
+        linha = json.dumps(registro, ensure_ascii=False)
+        with _lock:
+            with open(self.arquivo_log, "a", encoding="utf-8") as f:
+                f.write(linha + "\n")
+
+    # Fecha o rerun: grava a linha no log e devolve o registro
+    def finalizar(self):
+        registro = self._registro(self.secoes, time.perf_counter() - self._inicio)
+        self.finalizada = True
+        self._gravar(registro)
+        return registro
+
+
+# Ponto de entrada das páginas: liga/desliga pela barra lateral (desligada não custa nada);
+# INSTRUMENTACAO=1 deixa ligado por padrão e INSTRUMENTACAO_LOG troca o arquivo de log
+# (vazio desativa a gravação)
+def iniciar_instrumentacao(pagina):
+    ativa = st.sidebar.checkbox(
+        "🩺 Instrumentação (tempo por seção)",
+        value=os.environ.get("INSTRUMENTACAO") == "1",
+        key="instrumentacao_ativa"
+    )
+    return Instrumentacao(pagina, ativa, os.environ.get("INSTRUMENTACAO_LOG", ARQUIVO_LOG_PADRAO))
+
+
+def exibir_instrumentacao(instrumentacao):
+    if not instrumentacao.ativa:
+        return
+    registro = instrumentacao.finalizar()
+    with st.sidebar.expander("🩺 Tempo por seção", expanded=True):
+        if registro["secoes"]:
+            tabela = pd.DataFrame(registro["secoes"]).sort_values("ms", ascending=False)
+            tabela["% do rerun"] = tabela["ms"] / registro["total_ms"] * 100
+            st.dataframe(
+                tabela.style.format({"ms": "{:.1f}", "delta_rss_mb": "{:+.1f}", "% do rerun": "{:.0f}%"}, na_rep="-"),
+                hide_index=True
+            )
+        st.caption(
+            f"Rerun: {registro['total_ms']:.0f} ms · RSS {registro['rss_mb']} MB "
+            f"(pico {registro['pico_rss_mb']} MB)"
+            + (f" · log: {instrumentacao.arquivo_log}" if instrumentacao.arquivo_log else "")
+        )
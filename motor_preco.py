@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+
+# Parâmetros fiscais do simulador
+DIVISOR_LUCRO_LIQUIDO = 1.34
+ALIQUOTA_IRPJ = 0.25
+ALIQUOTA_CSLL = 0.09
+
+# Percentuais que incidem sobre o preço de venda
+COLUNAS_DESPESAS = [
+    "ICMS", "COFINS", "PIS", "Comissão", "Bonificação",
+    "Contigência", "Contrato", "%Estrategico"
+]
+
+COLUNA_MARGEM_ALVO = "Lucro % Alvo"
+
+COLUNAS_NECESSARIAS = ["Preço de Venda", "Quantidade", "Frete Caixa", "%Estrategico", "IPI", "ICMS ST", "ICMS", "MVA"]
+
+COLUNAS_RESULTADO = [
+    "Subtotal (R$)", "Frete Total (R$)", "IPI (R$)", "Base ICMS-ST (R$)",
+    "ICMS-ST (R$)", "Lucro Bruto (R$)", "Lucro Líquido (R$)", "IRPJ (R$)",
+    "CSLL (R$)", "Lucro %", "Total NF (R$)", "Ponto de Equilíbrio (R$)"
+]
+
+# Todas as colunas lidas pelo cálculo de uma linha
+COLUNAS_ENTRADA = list(dict.fromkeys(COLUNAS_NECESSARIAS + COLUNAS_DESPESAS + ["Custo NET", "Custo Fixo"]))
+
+MEDIDAS_COMPARATIVO_UF = ["Lucro %", "Ponto de Equilíbrio (R$)", "Total NF (R$)"]
+
+
+# Completa colunas ausentes e aplica os parâmetros globais (frete por caixa e % contrato)
+def preparar_tabela(df, frete_caixa, contrato_percentual):
+    df = df.copy()
+    for col in COLUNAS_NECESSARIAS:
+        if col not in df.columns:
+            df[col] = 0.0 if col != "Quantidade" else 1
+    df["Frete Caixa"] = frete_caixa
+    df["Contrato"] = contrato_percentual
+    return df
+
+
+def _coluna(df, nome):
+    return df[nome].to_numpy(dtype=float)
+
+
+# Máscara CIF por linha: aceita "CIF"/"FOB" global ou uma coluna com o tipo por linha
+def mascara_cif(tipo_frete, n):
+    tipo = np.asarray(tipo_frete)
+    if tipo.ndim == 0:
+        return np.full(n, str(tipo) == "CIF")
+    return np.isin(tipo, ["CIF", "C"])
+
+
+def despesas_percentuais(df):
+    return df[COLUNAS_DESPESAS].to_numpy(dtype=float).sum(axis=1)
+
+
+def custo_total_unitario(df):
+    return _coluna(df, "Custo NET") + _coluna(df, "Custo Fixo")
+
+
+# Lucro % sobre o subtotal (zero quando não há receita)
+def percentual_sobre(valor, subtotal):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(subtotal > 0, valor / subtotal * 100, 0.0)
+
+
+# Preço que zera o lucro: (custo + frete) / (1 - despesas). Linhas com despesas >= 100% ficam em 0
+def preco_equilibrio(custo_total_unit, frete_unit, despesas):
+    viavel = despesas < 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        preco = np.round((custo_total_unit + frete_unit) / (1 - despesas), 2)
+    return np.where(viavel, preco, 0.0), ~viavel
+
+
+# Preço que atinge um Lucro % alvo sobre o subtotal (solução exata, por trechos):
+#   alvo > 0:  lucro bruto / 1,34 = alvo × preço  ->  preço = (custo + frete) / (1 - despesas - 1,34 × alvo)
+#   alvo <= 0: lucro bruto = alvo × preço          ->  preço = (custo + frete) / (1 - despesas - alvo)
+# Inviável quando despesas + margem consomem 100% do preço; essas linhas ficam em 0
+def preco_para_margem(custo_total_unit, frete_unit, despesas, margem_percentual):
+    alvo = np.asarray(margem_percentual, dtype=float) / 100
+    denominador = 1 - despesas - np.where(alvo > 0, DIVISOR_LUCRO_LIQUIDO, 1.0) * alvo
+    viavel = (despesas < 1) & (denominador > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        preco = (custo_total_unit + frete_unit) / denominador
+    return np.where(viavel, preco, 0.0), ~viavel
+
+
+# Lucro líquido: lucro bruto positivo é dividido por 1,34 (IRPJ + CSLL); negativo passa direto
+def lucro_liquido(lucro_bruto):
+    return np.where(lucro_bruto > 0, lucro_bruto / DIVISOR_LUCRO_LIQUIDO, lucro_bruto)
+
+
+# Núcleo do cálculo em arrays (aceita broadcasting entre os argumentos)
+def calcular_componentes(preco_venda, qtd, frete_caixa, cif, custo_total_unit,
+                         despesas, ipi, icms, mva):
+    subtotal = preco_venda * qtd
+    frete_unit = np.where(cif, frete_caixa, 0.0)
+    frete_total = frete_unit * qtd
+
+    ipi_total = subtotal * ipi
+    base_icms_st = (subtotal + ipi_total) * (1 + mva)
+    icms_st = np.maximum(base_icms_st * icms - subtotal * icms, 0)
+
+    despesas_reais = preco_venda * despesas * qtd + frete_total
+    lucro_bruto = (preco_venda - custo_total_unit) * qtd - despesas_reais
+
+    positivo = lucro_bruto > 0
+    liquido = lucro_liquido(lucro_bruto)
+    irpj = np.where(positivo, liquido * ALIQUOTA_IRPJ, 0.0)
+    csll = np.where(positivo, liquido * ALIQUOTA_CSLL, 0.0)
+
+    lucro_percentual = percentual_sobre(liquido, subtotal)
+    total_nf = subtotal + ipi_total + icms_st
+
+    equilibrio, _ = preco_equilibrio(custo_total_unit, frete_unit, despesas)
+    ponto_equilibrio = np.where((liquido < 0) & (despesas < 1), equilibrio, preco_venda)
+
+    return {
+        "Subtotal (R$)": subtotal,
+        "Frete Total (R$)": frete_total,
+        "IPI (R$)": ipi_total,
+        "Base ICMS-ST (R$)": base_icms_st,
+        "ICMS-ST (R$)": icms_st,
+        "Lucro Bruto (R$)": lucro_bruto,
+        "Lucro Líquido (R$)": liquido,
+        "IRPJ (R$)": irpj,
+        "CSLL (R$)": csll,
+        "Lucro %": lucro_percentual,
+        "Total NF (R$)": total_nf,
+        "Ponto de Equilíbrio (R$)": ponto_equilibrio,
+    }
+
+
+# Equivalente vetorizado de df.apply(calcular_linha, axis=1)
+def calcular_precos(df, tipo_frete="CIF"):
+    n = len(df)
+    componentes = calcular_componentes(
+        preco_venda=_coluna(df, "Preço de Venda"),
+        qtd=_coluna(df, "Quantidade"),
+        frete_caixa=_coluna(df, "Frete Caixa"),
+        cif=mascara_cif(tipo_frete, n),
+        custo_total_unit=custo_total_unitario(df),
+        despesas=despesas_percentuais(df),
+        ipi=_coluna(df, "IPI"),
+        icms=_coluna(df, "ICMS"),
+        mva=_coluna(df, "MVA"),
+    )
+    return pd.DataFrame(
+        {col: np.broadcast_to(componentes[col], (n,)) for col in COLUNAS_RESULTADO},
+        index=df.index
+    )
+
+
+# Preenche "Preço de Venda" com o ponto de equilíbrio; retorna também a máscara de alertas
+def preencher_preco_equilibrio(df, tipo_frete="CIF"):
+    df_atualizado = df.copy()
+    frete_unit = np.where(mascara_cif(tipo_frete, len(df)), _coluna(df, "Frete Caixa"), 0.0)
+    preco, alerta = preco_equilibrio(custo_total_unitario(df), frete_unit, despesas_percentuais(df))
+    df_atualizado["Preço de Venda"] = preco
+    return df_atualizado, pd.Series(alerta, index=df.index)
+
+
+# Lucro % alvo por linha: coluna "Lucro % Alvo" da planilha, completada pelo valor global
+def margens_alvo(df, margem_padrao=np.nan):
+    if COLUNA_MARGEM_ALVO in df.columns:
+        return df[COLUNA_MARGEM_ALVO].astype(float).fillna(margem_padrao).to_numpy()
+    return np.full(len(df), margem_padrao, dtype=float)
+
+
+# Preenche "Preço de Venda" para atingir o Lucro % alvo (um valor global ou um por linha).
+# Linhas com alvo vazio mantêm o preço; retorna também a máscara de alvos inviáveis
+def preencher_preco_margem(df, margem_percentual, tipo_frete="CIF"):
+    df_atualizado = df.copy()
+    alvo = np.broadcast_to(np.asarray(margem_percentual, dtype=float), (len(df),))
+    frete_unit = np.where(mascara_cif(tipo_frete, len(df)), _coluna(df, "Frete Caixa"), 0.0)
+    preco, inviavel = preco_para_margem(custo_total_unitario(df), frete_unit, despesas_percentuais(df), alvo)
+
+    definido = ~np.isnan(alvo)
+    df_atualizado["Preço de Venda"] = np.where(definido, np.round(preco, 2), _coluna(df, "Preço de Venda"))
+    return df_atualizado, pd.Series(definido & inviavel, index=df.index)
+
+
+# Todas as UFs em uma única passada; cada tabela SKU × UF é só um pivot do resultado já calculado
+def comparar_ufs(df, tipo_frete="CIF", medidas=MEDIDAS_COMPARATIVO_UF):
+    resultado = pd.concat([df, calcular_precos(df, tipo_frete)], axis=1)
+    pivos = {
+        medida: resultado.pivot_table(
+            index="Descrição", columns="UF", values=medida, aggfunc="first", dropna=False, sort=False
+        )
+        for medida in medidas
+    }
+    return resultado, pivos
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from motor_preco import (
+    DIVISOR_LUCRO_LIQUIDO, custo_total_unitario, despesas_percentuais, lucro_liquido, mascara_cif,
+    preco_equilibrio
+)
+from preco_sobel import _fator_st
+
+# Otimização do Preço de Venda de todos os SKUs de uma UF para o maior Lucro Líquido total.
+# Resposta de volume com elasticidade constante: q(p) = q0 × (p / p0)^e, com p0/q0 = preço e
+# quantidade de referência da linha. Lucro bruto: LB(p) = (a × p - k) × q(p), com
+# a = 1 - despesas % e k = custo total unitário + frete unitário.
+#
+# Gradiente analítico: dLB/dp = q(p) × [a + e × (a × p - k) / p], que zera em
+#   p* = k / a × e / (1 + e)          (e < -1; com e >= -1 o lucro cresce com o preço até o teto)
+# O lucro líquido é LB / 1,34 quando positivo, então tem o mesmo ótimo. Sem restrições que liguem
+# os SKUs, o problema se separa por linha e cada uma vai para p* projetado no intervalo viável:
+#   piso  = Ponto de Equilíbrio (k / a)
+#   teto  = Preço Máximo da linha (ou referência × (1 + teto %))
+#   Total NF(p) = (1 + IPI + fator ST) × p × q(p) <= Total NF Máximo: teto se e > -1, piso se e < -1
+# Como LB(p) é unimodal acima do equilíbrio, a projeção é o ótimo restrito.
+
+ELASTICIDADE_PADRAO = -1.5
+TETO_PADRAO = 30.0
+COLUNA_ELASTICIDADE = "Elasticidade"
+COLUNA_PRECO_MAXIMO = "Preço Máximo"
+COLUNA_NF_MAXIMA = "Total NF Máximo (R$)"
+
+
+def _opcional(df, coluna, padrao=np.nan):
+    if coluna in df.columns:
+        return pd.to_numeric(df[coluna], errors="coerce").fillna(padrao).to_numpy(dtype=float)
+    return np.full(len(df), padrao, dtype=float)
+
+
+def volume(preco, preco_ref, qtd_ref, elasticidade):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return qtd_ref * (preco / preco_ref) ** elasticidade
+
+
+# Lucro líquido e sua derivada em relação ao preço (vetorizados)
+def lucro_e_gradiente(preco, a, k, preco_ref, qtd_ref, elasticidade):
+    q = volume(preco, preco_ref, qtd_ref, elasticidade)
+    margem_unit = a * preco - k
+    lucro_bruto = margem_unit * q
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gradiente_bruto = q * (a + elasticidade * margem_unit / preco)
+    gradiente = np.where(lucro_bruto > 0, gradiente_bruto / DIVISOR_LUCRO_LIQUIDO, gradiente_bruto)
+    return lucro_liquido(lucro_bruto), gradiente
+
+
+# Limites em centavos: o piso arredonda para cima e o teto para baixo, sem sair do intervalo viável
+def _limites_centavos(piso, teto):
+    return np.ceil(np.round(piso * 100, 6)) / 100, np.floor(np.round(teto * 100, 6)) / 100
+
+
+def otimizar_precos(df, tipo_frete="CIF", elasticidade_padrao=ELASTICIDADE_PADRAO, teto_percentual=TETO_PADRAO):
+    preco_ref = df["Preço de Venda"].to_numpy(dtype=float)
+    qtd_ref = df["Quantidade"].to_numpy(dtype=float)
+    elasticidade = _opcional(df, COLUNA_ELASTICIDADE, elasticidade_padrao)
+    despesas = despesas_percentuais(df)
+    a = 1 - despesas
+    frete_unit = np.where(mascara_cif(tipo_frete, len(df)), df["Frete Caixa"].to_numpy(dtype=float), 0.0)
+    k = custo_total_unitario(df) + frete_unit
+    ipi = df["IPI"].to_numpy(dtype=float)
+    fator_nf = 1 + ipi + _fator_st(df["MVA"].to_numpy(dtype=float), ipi, df["ICMS"].to_numpy(dtype=float))
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        piso = np.where(a > 0, k / a, np.inf)
+        teto = _opcional(df, COLUNA_PRECO_MAXIMO, np.nan)
+        teto = np.where(np.isnan(teto), preco_ref * (1 + teto_percentual / 100), teto)
+        teto = np.where(np.isnan(teto), np.inf, teto)
+
+        # Total NF máximo vira limite de preço pelo sinal de 1 + e
+        nf_maxima = _opcional(df, COLUNA_NF_MAXIMA, np.nan)
+        com_nf = np.isfinite(nf_maxima)
+        preco_nf = (nf_maxima * preco_ref ** elasticidade / (fator_nf * qtd_ref)) ** (1 / (1 + elasticidade))
+        teto = np.where(com_nf & (elasticidade > -1), np.minimum(teto, preco_nf), teto)
+        piso = np.where(com_nf & (elasticidade < -1), np.maximum(piso, preco_nf), piso)
+        nf_fixa_acima = com_nf & (elasticidade == -1) & (fator_nf * qtd_ref * preco_ref > nf_maxima)
+
+        otimo_livre = np.where(elasticidade < -1, k / a * elasticidade / (1 + elasticidade), np.inf)
+
+    referencia_valida = np.isfinite(preco_ref) & (preco_ref > 0) & (qtd_ref > 0)
+    piso, teto = _limites_centavos(piso, teto)
+    viavel = referencia_valida & (a > 0) & (piso <= teto) & ~nf_fixa_acima & np.isfinite(np.minimum(otimo_livre, teto))
+    with np.errstate(invalid="ignore"):
+        preco = np.where(viavel, np.clip(np.round(otimo_livre, 2), piso, teto), preco_ref)
+
+    lucro_ref, _ = lucro_e_gradiente(preco_ref, a, k, preco_ref, qtd_ref, elasticidade)
+    lucro, gradiente = lucro_e_gradiente(preco, a, k, preco_ref, qtd_ref, elasticidade)
+    q = volume(preco, preco_ref, qtd_ref, elasticidade)
+
+    restricao = np.select(
+        [~viavel, preco == teto, preco == piso],
+        ["inviável", "teto", "piso"],
+        default="livre"
+    )
+    resultado = df[[c for c in ("Descrição", "UF") if c in df.columns]].copy()
+    resultado["Preço Atual"] = preco_ref
+    resultado["Preço Ótimo"] = preco
+    resultado["Variação %"] = (preco / preco_ref - 1) * 100
+    resultado["Volume Atual"] = qtd_ref
+    resultado["Volume Ótimo"] = q
+    resultado["Lucro Líquido Atual (R$)"] = lucro_ref
+    resultado["Lucro Líquido Ótimo (R$)"] = lucro
+    resultado["Total NF Ótimo (R$)"] = fator_nf * preco * q
+    resultado["Preço de Equilíbrio (R$)"] = preco_equilibrio(k - frete_unit, frete_unit, despesas)[0]
+    resultado["Restrição"] = restricao
+    # Derivada do lucro no preço escolhido: ~0 nas linhas livres, sinal do limite ativo nas demais
+    resultado["dLucro/dPreço"] = gradiente
+    return resultado
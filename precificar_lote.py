@@ -0,0 +1,140 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from cache_custos import carregar_tabela_custos
+from motor_preco import (
+    calcular_precos, margens_alvo, preencher_preco_equilibrio, preencher_preco_margem, preparar_tabela
+)
+
+# Precificação em lote, sem Streamlit: todas as linhas UF × SKU de uma ou mais planilhas de custo.
+# Uso: python precificar_lote.py custos.xlsx [outra.xlsx ...] --saida resultado.parquet
+#          [--frete 1.50] [--contrato 1.00] [--tipo-frete CIF|FOB] [--equilibrio] [--margem-alvo 10]
+
+TAMANHO_LOTE = 100_000
+
+
+def precificar_bloco(df, tipo_frete, equilibrio, margem_alvo=None):
+    if margem_alvo is not None:
+        # Lucro % alvo global, ou por linha pela coluna "Lucro % Alvo"; alvos inviáveis ficam com preço 0
+        df, inviavel = preencher_preco_margem(df, margens_alvo(df, margem_alvo), tipo_frete)
+        df["Alvo Inviável"] = inviavel
+    elif equilibrio:
+        # Linhas sem preço informado são precificadas no ponto de equilíbrio
+        df_equilibrio, _ = preencher_preco_equilibrio(df, tipo_frete)
+        df = df.copy()
+        df["Preço de Venda"] = df["Preço de Venda"].fillna(df_equilibrio["Preço de Venda"])
+    return pd.concat([df, calcular_precos(df, tipo_frete)], axis=1)
+
+
+def carregar_tabela(arquivo, frete_caixa, contrato_percentual):
+    df = preparar_tabela(carregar_tabela_custos(arquivo), frete_caixa, contrato_percentual)
+    df.insert(0, "Arquivo", os.path.basename(arquivo))
+    return df
+
+
+# A leitura do XLSX é a parte cara: com várias planilhas, cada uma é lida em um processo.
+# O cálculo vetorizado é mais rápido que serializar os blocos entre processos, então fica aqui.
+def carregar_tabelas(arquivos, frete_caixa, contrato_percentual, processos=None):
+    parametros = [(arquivo, frete_caixa, contrato_percentual) for arquivo in arquivos]
+    if len(arquivos) == 1 or processos == 1:
+        tabelas = [carregar_tabela(*p) for p in parametros]
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            tabelas = list(pool.map(carregar_tabela, *zip(*parametros)))
+    return pd.concat(tabelas, ignore_index=True)
+
+
+def dividir(df, tamanho_lote):
+    for inicio in range(0, len(df), tamanho_lote):
+        yield df.iloc[inicio:inicio + tamanho_lote]
+
+
+# Gera os blocos precificados em ordem, para gravação incremental
+def precificar(df, tipo_frete, equilibrio=False, tamanho_lote=TAMANHO_LOTE, margem_alvo=None):
+    for bloco in dividir(df, tamanho_lote):
+        yield precificar_bloco(bloco, tipo_frete, equilibrio, margem_alvo)
+
+
+class GravadorParquet:
+    def __init__(self, caminho):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._pq = pq
+        self.caminho = caminho
+        self._writer = None
+
+    def gravar(self, df):
+        if self._writer is None:
+            tabela = self._pa.Table.from_pandas(df, preserve_index=False)
+            self._writer = self._pq.ParquetWriter(self.caminho, tabela.schema)
+        else:
+            tabela = self._pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+        self._writer.write_table(tabela)
+
+    def fechar(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class GravadorCSV:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._cabecalho = True
+
+    def gravar(self, df):
+        df.to_csv(self.caminho, mode="w" if self._cabecalho else "a", header=self._cabecalho, index=False)
+        self._cabecalho = False
+
+    def fechar(self):
+        pass
+
+
+def criar_gravador(caminho):
+    if caminho.lower().endswith(".parquet"):
+        return GravadorParquet(caminho)
+    if caminho.lower().endswith((".csv", ".csv.gz")):
+        return GravadorCSV(caminho)
+    raise ValueError("A saída deve ser .parquet, .csv ou .csv.gz")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precificação em lote de todas as UFs e SKUs.")
+    parser.add_argument("arquivos", nargs="+", help="Planilhas de custo (.xlsx)")
+    parser.add_argument("--saida", required=True, help="Arquivo de saída (.parquet, .csv ou .csv.gz)")
+    parser.add_argument("--frete", type=float, default=1.50, help="Frete por caixa (R$)")
+    parser.add_argument("--contrato", type=float, default=1.00, help="%% Contrato")
+    parser.add_argument("--tipo-frete", choices=["CIF", "FOB"], default="CIF")
+    parser.add_argument("--equilibrio", action="store_true",
+                        help="Usa o ponto de equilíbrio nas linhas sem Preço de Venda")
+    parser.add_argument("--margem-alvo", type=float, default=None,
+                        help="Lucro %% alvo: calcula o Preço de Venda de cada linha para atingi-lo")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE)
+    parser.add_argument("--processos", type=int, default=None,
+                        help="Processos para ler as planilhas (padrão: todos os núcleos)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    df = carregar_tabelas(args.arquivos, args.frete, args.contrato / 100, args.processos)
+    carga = time.perf_counter() - inicio
+
+    gravador = criar_gravador(args.saida)
+    linhas = 0
+    try:
+        for bloco in precificar(df, args.tipo_frete, args.equilibrio, args.tamanho_lote, args.margem_alvo):
+            gravador.gravar(bloco)
+            linhas += len(bloco)
+    finally:
+        gravador.fechar()
+
+    total = time.perf_counter() - inicio
+    print(f"{linhas} linhas precificadas em {total:.2f}s (carga {carga:.2f}s) -> {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import numpy as np
+
+# Preço Sobel = Preço Negociado + IPI + ST, com
+#   IPI = p × ipi
+#   ST  = max(p × (1 + ipi) × (1 + mva) × icms - p × icms, 0)
+# Como tudo é linear em p, a inversão é exata: p = Preço Sobel / fator
+
+
+def _fator_st(mva, ipi, icms):
+    # ST por real negociado; negativo só com MVA negativa, e nesse caso a ST é zero
+    return np.maximum(((1 + ipi) * (1 + mva) - 1) * icms, 0)
+
+
+def calcular_preco_sobel(preco_neg, mva, ipi, icms):
+    preco_neg = np.asarray(preco_neg, dtype=float)
+    return preco_neg * (1 + ipi + _fator_st(mva, ipi, icms))
+
+
+# Inversão em lote: todos os argumentos aceitam escalares ou arrays (broadcasting)
+def inverter_preco_sobel(preco_sobel, mva, ipi, icms, casas=None):
+    preco_sobel = np.asarray(preco_sobel, dtype=float)
+    mva = np.asarray(mva, dtype=float)
+    ipi = np.asarray(ipi, dtype=float)
+    icms = np.asarray(icms, dtype=float)
+
+    fator = 1 + ipi + _fator_st(mva, ipi, icms)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        preco_neg = np.where(preco_sobel <= 0, 0.0, preco_sobel / fator)
+    if casas is not None:
+        preco_neg = np.round(preco_neg, casas)
+
+    ipi_valor = preco_neg * ipi
+    base_st = preco_neg * (1 + ipi) * (1 + mva)
+    st_valor = np.maximum(base_st * icms - preco_neg * icms, 0)
+    preco_sobel_simulado = preco_neg + ipi_valor + st_valor
+
+    return {
+        "Preço Negociado": preco_neg,
+        "IPI Valor": ipi_valor,
+        "Base ST": base_st,
+        "ST Valor": st_valor,
+        "Preço Sobel Simulado": preco_sobel_simulado,
+        "Diferença": preco_sobel_simulado - preco_sobel,
+    }
@@ -0,0 +1,139 @@
+import time
+
+import numpy as np
+
+# Prompt compacto do diagnóstico por IA (app.py), com orçamento de tokens.
+# Maiores e menores margens por grupo via seleção parcial (argpartition), sem ordenar o grupo inteiro,
+# em tabelas de precisão fixa em vez de reprs de dicionários.
+
+GRUPOS = ["CLIENTE", "SKU", "REDE", "VENDEDOR"]
+TOP_PADRAO = 10
+ORCAMENTO_PADRAO = 3000
+CARACTERES_POR_TOKEN = 3.5
+
+INSTRUCOES = """Você é um analista de dados comerciais.
+Com base nas informações abaixo, gere um relatório estratégico destacando:
+✅ Diagnóstico da Margem: quais clientes, produtos (SKUs), redes e vendedores aumentam ou reduzem a margem (% lucro)?
+✅ Apresente os **Top {k} que mais AUMENTAM** e os **Top {k} que mais REDUZEM** a margem para cada um dos grupos (cliente, produto, rede, vendedor).
+✅ Apresente um plano de ação com sugestões específicas por grupo para elevar a margem global.
+Tabelas: nome|faturamento R$ mil|lucro R$ mil|% lucro. "+" = maiores margens, "-" = menores.
+Gere a resposta em linguagem clara e executiva."""
+
+
+def _contador_tiktoken():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        codificador = tiktoken.encoding_for_model("gpt-4o")
+    except Exception:
+        codificador = tiktoken.get_encoding("cl100k_base")
+    return lambda texto: len(codificador.encode(texto))
+
+
+_contar = _contador_tiktoken()
+
+
+# Tokens do prompt: contagem exata com tiktoken (se instalado) ou estimativa por caracteres
+def contar_tokens(texto):
+    if _contar is not None:
+        return _contar(texto), "tiktoken"
+    return int(np.ceil(len(texto) / CARACTERES_POR_TOKEN)), "estimativa"
+
+
+# Posições das k maiores e k menores margens, cada lista já em ordem (maior→menor, menor→maior)
+def extremos(margens, k):
+    margens = np.asarray(margens, dtype=float)
+    validas = np.flatnonzero(np.isfinite(margens))
+    k = min(k, len(validas))
+    if k == 0:
+        return validas[:0], validas[:0]
+    valores = margens[validas]
+    if k < len(validas):
+        menores = np.argpartition(valores, k - 1)[:k]
+        maiores = np.argpartition(valores, len(valores) - k)[-k:]
+    else:
+        menores = maiores = np.arange(len(validas))
+    menores = menores[np.argsort(valores[menores], kind="stable")]
+    maiores = maiores[np.argsort(-valores[maiores], kind="stable")]
+    return validas[maiores], validas[menores]
+
+
+def _linhas(nomes, faturamento, lucro, margem, posicoes):
+    return [
+        f"{nomes[i]}|{faturamento[i] / 1000:.1f}|{lucro[i] / 1000:.1f}|{margem[i]:.1f}"
+        for i in posicoes
+    ]
+
+
+# Seleciona uma vez, no k máximo, as maiores e menores margens de cada grupo presente no cubo
+def selecionar_extremos(plano, k=TOP_PADRAO, grupos=GRUPOS):
+    selecao = {}
+    for grupo in grupos:
+        if grupo not in plano.cubo.columns:
+            continue
+        dados = plano.obter(grupo, ["VL.BRUTO", "LUCRO LIQ"])
+        faturamento = dados["VL.BRUTO"].to_numpy(dtype=float)
+        lucro = dados["LUCRO LIQ"].to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            margem = lucro / faturamento * 100
+        maiores, menores = extremos(margem, k)
+        nomes = dados[grupo].astype(str).to_numpy()
+        selecao[grupo] = (
+            _linhas(nomes, faturamento, lucro, margem, maiores),
+            _linhas(nomes, faturamento, lucro, margem, menores),
+        )
+    return selecao
+
+
+def _resumo(plano):
+    faturamento = plano.cubo["VL.BRUTO"].sum()
+    lucro = plano.cubo["LUCRO LIQ"].sum()
+    margem = lucro / faturamento * 100 if faturamento else 0.0
+    return f"Faturamento R$ mil: {faturamento / 1000:.1f} | Lucro líquido R$ mil: {lucro / 1000:.1f} | Margem: {margem:.2f}%"
+
+
+def _compor(resumo, selecao, k):
+    partes = [INSTRUCOES.format(k=k), "", "Resumo Executivo:", resumo]
+    for grupo, (maiores, menores) in selecao.items():
+        partes.append(f"\n{grupo}")
+        partes.extend(f"+{linha}" for linha in maiores[:k])
+        partes.extend(f"-{linha}" for linha in menores[:k])
+    return "\n".join(partes)
+
+
+# Monta o prompt respeitando o orçamento: se passar, reduz k até caber (mínimo 1 por lado) e, ainda
+# acima com k = 1, descarta grupos do fim de `grupos` (menor prioridade) até caber.
+# Retorna o prompt e as medidas (tokens, método de contagem, k usado, grupos descartados, se coube
+# no orçamento e tempo de montagem). Sem nenhum grupo e ainda acima, "dentro_do_orcamento" é False.
+def montar_prompt(plano, k=TOP_PADRAO, orcamento_tokens=ORCAMENTO_PADRAO, grupos=GRUPOS):
+    inicio = time.perf_counter()
+    selecao = selecionar_extremos(plano, k, grupos)
+    resumo = _resumo(plano)
+
+    prompt = _compor(resumo, selecao, k)
+    tokens, metodo = contar_tokens(prompt)
+    while tokens > orcamento_tokens and k > 1:
+        # Tokens por linha são aproximadamente constantes: pula direto para o k estimado
+        k = max(1, min(k - 1, int(k * orcamento_tokens / tokens)))
+        prompt = _compor(resumo, selecao, k)
+        tokens, metodo = contar_tokens(prompt)
+
+    descartados = []
+    while tokens > orcamento_tokens and selecao:
+        grupo = list(selecao)[-1]
+        del selecao[grupo]
+        descartados.insert(0, grupo)
+        prompt = _compor(resumo, selecao, k)
+        tokens, metodo = contar_tokens(prompt)
+
+    return prompt, {
+        "tokens": tokens,
+        "metodo": metodo,
+        "k": k,
+        "orcamento": orcamento_tokens,
+        "grupos_descartados": descartados,
+        "dentro_do_orcamento": tokens <= orcamento_tokens,
+        "tempo_ms": (time.perf_counter() - inicio) * 1000,
+    }
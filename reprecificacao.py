@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from motor_preco import custo_total_unitario, despesas_percentuais, lucro_liquido, mascara_cif, preparar_tabela
+
+# Reprecificação histórica da CARTEIRA: cada linha da nota é ligada à tabela de custos por
+# (UF, SKU = Descrição) e o lucro é refeito com as fórmulas do forma-preco.py, usando o preço
+# (VL.BRUTO / QTDE), a quantidade e o TIPO_FRETE da própria linha.
+# O índice de custos é um hash (UF, Descrição) montado uma vez por tabela; a junção consulta só as
+# combinações distintas de UF × SKU do bloco e espalha o resultado com um take, então o custo por
+# linha é de operações inteiras e de arrays. As linhas chegam em blocos e só as somas por
+# dimensão são acumuladas.
+
+CHAVE = ["UF", "Descrição"]
+DIMENSOES_COMPARACAO = ["CLIENTE", "SKU", "VENDEDOR"]
+LUCRO_RECUSTEADO = "LUCRO RECUSTEADO"
+VL_SEM_CUSTO = "VL.BRUTO SEM CUSTO"
+# Somas acumuladas; VL.BRUTO e LUCRO LIQ só das linhas com custo, para as duas margens terem a mesma base
+MEDIDAS = ["LINHAS", "QTDE", "VL.BRUTO", "LUCRO LIQ", LUCRO_RECUSTEADO, VL_SEM_CUSTO]
+# Colunas da CARTEIRA que a reprecificação usa; as de texto ficam em category
+COLUNAS_TEXTO = ["CLIENTE", "UF", "SKU", "VENDEDOR", "TIPO_FRETE"]
+COLUNAS_NUMERICAS = ["QTDE", "VL.BRUTO", "LUCRO LIQ"]
+
+
+# Chave de junção: texto sem espaços extras e em maiúsculas
+def normalizar_chave(valores):
+    return pd.Series(valores, dtype=object).astype(str).str.split().str.join(" ").str.upper().to_numpy()
+
+
+class IndiceCustos:
+    def __init__(self, custos, frete_caixa, contrato_percentual, aumento_custo=0.0):
+        tabela = preparar_tabela(custos, frete_caixa, contrato_percentual)
+        tabela["Custo NET"] = tabela["Custo NET"] * (1 + aumento_custo)
+        chaves = pd.MultiIndex.from_arrays([normalizar_chave(tabela[c]) for c in CHAVE])
+        # Chave repetida: vale a primeira linha, como no servico_precos.py
+        unicas = ~chaves.duplicated()
+        self.indice = chaves[unicas]
+        self.custo = custo_total_unitario(tabela)[unicas]
+        self.despesas = despesas_percentuais(tabela)[unicas]
+        self.frete = tabela["Frete Caixa"].to_numpy(dtype=float)[unicas]
+
+    # Posição na tabela de custos para cada par (uf, sku); -1 quando não há custo cadastrado
+    def posicoes(self, uf, sku):
+        return self.indice.get_indexer(pd.MultiIndex.from_arrays([normalizar_chave(uf), normalizar_chave(sku)]))
+
+
+def _codigos(serie):
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(), np.asarray(serie.cat.categories, dtype=object)
+    codigos, valores = pd.factorize(serie)
+    return codigos, np.asarray(valores, dtype=object)
+
+
+def _categoria(serie):
+    # Categorias sempre object: blocos com valores numéricos e de texto podem ser unidos
+    codigos, valores = pd.factorize(serie)
+    return pd.Categorical.from_codes(codigos, categories=pd.Index(valores, dtype=object))
+
+
+# Só as colunas usadas na reprecificação, com o texto em category (um código inteiro por linha).
+# Lidas uma vez por upload; mudar custos ou parâmetros refaz só reprecificar_carteira sobre elas.
+# Em blocos, cada bloco é reduzido antes de o próximo ser lido.
+def extrair_linhas(blocos):
+    if isinstance(blocos, pd.DataFrame):
+        blocos = [blocos]
+    partes = []
+    for bloco in blocos:
+        parte = {}
+        for coluna in COLUNAS_TEXTO:
+            if coluna in bloco.columns:
+                parte[coluna] = _categoria(bloco[coluna])
+        for coluna in COLUNAS_NUMERICAS:
+            parte[coluna] = pd.to_numeric(bloco[coluna], errors="coerce").to_numpy(dtype=float)
+        partes.append(parte)
+    if not partes:
+        return pd.DataFrame(columns=COLUNAS_TEXTO + COLUNAS_NUMERICAS)
+    return pd.DataFrame({
+        coluna: (
+            union_categoricals([p[coluna] for p in partes]) if coluna in COLUNAS_TEXTO
+            else np.concatenate([p[coluna] for p in partes])
+        )
+        for coluna in partes[0]
+    })
+
+
+# Posição de custo de cada linha: consulta as combinações distintas de UF × SKU e espalha
+def posicoes_custo(carteira, indice):
+    codigos_uf, ufs = _codigos(carteira["UF"])
+    codigos_sku, skus = _codigos(carteira["SKU"])
+    combinado = codigos_uf.astype(np.int64) * max(len(skus), 1) + codigos_sku
+    combinado[(codigos_uf < 0) | (codigos_sku < 0)] = -1
+    grupos, combinacoes = pd.factorize(combinado)
+    validas = combinacoes >= 0
+    por_combinacao = np.full(len(combinacoes), -1, dtype=np.intp)
+    por_combinacao[validas] = indice.posicoes(
+        ufs[combinacoes[validas] // max(len(skus), 1)], skus[combinacoes[validas] % max(len(skus), 1)]
+    )
+    return por_combinacao[grupos]
+
+
+# SKU pela chave de junção: grafias que caem no mesmo custo (" água sanitária 5l " e
+# "ÁGUA SANITÁRIA 5L") viram um único grupo no comparativo. A normalização é feita nos valores
+# distintos e espalhada pelos códigos.
+def sku_normalizado(serie):
+    codigos, valores = _codigos(serie)
+    novos_codigos, normalizados = pd.factorize(normalizar_chave(valores))
+    return pd.Categorical.from_codes(np.where(codigos >= 0, novos_codigos[codigos] if len(valores) else -1, -1),
+                                     categories=normalizados)
+
+
+# CIF por linha: a máscara é avaliada nas categorias de TIPO_FRETE ("C"/"F" ou "CIF"/"FOB")
+def _cif_por_linha(carteira, tipo_frete_padrao):
+    if "TIPO_FRETE" not in carteira.columns:
+        return mascara_cif(tipo_frete_padrao, len(carteira))
+    codigos, valores = _codigos(carteira["TIPO_FRETE"])
+    cif = mascara_cif(np.char.upper(valores.astype(str)), len(valores))
+    return np.where(codigos >= 0, cif[codigos] if len(cif) else False, False)
+
+
+# Lucro refeito linha a linha, em uma passada vetorizada sobre o bloco
+def reprecificar_linhas(carteira, indice, tipo_frete_padrao="CIF"):
+    qtde = carteira["QTDE"].to_numpy(dtype=float)
+    vl_bruto = carteira["VL.BRUTO"].to_numpy(dtype=float)
+    posicoes = posicoes_custo(carteira, indice)
+    com_custo = (posicoes >= 0) & (qtde > 0)
+    onde = np.where(com_custo, posicoes, 0)
+
+    custo = indice.custo[onde]
+    despesas = indice.despesas[onde]
+    frete_unit = np.where(_cif_por_linha(carteira, tipo_frete_padrao), indice.frete[onde], 0.0)
+
+    # Mesmo lucro do motor_preco com preço = VL.BRUTO / QTDE:
+    # (preço - custo) × qtd - (preço × despesas × qtd + frete × qtd)
+    lucro_bruto = vl_bruto - custo * qtde - vl_bruto * despesas - frete_unit * qtde
+
+    linhas = carteira[[d for d in DIMENSOES_COMPARACAO if d in carteira.columns]].copy()
+    linhas["SKU"] = sku_normalizado(carteira["SKU"])
+    linhas["LINHAS"] = 1
+    linhas["QTDE"] = np.where(com_custo, qtde, 0.0)
+    linhas["VL.BRUTO"] = np.where(com_custo, vl_bruto, 0.0)
+    linhas["LUCRO LIQ"] = np.where(com_custo, carteira["LUCRO LIQ"].to_numpy(dtype=float), 0.0)
+    linhas[LUCRO_RECUSTEADO] = np.where(com_custo, lucro_liquido(lucro_bruto), 0.0)
+    linhas[VL_SEM_CUSTO] = np.where(com_custo, 0.0, vl_bruto)
+    return linhas
+
+
+def _somar(linhas, dimensao):
+    return linhas.groupby(dimensao, observed=True, sort=False, dropna=False)[MEDIDAS].sum()
+
+
+# Percorre os blocos e acumula as somas por dimensão; as linhas do bloco são descartadas em seguida
+def reprecificar_carteira(blocos, indice, tipo_frete_padrao="CIF", dimensoes=DIMENSOES_COMPARACAO):
+    if isinstance(blocos, pd.DataFrame):
+        blocos = [blocos]
+    acumulado = {}
+    total_linhas = 0
+    for bloco in blocos:
+        linhas = reprecificar_linhas(bloco, indice, tipo_frete_padrao)
+        total_linhas += len(linhas)
+        for dimensao in dimensoes:
+            if dimensao not in linhas.columns:
+                continue
+            parcial = _somar(linhas, dimensao)
+            anterior = acumulado.get(dimensao)
+            acumulado[dimensao] = parcial if anterior is None else anterior.add(parcial, fill_value=0)
+    comparativos = {dimensao: comparar(somas.reset_index()) for dimensao, somas in acumulado.items()}
+    return comparativos, total_linhas
+
+
+# Margem real x recusteada sobre o mesmo faturamento (linhas com custo)
+def comparar(somas):
+    vl_bruto = somas["VL.BRUTO"].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        real = np.where(vl_bruto > 0, somas["LUCRO LIQ"] / vl_bruto * 100, np.nan)
+        recusteado = np.where(vl_bruto > 0, somas[LUCRO_RECUSTEADO] / vl_bruto * 100, np.nan)
+    comparativo = somas.copy()
+    comparativo["% LUCRO REAL"] = real
+    comparativo["% LUCRO RECUSTEADO"] = recusteado
+    comparativo["DIFERENÇA (p.p.)"] = recusteado - real
+    comparativo["DIFERENÇA (R$)"] = somas[LUCRO_RECUSTEADO] - somas["LUCRO LIQ"]
+    return comparativo.sort_values("DIFERENÇA (R$)", kind="stable").reset_index(drop=True)
@@ -0,0 +1,163 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from motor_preco import COLUNAS_DESPESAS, custo_total_unitario, lucro_liquido, mascara_cif, percentual_sobre
+
+# Risco de margem por Monte Carlo: Custo NET, Frete Caixa e Bonificação variam por cenário e o
+# modelo de preço inteiro é avaliado como uma conta de arrays (linhas × cenários), em blocos.
+# Cada variável recebe uma distribuição da variação relativa sobre o valor da planilha:
+#   ("normal", desvio)            ex.: ("normal", 0.05)  → ±5% de desvio-padrão
+#   ("uniforme", minimo, maximo)  ex.: ("uniforme", -0.05, 0.10)
+#   ("triangular", minimo, moda, maximo)
+# Custo NET e Bonificação são sorteados por linha; o Frete Caixa é um por cenário, comum a todas as linhas.
+
+VARIAVEIS = ["Custo NET", "Frete Caixa", "Bonificação"]
+DISTRIBUICOES = ["normal", "uniforme", "triangular"]
+PERCENTIS = [5, 50, 95]
+CENARIOS_PADRAO = 20_000
+MAX_CENARIOS = 200_000
+BLOCO_CENARIOS = 4_000
+BINS_HISTOGRAMA = 80
+# Margens simuladas de uma vez por processo (linhas × cenários): ~40 MB em float32
+VALORES_POR_FATIA = 10_000_000
+
+
+def sortear_variacao(rng, distribuicao, forma):
+    if distribuicao is None:
+        return np.zeros(forma)
+    nome, *parametros = distribuicao
+    if nome == "normal":
+        return rng.normal(0.0, parametros[0], forma)
+    if nome == "uniforme":
+        return rng.uniform(parametros[0], parametros[1], forma)
+    if nome == "triangular":
+        minimo, moda, maximo = parametros
+        if minimo == maximo:
+            return np.full(forma, float(minimo))
+        return rng.triangular(minimo, moda, maximo, forma)
+    raise ValueError(f"Distribuição desconhecida: {nome}")
+
+
+# Arrays de entrada (uma posição por linha), sem pandas: é isso que vai para os processos
+def preparar_entradas(df, tipo_frete="CIF"):
+    fixas = [c for c in COLUNAS_DESPESAS if c != "Bonificação"]
+    return {
+        "preco": df["Preço de Venda"].to_numpy(dtype=float),
+        "qtd": df["Quantidade"].to_numpy(dtype=float),
+        "custo_net": df["Custo NET"].to_numpy(dtype=float),
+        "custo_fixo": custo_total_unitario(df) - df["Custo NET"].to_numpy(dtype=float),
+        "frete": df["Frete Caixa"].to_numpy(dtype=float),
+        "cif": mascara_cif(tipo_frete, len(df)),
+        "bonificacao": df["Bonificação"].to_numpy(dtype=float),
+        "despesas_fixas": df[fixas].to_numpy(dtype=float).sum(axis=1),
+    }
+
+
+# Lucro % de `n` cenários para todas as linhas: (linhas, n) em float32.
+# `variacao_frete` (uma por cenário, comum a todas as linhas) é sorteada aqui quando não informada.
+def simular_cenarios(entradas, incertezas, n, seed, bloco=BLOCO_CENARIOS, variacao_frete=None):
+    rng = np.random.default_rng(seed)
+    if variacao_frete is None:
+        variacao_frete = sortear_variacao(rng, incertezas.get("Frete Caixa"), n)
+    linhas = len(entradas["preco"])
+    col = {k: v[:, None] for k, v in entradas.items()}
+    subtotal = col["preco"] * col["qtd"]
+    margens = np.empty((linhas, n), dtype=np.float32)
+
+    for inicio in range(0, n, bloco):
+        m = min(bloco, n - inicio)
+        custo_net = col["custo_net"] * (1 + sortear_variacao(rng, incertezas.get("Custo NET"), (linhas, m)))
+        frete = col["frete"] * (1 + variacao_frete[None, inicio:inicio + m])
+        bonificacao = col["bonificacao"] * (1 + sortear_variacao(rng, incertezas.get("Bonificação"), (linhas, m)))
+
+        # Mesmo lucro do motor_preco: (preço - custo) × qtd - (preço × despesas × qtd + frete × qtd)
+        custo = np.maximum(custo_net, 0.0) + col["custo_fixo"]
+        despesas = col["despesas_fixas"] + np.maximum(bonificacao, 0.0)
+        frete_unit = np.where(col["cif"], np.maximum(frete, 0.0), 0.0)
+        lucro_bruto = (col["preco"] - custo - col["preco"] * despesas - frete_unit) * col["qtd"]
+        margens[:, inicio:inicio + m] = percentual_sobre(lucro_liquido(lucro_bruto), subtotal)
+    return margens
+
+
+# Histograma de cada linha na sua própria faixa [mínimo, máximo]: contagens (linhas, bins) e bordas (linhas, bins + 1)
+def histogramas(margens, bins=BINS_HISTOGRAMA):
+    linhas = margens.shape[0]
+    minimo = margens.min(axis=1, initial=np.inf).astype(float) if margens.size else np.zeros(linhas)
+    maximo = margens.max(axis=1, initial=-np.inf).astype(float) if margens.size else np.zeros(linhas)
+    largura = np.where(maximo > minimo, (maximo - minimo) / bins, 1.0)
+    faixa = np.clip(((margens - minimo[:, None]) / largura[:, None]).astype(np.int64), 0, bins - 1)
+    faixa += np.arange(linhas)[:, None] * bins
+    contagens = np.bincount(faixa.ravel(), minlength=linhas * bins).reshape(linhas, bins)
+    bordas = minimo[:, None] + largura[:, None] * np.arange(bins + 1)
+    return contagens, bordas
+
+
+# Simula um grupo de linhas e devolve só o resumo: percentis (len(PERCENTIS), linhas),
+# % de cenários abaixo do equilíbrio e o histograma. As linhas vão em fatias de até
+# VALORES_POR_FATIA margens, então a matriz completa nunca fica inteira em memória.
+def resumir_cenarios(entradas, incertezas, n, seed, variacao_frete, bins=BINS_HISTOGRAMA):
+    rng = np.random.default_rng(seed)
+    linhas = len(entradas["preco"])
+    por_fatia = max(1, VALORES_POR_FATIA // max(n, 1))
+    partes = []
+    for inicio in range(0, linhas, por_fatia):
+        fatia = {k: v[inicio:inicio + por_fatia] for k, v in entradas.items()}
+        margens = simular_cenarios(fatia, incertezas, n, rng, variacao_frete=variacao_frete)
+        partes.append((
+            np.percentile(margens, PERCENTIS, axis=1),
+            (margens < 0).mean(axis=1) * 100,
+            *histogramas(margens, bins),
+        ))
+    if not partes:
+        return np.empty((len(PERCENTIS), 0)), np.empty(0), np.empty((0, bins), dtype=np.int64), np.empty((0, bins + 1))
+    return tuple(np.concatenate(p, axis=1 if i == 0 else 0) for i, p in enumerate(zip(*partes)))
+
+
+# Divide as linhas entre processos; o Frete Caixa (comum a todas as linhas) é sorteado uma vez aqui
+# e cada parte tem a sua semente derivada (SeedSequence.spawn), então o resultado depende só de seed
+# e processos. Os processos devolvem só o resumo, nunca a matriz linhas × cenários.
+def simular_margens(entradas, incertezas, cenarios=CENARIOS_PADRAO, processos=1, seed=0, bins=BINS_HISTOGRAMA):
+    linhas = len(entradas["preco"])
+    processos = max(1, min(processos or 1, linhas))
+    semente_frete, *sementes = np.random.SeedSequence(seed).spawn(processos + 1)
+    variacao_frete = sortear_variacao(np.random.default_rng(semente_frete), incertezas.get("Frete Caixa"), cenarios)
+    partes = [
+        {k: v[parte] for k, v in entradas.items()}
+        for parte in np.array_split(np.arange(linhas), processos)
+    ]
+    if processos == 1:
+        return resumir_cenarios(partes[0], incertezas, cenarios, sementes[0], variacao_frete, bins)
+
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        futuros = [
+            pool.submit(resumir_cenarios, parte, incertezas, cenarios, semente, variacao_frete, bins)
+            for parte, semente in zip(partes, sementes)
+        ]
+        resultados = [f.result() for f in futuros]
+    return tuple(np.concatenate(p, axis=1 if i == 0 else 0) for i, p in enumerate(zip(*resultados)))
+
+
+# Resumo por linha: Lucro % determinístico, P5/P50/P95 e probabilidade de ficar abaixo do equilíbrio.
+# Devolve também o histograma do Lucro % de cada linha: (contagens, bordas)
+def risco_margem(df, incertezas, tipo_frete="CIF", cenarios=CENARIOS_PADRAO, processos=1, seed=0,
+                 colunas_id=("Descrição", "UF"), bins=BINS_HISTOGRAMA):
+    entradas = preparar_entradas(df, tipo_frete)
+    with np.errstate(invalid="ignore"):
+        percentis, abaixo, contagens, bordas = simular_margens(entradas, incertezas, cenarios, processos, seed, bins)
+    deterministico = simular_cenarios(entradas, {}, 1, seed)[:, 0]
+
+    # Sem preço de venda não há margem a simular: as colunas de margem ficam vazias, não em 0%
+    com_preco = np.isfinite(entradas["preco"])
+    resumo = df[[c for c in colunas_id if c in df.columns]].reset_index(drop=True)
+    resumo["Preço de Venda"] = entradas["preco"]
+    resumo["Lucro % (planilha)"] = np.where(com_preco, deterministico, np.nan)
+    for p, valores in zip(PERCENTIS, percentis):
+        resumo[f"Lucro % P{p}"] = np.where(com_preco, valores, np.nan)
+    resumo["Prob. abaixo do equilíbrio (%)"] = np.where(com_preco, abaixo, np.nan)
+    return resumo, (contagens, bordas)
+
+
+def processos_disponiveis():
+    return os.cpu_count() or 1
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from motor_preco import (
+    COLUNAS_DESPESAS, custo_total_unitario, lucro_liquido, mascara_cif,
+    percentual_sobre, preco_equilibrio
+)
+
+# Varredura de sensibilidade: Frete Caixa × % Contrato × %Estrategico para todas as linhas de uma vez.
+# Os resultados são arrays (linhas, fretes, contratos, estratégicos) montados por broadcasting.
+
+EIXOS = ["Frete Caixa", "Contrato", "%Estrategico"]
+# Preço que zera o lucro em cada ponto da grade; não é a coluna "Ponto de Equilíbrio (R$)" do motor_preco,
+# que mantém o preço de venda quando a linha já dá lucro
+MEDIDAS = ["Lucro Líquido (R$)", "Lucro %", "Preço de Equilíbrio (R$)"]
+
+
+def _linhas(df, nome):
+    return df[nome].to_numpy(dtype=float)[:, None, None, None]
+
+
+def varrer_sensibilidade(df, fretes, contratos, estrategicos, tipo_frete="CIF"):
+    fretes = np.asarray(fretes, dtype=float)
+    contratos = np.asarray(contratos, dtype=float)
+    estrategicos = np.asarray(estrategicos, dtype=float)
+
+    preco = _linhas(df, "Preço de Venda")
+    qtd = _linhas(df, "Quantidade")
+    custo = custo_total_unitario(df)[:, None, None, None]
+    cif = mascara_cif(tipo_frete, len(df))[:, None, None, None]
+
+    # Despesas que não variam na grade + os dois eixos percentuais
+    fixas = [c for c in COLUNAS_DESPESAS if c not in EIXOS]
+    despesas = (
+        df[fixas].to_numpy(dtype=float).sum(axis=1)[:, None, None, None]
+        + contratos[None, None, :, None]
+        + estrategicos[None, None, None, :]
+    )
+    frete_unit = np.where(cif, fretes[None, :, None, None], 0.0)
+
+    # Mesmo lucro bruto do motor: (preço - custo) × qtd - (preço × despesas × qtd + frete × qtd)
+    margem_unit = preco - custo - preco * despesas
+    lucro_bruto = (margem_unit - frete_unit) * qtd
+    liquido = lucro_liquido(lucro_bruto)
+    equilibrio, _ = preco_equilibrio(custo, frete_unit, despesas)
+
+    return {
+        "fretes": fretes,
+        "contratos": contratos,
+        "estrategicos": estrategicos,
+        "Subtotal (R$)": np.broadcast_to(preco * qtd, liquido.shape),
+        "Lucro Líquido (R$)": liquido,
+        "Lucro %": percentual_sobre(liquido, preco * qtd),
+        "Preço de Equilíbrio (R$)": equilibrio,
+    }
+
+
+# Lucro % da carteira inteira em cada ponto da grade: (fretes, contratos, estratégicos)
+def lucro_percentual_total(resultado):
+    return percentual_sobre(
+        np.nansum(resultado["Lucro Líquido (R$)"], axis=0),
+        np.nansum(resultado["Subtotal (R$)"], axis=0)
+    )
+
+
+# Tabela longa para download: uma linha por SKU × ponto da grade
+def tabela_sensibilidade(df, resultado, colunas_id=("Descrição", "UF")):
+    liquido = resultado["Lucro Líquido (R$)"]
+    n, n_fretes, n_contratos, n_estrategicos = liquido.shape
+    pontos = n_fretes * n_contratos * n_estrategicos
+
+    tabela = pd.DataFrame({
+        col: np.repeat(df[col].to_numpy(), pontos) for col in colunas_id if col in df.columns
+    })
+    grade = np.meshgrid(resultado["fretes"], resultado["contratos"], resultado["estrategicos"], indexing="ij")
+    for eixo, valores in zip(EIXOS, grade):
+        tabela[eixo] = np.tile(valores.ravel(), n)
+    for medida in MEDIDAS:
+        tabela[medida] = np.broadcast_to(resultado[medida], liquido.shape).ravel()
+    return tabela
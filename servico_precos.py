@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import io
+import time
+
+import numpy as np
+import pandas as pd
+from aiohttp import web
+
+from cache_custos import carregar_tabela_custos
+from motor_preco import calcular_precos, preencher_preco_equilibrio, preparar_tabela
+from preco_sobel import inverter_preco_sobel
+
+# Serviço HTTP local de precificação em lote (integração com o ERP), sem Streamlit.
+# A tabela de custos é carregada uma vez na subida e fica indexada por (UF, Descrição).
+# Uso: python servico_precos.py ["Custo de reposição.xlsx"] [--porta 8080]
+#
+#   POST /precos       itens com Descrição, UF, Preço de Venda, Quantidade → colunas do forma-preco
+#   POST /equilibrio   itens com Descrição, UF → Preço de Venda no ponto de equilíbrio
+#   POST /sobel        itens com Descrição, UF, Preço Sobel → Preço Negociado (MVA/IPI/ICMS da tabela)
+#   GET  /saude
+#
+# JSON: {"tipo_frete": "CIF", "frete": 1.50, "contrato": 1.00, "itens": [{...}, ...]}
+# Arrow: corpo em IPC stream (Content-Type application/vnd.apache.arrow.stream) com os itens;
+#        parâmetros na query string (?tipo_frete=CIF&frete=1.5&contrato=1). A resposta segue o formato do pedido.
+
+TIPO_ARROW = "application/vnd.apache.arrow.stream"
+CHAVE = ["UF", "Descrição"]
+
+
+class ErroPedido(ValueError):
+    pass
+
+
+class TabelaCustos:
+    def __init__(self, caminho):
+        tabela = carregar_tabela_custos(caminho).drop_duplicates(CHAVE).reset_index(drop=True)
+        tabela["Descrição"] = tabela["Descrição"].astype(str).str.strip()
+        tabela["UF"] = tabela["UF"].astype(str).str.strip()
+        self.caminho = caminho
+        self.tabela = tabela
+        self.indice = pd.MultiIndex.from_frame(tabela[CHAVE])
+
+    # Linhas da tabela de custos para os itens do pedido, na ordem do pedido
+    def linhas(self, itens):
+        faltando = [c for c in CHAVE if c not in itens.columns]
+        if faltando:
+            raise ErroPedido(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+        chaves = pd.MultiIndex.from_arrays([itens[c].astype(str).str.strip() for c in CHAVE])
+        posicoes = self.indice.get_indexer(chaves)
+        desconhecidos = chaves[posicoes < 0].unique().tolist()
+        if desconhecidos:
+            raise ErroPedido(f"UF/Descrição sem custo cadastrado: {desconhecidos[:10]}")
+        return self.tabela.iloc[posicoes].reset_index(drop=True)
+
+
+def _parametro(parametros, nome, padrao):
+    valor = parametros.get(nome, padrao)
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        raise ErroPedido(f"Parâmetro inválido: {nome}={valor!r}")
+
+
+def _numerica(itens, nome, obrigatoria=True):
+    if nome not in itens.columns:
+        if obrigatoria:
+            raise ErroPedido(f"Coluna obrigatória ausente: {nome}")
+        return None
+    return pd.to_numeric(itens[nome], errors="coerce").to_numpy(dtype=float)
+
+
+def _preparar(custos, itens, parametros):
+    tipo_frete = str(parametros.get("tipo_frete", "CIF")).upper()
+    if tipo_frete not in ("CIF", "FOB"):
+        raise ErroPedido("tipo_frete deve ser CIF ou FOB")
+    df = preparar_tabela(
+        custos.linhas(itens),
+        _parametro(parametros, "frete", 1.50),
+        _parametro(parametros, "contrato", 1.00) / 100
+    )
+    return df, tipo_frete
+
+
+def calcular_pedido_precos(custos, itens, parametros):
+    df, tipo_frete = _preparar(custos, itens, parametros)
+    df["Preço de Venda"] = _numerica(itens, "Preço de Venda")
+    quantidade = _numerica(itens, "Quantidade", obrigatoria=False)
+    df["Quantidade"] = 1.0 if quantidade is None else quantidade
+    return pd.concat([df[CHAVE + ["Preço de Venda", "Quantidade"]], calcular_precos(df, tipo_frete)], axis=1)
+
+
+def calcular_pedido_equilibrio(custos, itens, parametros):
+    df, tipo_frete = _preparar(custos, itens, parametros)
+    df, alertas = preencher_preco_equilibrio(df, tipo_frete)
+    resposta = df[CHAVE + ["Preço de Venda"]].copy()
+    resposta["Despesas acima de 100%"] = alertas.to_numpy()
+    return resposta
+
+
+def calcular_pedido_sobel(custos, itens, parametros):
+    linhas = custos.linhas(itens)
+    mva = linhas["MVA"].to_numpy(dtype=float, copy=True)
+    ipi = linhas["IPI"].to_numpy(dtype=float, copy=True)
+    icms = linhas["ICMS"].to_numpy(dtype=float, copy=True)
+    # Sobrescritas opcionais, em %, como no simulador_lote.py
+    for nome, atual in (("MVA (%)", mva), ("IPI (%)", ipi)):
+        valores = _numerica(itens, nome, obrigatoria=False)
+        if valores is not None:
+            atual[:] = np.where(np.isnan(valores), atual, valores / 100)
+    if "icms" in parametros:
+        icms[:] = _parametro(parametros, "icms", 0.0) / 100
+
+    resultado = inverter_preco_sobel(_numerica(itens, "Preço Sobel"), mva, ipi, icms, casas=4)
+    resposta = linhas[CHAVE].copy()
+    resposta["Preço Sobel"] = _numerica(itens, "Preço Sobel")
+    for col, valores in resultado.items():
+        resposta[col] = valores
+    return resposta
+
+
+CALCULOS = {
+    "precos": calcular_pedido_precos,
+    "equilibrio": calcular_pedido_equilibrio,
+    "sobel": calcular_pedido_sobel,
+}
+
+
+def ler_arrow(corpo):
+    import pyarrow as pa
+
+    with pa.ipc.open_stream(corpo) as leitor:
+        return leitor.read_all().to_pandas()
+
+
+def gravar_arrow(df):
+    import pyarrow as pa
+
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    saida = io.BytesIO()
+    with pa.ipc.new_stream(saida, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return saida.getvalue()
+
+
+def _json(df):
+    # NaN não existe em JSON: vira null
+    return {"itens": df.astype(object).where(df.notna(), None).to_dict(orient="records")}
+
+
+def criar_app(custos):
+    async def calcular(request):
+        nome = request.match_info["calculo"]
+        arrow = request.content_type == TIPO_ARROW
+        inicio = time.perf_counter()
+        try:
+            if arrow:
+                itens, parametros = ler_arrow(await request.read()), dict(request.query)
+            else:
+                pedido = await request.json()
+                itens = pd.DataFrame(pedido.get("itens", []))
+                parametros = {k: v for k, v in pedido.items() if k != "itens"}
+        except (ValueError, AttributeError) as e:
+            return web.json_response({"erro": f"Corpo do pedido inválido: {e}"}, status=400)
+
+        try:
+            if itens.empty:
+                raise ErroPedido("Nenhum item no pedido")
+            # O cálculo é vetorizado e curto, mas lotes grandes não devem segurar o loop de eventos
+            resposta = await asyncio.get_running_loop().run_in_executor(
+                None, CALCULOS[nome], custos, itens, parametros
+            )
+        except ErroPedido as e:
+            return web.json_response({"erro": str(e)}, status=422)
+
+        cabecalhos = {"X-Tempo-Calculo-ms": f"{(time.perf_counter() - inicio) * 1000:.2f}"}
+        if arrow:
+            return web.Response(body=gravar_arrow(resposta), content_type=TIPO_ARROW, headers=cabecalhos)
+        return web.json_response(_json(resposta), headers=cabecalhos)
+
+    async def saude(request):
+        return web.json_response({"status": "ok", "tabela": custos.caminho, "linhas": len(custos.tabela)})
+
+    app = web.Application(client_max_size=256 * 1024 ** 2)
+    app.router.add_get("/saude", saude)
+    app.router.add_post("/{calculo:precos|equilibrio|sobel}", calcular)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP de precificação em lote.")
+    parser.add_argument("tabela", nargs="?", default="Custo de reposição.xlsx", help="Planilha de custos (.xlsx)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8080)
+    args = parser.parse_args()
+
+    custos = TabelaCustos(args.tabela)
+    print(f"{len(custos.tabela)} linhas de custo carregadas de {args.tabela}")
+    web.run_app(criar_app(custos), host=args.host, port=args.porta, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
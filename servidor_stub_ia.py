@@ -0,0 +1,62 @@
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Servidor local que imita a rota /v1/chat/completions, para testes e demonstrações sem a API real.
+# Uso: python servidor_stub_ia.py [--porta 8765] [--atraso 2]
+# No app: DIAGNOSTICO_BACKEND=local streamlit run app.py
+
+
+def responder(prompt):
+    linhas = [l.strip() for l in prompt.splitlines() if l.strip()]
+    return "\n".join([
+        "### Diagnóstico (servidor local de teste)",
+        f"- Prompt recebido com {len(prompt):,} caracteres em {len(linhas)} linhas.",
+        "- Esta resposta é gerada localmente e não contém análise real.",
+    ])
+
+
+def criar_handler(atraso):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path.rstrip("/") != "/v1/chat/completions":
+                self.send_error(404)
+                return
+            corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt = corpo.get("messages", [{}])[-1].get("content", "")
+            time.sleep(atraso)
+            resposta = json.dumps({
+                "model": corpo.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": responder(prompt)}}],
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(resposta)))
+            self.end_headers()
+            self.wfile.write(resposta)
+
+        def log_message(self, formato, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de teste para o diagnóstico por IA.")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--atraso", type=float, default=2.0, help="Segundos de espera por resposta")
+    args = parser.parse_args()
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", args.porta), criar_handler(args.atraso))
+    print(f"Servidor de teste em http://127.0.0.1:{args.porta}/v1/chat/completions")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 import streamlit as st
-from scipy.optimize import fsolve
+from preco_sobel import inverter_preco_sobel
 
 st.set_page_config(page_title="Simulador Tributário", layout="centered")
 st.title("🧮 Simulador de Preço Negociado Sobel")
@@ -29,25 +29,12 @@ icms = 0.18
 mva = dados_produto["MVA"] / 100
 ipi = dados_produto["IPI"] / 100
 
-# Função de simulação com base na fórmula correta
-def calcular_preco_sobel(preco_neg):
-    ipi_valor = preco_neg * ipi
-    base_st = preco_neg * (1 + ipi) * (1 + mva)
-    st_valor = (base_st * icms) - (preco_neg * icms)
-    return preco_neg + ipi_valor + st_valor
-
-# Encontrar o preço negociado via fsolve
-def encontrar_preco_negociado(sobel_dado):
-    f = lambda x: calcular_preco_sobel(x) - sobel_dado
-    preco_calc = fsolve(f, sobel_dado * 0.9)[0]
-    return preco_calc
-
-# Cálculo
-preco_negociado = encontrar_preco_negociado(preco_sobel)
-ipi_valor = preco_negociado * ipi
-base_st = preco_negociado * (1 + ipi) * (1 + mva)
-st_valor = (base_st * icms) - (preco_negociado * icms)
-preco_sobel_simulado = preco_negociado + ipi_valor + st_valor
+# Cálculo (inversão exata do Preço Sobel)
+resultado = inverter_preco_sobel(preco_sobel, mva, ipi, icms)
+preco_negociado = float(resultado["Preço Negociado"])
+ipi_valor = float(resultado["IPI Valor"])
+st_valor = float(resultado["ST Valor"])
+preco_sobel_simulado = float(resultado["Preço Sobel Simulado"])
 
 # Resultado
 st.markdown("### Resultado")
@@ -1,7 +1,7 @@
 import streamlit as st
-import io
 import pandas as pd
-from scipy.optimize import fsolve
+from exportacao import exportar_sob_demanda
+from preco_sobel import inverter_preco_sobel
 
 st.set_page_config(page_title="Simulador de preços Sobel", layout="wide")
 st.title("📦 Simulador de Preço Negociado")
@@ -40,34 +40,14 @@ icms = icms_percentual / 100
 st.markdown("### ✍️ Informe os preços Sobel na tabela abaixo:")
 df_editada = st.data_editor(df_base, use_container_width=True, num_rows="fixed")
 
-# Cálculo do Preço Negociado por linha
-def calcular_preco_sobel(preco_neg, mva, ipi, icms):
-    ipi_valor = preco_neg * ipi
-    base_st = preco_neg * (1 + ipi) * (1 + mva)
-    st_valor = (base_st * icms) - (preco_neg * icms)
-    return preco_neg + ipi_valor + st_valor
-
-def encontrar_preco_negociado(preco_sobel, mva, ipi, icms):
-    if preco_sobel <= 0:
-        return 0.0
-    f = lambda x: calcular_preco_sobel(x, mva, ipi, icms) - preco_sobel
-    return round(fsolve(f, preco_sobel * 0.9)[0], 4)
-
-# Prepara DataFrame para cálculo
+# Prepara DataFrame para cálculo (inversão exata, em lote)
 df = df_editada.copy()
 df["MVA DEC"] = df["MVA (%)"] / 100
 df["IPI DEC"] = df["IPI (%)"] / 100
 
-df["Preço Negociado"] = df.apply(
-    lambda row: encontrar_preco_negociado(row["PREÇO SOBEL"], row["MVA DEC"], row["IPI DEC"], icms),
-    axis=1
-)
-
-df["IPI Valor"] = df["Preço Negociado"] * df["IPI DEC"]
-df["Base ST"] = df["Preço Negociado"] * (1 + df["IPI DEC"]) * (1 + df["MVA DEC"])
-df["ST Valor"] = (df["Base ST"] * icms) - (df["Preço Negociado"] * icms)
-df["Preço Sobel Simulado"] = df["Preço Negociado"] + df["IPI Valor"] + df["ST Valor"]
-df["Diferença"] = df["Preço Sobel Simulado"] - df["PREÇO SOBEL"]
+resultado = inverter_preco_sobel(df["PREÇO SOBEL"], df["MVA DEC"], df["IPI DEC"], icms, casas=4)
+for col, valores in resultado.items():
+    df[col] = valores
 
 # Resultado
 st.markdown("### 📊 Resultado do Cálculo")
@@ -95,13 +75,6 @@ df_exportar = df[[
     "Preço Sobel Simulado", "Diferença"
 ]]
 
-buffer = io.BytesIO()
-with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-    df_exportar.to_excel(writer, index=False, sheet_name="Simulação")
+# Gerada só quando solicitada e memorizada pelo conteúdo da tabela
+exportar_sob_demanda(df_exportar, "simulacao_preco_negociado", "Simulação", "exportacao_simulacao")
 
-st.download_button(
-    label="📤 Baixar planilha Excel",
-    data=buffer,
-    file_name="simulacao_preco_negociado.xlsx",
-    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-)